@@ -0,0 +1,294 @@
+import re
+import threading
+from datetime import date, datetime, timedelta
+
+from chat_context import match_names, parse_dates, without_names
+from event_log import STORE_FORMAT
+
+# ==========================================
+# ATTENDANCE QUERY ENGINE (Answers without the LLM)
+# ==========================================
+# The log is folded into visits: an ENTERED opens a visit for (name, camera),
+# the next EXITED for the same pair closes it. A visit never closed is either
+# still going (today) or has no exit on record (the app was stopped). The
+# latter is closed as "lost" when the same pair enters again on a later day,
+# or more than `stale_after` seconds (the app's exit threshold) after it
+# began: the app only logs a second ENTERED once the person was gone. Visits
+# are indexed by person and by day and updated incrementally from the event
+# store, like chat_context.LogSummary.
+#
+# answer() recognises the common questions and answers them from the index:
+#   lobby      "who is in the lobby now?"
+#   presence   "was Obama here today?", "did X come on monday?"
+#   duration   "how long did X stay yesterday?"
+#   arrival    "when did X arrive / leave today?"
+#   visits     "how many times did X come this week?"
+#   attendees  "who came in yesterday?"
+#   count      "how many people came today?"
+# Only these question forms count ("was/did/is X ... here/come/arrive",
+# "when did X ...", "how long ...", "who ..."), read from the start of the
+# question. Why / tell me about / advice and other open-ended questions, or
+# anything else, return None: the question goes to the LLM, with facts() (the
+# matched people's visits) in its context.
+
+TIME_FORMAT = "%I:%M %p"
+MAX_LISTED = 30 # Names listed in one answer before "and N more"
+# Openers dropped before reading the question form: "hey visor, was X here?"
+LEADING = re.compile(r"^(?:(?:hey|hi|hello|ok|okay|so|and|also|please|visor|"
+                     r"(?:can|could) you (?:tell me|check)|do you know)\b[\s,!.:]*)+")
+# Questions that want an explanation or an opinion, not a lookup
+OPEN_ENDED = re.compile(r"\b(why|how come|tell me about|tell me more|describe|explain|advice|advise|suggest\w*|"
+                        r"recommend\w*|should|think|opinion|summar\w*|notes?|habits?|usually|typically|"
+                        r"always|pattern\w*|trouble|late|early|on time|punctual\w*|compare\w*)\b")
+
+
+def parse_ts(ts):
+    return datetime.strptime(ts, STORE_FORMAT)
+
+
+def format_duration(seconds):
+    minutes = int(round(seconds / 60))
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+def format_day(d, today):
+    if d == today:
+        return "today"
+    if d == today - timedelta(days=1):
+        return "yesterday"
+    return d.strftime("%a %Y-%m-%d")
+
+
+def on_day(d, today):
+    """'today', 'yesterday' or 'on Mon 2026-10-12'."""
+    text = format_day(d, today)
+    return text if d >= today - timedelta(days=1) else f"on {text}"
+
+
+def format_range(d_from, d_to, today):
+    if d_from == d_to:
+        return format_day(d_from, today)
+    return f"between {d_from.isoformat()} and {d_to.isoformat()}"
+
+
+def list_names(names):
+    names = sorted(names)
+    if len(names) > MAX_LISTED:
+        return ", ".join(names[:MAX_LISTED]) + f" and {len(names) - MAX_LISTED} more"
+    return ", ".join(names)
+
+
+class Visit:
+    __slots__ = ("name", "camera", "start", "end", "lost")
+
+    def __init__(self, name, camera, start):
+        self.name, self.camera, self.start, self.end = name, camera, start, None
+        self.lost = False # Closed without an exit on record
+
+    def still_here(self, today):
+        """Open, and started on `today` (a date)."""
+        return self.end is None and not self.lost and self.start[:10] == today.isoformat()
+
+    def seconds(self, now=None):
+        """Length of the visit; an open one counts up to `now` if given, else 0."""
+        if self.end is not None:
+            return (parse_ts(self.end) - parse_ts(self.start)).total_seconds()
+        if now is not None:
+            return max(0.0, (now - parse_ts(self.start)).total_seconds())
+        return 0.0
+
+
+class AttendanceQuery:
+    def __init__(self, store, lobby=None, stale_after=3.0):
+        """
+        `lobby` is an optional callable returning who the cameras see right now.
+        `stale_after`: seconds after which a repeated ENTERED means the open
+        visit's exit was lost rather than a duplicate entry.
+        """
+        self.store = store
+        self.lobby = lobby
+        self.stale_after = stale_after
+        self.lock = threading.Lock()
+        self.cursor = 0
+        self.by_name = {} # name -> [Visit], oldest first
+        self.by_day = {} # "YYYY-MM-DD" -> [Visit] started that day
+        self.open = {} # (name, camera) -> Visit without an exit yet
+        self.names = {} # lower-case name -> name
+
+    def refresh(self):
+        """Folds in events added since the last call. Returns how many."""
+        with self.lock:
+            added = 0
+            while True:
+                rows = self.store.rows_since(self.cursor, limit=50000)
+                if not rows:
+                    return added
+                for _, ts, event, name, camera in rows:
+                    key = (name, camera)
+                    if event == "ENTERED":
+                        previous = self.open.get(key)
+                        if previous is not None:
+                            if ts[:10] == previous.start[:10] and \
+                                    (parse_ts(ts) - parse_ts(previous.start)).total_seconds() <= self.stale_after:
+                                continue # Already inside (duplicate entry): keep the first
+                            previous.lost = True # Its exit was never logged
+                        visit = self.open[key] = Visit(name, camera, ts)
+                        self.by_name.setdefault(name, []).append(visit)
+                        self.by_day.setdefault(ts[:10], []).append(visit)
+                        self.names.setdefault(name.lower(), name)
+                    elif event == "EXITED":
+                        visit = self.open.pop(key, None)
+                        if visit is not None:
+                            visit.end = ts
+                self.cursor = rows[-1][0]
+                added += len(rows)
+
+    # --- Lookups ---
+    def match_names(self, question):
+        with self.lock:
+            known = dict(self.names)
+        return match_names(question, known)
+
+    def visits(self, name=None, d_from=None, d_to=None):
+        """Visits started in [d_from, d_to] (dates), of one person or everyone, oldest first."""
+        lo = d_from.isoformat() if d_from else ""
+        hi = d_to.isoformat() + " 99" if d_to else "9"
+        with self.lock:
+            if name is not None:
+                return [v for v in self.by_name.get(name, ()) if lo <= v.start <= hi]
+            found = []
+            for day in sorted(d for d in self.by_day if lo <= d <= hi):
+                found.extend(self.by_day[day])
+            return found
+
+    def present_now(self):
+        if self.lobby is not None:
+            return sorted(set(self.lobby()))
+        today = date.today().isoformat()
+        with self.lock:
+            return sorted({v.name for v in self.open.values() if v.start[:10] == today})
+
+    # --- Answers ---
+    def answer(self, question, now=None):
+        """Returns (intent, answer text) for a question it understands, else None."""
+        now = now or datetime.now()
+        today = now.date()
+        self.refresh()
+        q = LEADING.sub("", question.lower().replace("\u2019", "'").strip())
+        if OPEN_ENDED.search(q):
+            return None
+        names = self.match_names(question)
+        d_from, d_to = parse_dates(without_names(question, names), today) # "May 5" may be a person
+        dated = d_from is not None
+        if not dated:
+            d_from = d_to = today
+        when = format_range(d_from, d_to, today)
+
+        if not names:
+            if re.match(r"who\b.*\b(is|are|'s)\b.*\b(lobby|here|present|inside|around)\b", q) or \
+                    re.match(r"who\b.*\b(lobby|here|present|inside)\b.*\b(now|currently)\b", q) or \
+                    re.match(r"who'?s\s+(here|in|around|inside)\b", q):
+                if d_to == today:
+                    people = self.present_now()
+                    return "lobby", (f"In the lobby right now: {list_names(people)}." if people
+                                     else "Nobody is in the lobby right now.")
+            if re.match(r"how many\b.*\b(people|students|persons|visitors|attendees|were|came)\b", q):
+                people = {v.name for v in self.visits(None, d_from, d_to)}
+                return "count", f"{len(people)} {'person' if len(people) == 1 else 'people'} came in {when}."
+            if re.match(r"who\b.*\b(came|come|was here|were here|attended|entered|visited|showed up|arrived|was in|present)\b", q):
+                visits = self.visits(None, d_from, d_to)
+                if not visits:
+                    return "attendees", f"Nobody came in {when}."
+                first = {}
+                for v in visits:
+                    first.setdefault(v.name, v.start)
+                if d_from == d_to:
+                    listed = [f"{n} ({parse_ts(t).strftime(TIME_FORMAT)})" for n, t in sorted(first.items(), key=lambda x: x[1])]
+                    if len(listed) > MAX_LISTED:
+                        listed = listed[:MAX_LISTED] + [f"and {len(first) - MAX_LISTED} more"]
+                    return "attendees", f"{len(first)} came in {when}: " + ", ".join(listed) + "."
+                return "attendees", f"{len(first)} came in {when}: {list_names(first)}."
+            return None
+
+        if re.match(r"how (long|much time)\b|what('s| was| is)\b.*\b(duration|time spent)\b", q):
+            return "duration", " ".join(self._duration(n, d_from, d_to, when, now) for n in names)
+        if re.match(r"how (many times|often)\b|what('s| was| is)\b.*\bnumber of (times|visits)\b", q):
+            lines = []
+            for n in names:
+                count = len(self.visits(n, d_from, d_to))
+                lines.append(f"{n} came in {count} time{'s' if count != 1 else ''} {when}.")
+            return "visits", " ".join(lines)
+        if re.match(r"(when|(at )?what time)\b.*\b(arriv\w*|come|came|get here|got here|enter\w*|show(ed|n)? up|"
+                    r"leave|leaving|left|exit\w*|go home|went home)\b", q):
+            leaving = bool(re.search(r"\bleav|\bleft\b|\bexit|\b(go|went) home\b", q))
+            return "arrival", " ".join(self._arrival(n, d_from, d_to, when, leaving, today) for n in names)
+        if re.match(r"(was|were|is|are|did|has|have)\b.*\b(attend\w*|come|came|here|present|around|inside|"
+                    r"in the lobby|in today|show(ed|n)? up|arriv\w*|visit(ed)?)\b", q):
+            if not dated and re.match(r"(is|are)\b.*\b(here|in the lobby|present|inside|around)\b", q):
+                present = set(self.present_now())
+                return "lobby", " ".join(f"Yes, {n} is here right now." if n in present
+                                         else f"No, {n} is not in the lobby right now." for n in names)
+            return "presence", " ".join(self._presence(n, d_from, d_to, when, today) for n in names)
+        return None
+
+    def _presence(self, name, d_from, d_to, when, today):
+        visits = self.visits(name, d_from, d_to)
+        if not visits:
+            return f"No, there is no record of {name} {when}."
+        days = sorted({v.start[:10] for v in visits})
+        if len(days) == 1:
+            first = parse_ts(visits[0].start).strftime(TIME_FORMAT)
+            last = visits[-1]
+            out = ("still here" if last.still_here(today)
+                   else f"last left at {parse_ts(last.end).strftime(TIME_FORMAT)}" if last.end
+                   else "no exit recorded")
+            return f"Yes, {name} was here {format_day(date.fromisoformat(days[0]), today)}: first came in at {first}, {out}."
+        return f"Yes, {name} was here on {len(days)} days {when} ({', '.join(days)})."
+
+    def _duration(self, name, d_from, d_to, when, now):
+        visits = self.visits(name, d_from, d_to)
+        if not visits:
+            return f"There is no record of {name} {when}."
+        today = now.date()
+        total = sum(v.seconds(now if v.still_here(today) else None) for v in visits)
+        unknown = sum(1 for v in visits if v.end is None and not v.still_here(today))
+        ongoing = any(v.still_here(today) for v in visits)
+        text = f"{name} spent {format_duration(total)} in the lobby {when} over {len(visits)} visit{'s' if len(visits) != 1 else ''}"
+        if ongoing:
+            text += " (still here)"
+        if unknown:
+            text += f" ({unknown} without a recorded exit, not counted)"
+        return text + "."
+
+    def _arrival(self, name, d_from, d_to, when, leaving, today):
+        visits = self.visits(name, d_from, d_to)
+        if not visits:
+            return f"There is no record of {name} {when}."
+        if leaving:
+            exits = [v.end for v in visits if v.end]
+            if not exits:
+                return f"{name} has no recorded exit {when}" + (" (still here)." if visits[-1].still_here(today) else ".")
+            last = parse_ts(max(exits))
+            return f"{name} last left at {last.strftime(TIME_FORMAT)} {on_day(last.date(), today)}."
+        first = parse_ts(visits[0].start)
+        return f"{name} first came in at {first.strftime(TIME_FORMAT)} {on_day(first.date(), today)}."
+
+    def facts(self, question, days=7, limit=20, now=None):
+        """Visit lines for the people in the question (for the LLM's context when answer() gives up)."""
+        now = now or datetime.now()
+        self.refresh()
+        names = self.match_names(question)
+        d_from, d_to = parse_dates(without_names(question, names), now.date())
+        if d_from is None:
+            d_from, d_to = now.date() - timedelta(days=days - 1), now.date()
+        lines = []
+        for name in names:
+            for v in reversed(self.visits(name, d_from, d_to)):
+                end = parse_ts(v.end).strftime(TIME_FORMAT) if v.end else "still here" if v.still_here(now.date()) else "no exit recorded"
+                lines.append(f"{v.start[:10]} {name}: {parse_ts(v.start).strftime(TIME_FORMAT)} - {end}"
+                             + (f" ({format_duration(v.seconds())})" if v.end else ""))
+                if len(lines) >= limit:
+                    return lines
+        return lines
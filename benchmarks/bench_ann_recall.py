@@ -0,0 +1,84 @@
+"""
+Recall-vs-latency benchmark: IVF approximate search against exact search.
+
+Builds a synthetic roster (seeded with the real encodings from the app's
+face_encodings_sface.vgal store, when there is one), queries it with noisy copies of enrolled faces, and
+reports recall@1 (ANN top hit == exact top hit) and per-face latency for a
+range of `nprobe` values, so IVF_NPROBE can be picked with known accuracy.
+
+    python benchmarks/bench_ann_recall.py --size 100000 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from face_gallery import FaceGallery, l2_normalize, load_store  # noqa: E402
+
+NPROBE_VALUES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def build_roster(size, store_path, rng):
+    """Names + (N, 128) matrix: the store's identity rows (what the app matches against), padded with random ones."""
+    names, feats = [], []
+    if store_path and os.path.exists(store_path):
+        store_names, matrix, _ = load_store(store_path, mmap=False)
+        names += store_names
+        feats.append(np.asarray(matrix, dtype=np.float32))
+    missing = size - len(names)
+    if missing > 0:
+        names += [f"synthetic_{i}" for i in range(missing)]
+        feats.append(rng.standard_normal((missing, 128)).astype(np.float32))
+    return names, np.vstack(feats)
+
+
+def timed_search(search_fn, probes, batch):
+    """Runs `search_fn` frame by frame; returns (indices, ms per face)."""
+    idx = []
+    t0 = time.perf_counter()
+    for start in range(0, probes.shape[0], batch):
+        idx.append(search_fn(probes[start:start + batch])[0])
+    return np.vstack(idx), (time.perf_counter() - t0) * 1000 / probes.shape[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000, help="gallery size (identities)")
+    parser.add_argument("--queries", type=int, default=500, help="number of probe faces")
+    parser.add_argument("--noise", type=float, default=0.6, help="probe noise (higher = harder)")
+    parser.add_argument("--batch", type=int, default=1, help="faces per frame (per search call)")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF cells (default 4*sqrt(N))")
+    parser.add_argument("--encodings", default="face_encodings_sface.vgal", help="real encodings to include (.vgal store)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    names, feats = build_roster(args.size, args.encodings, rng)
+    gallery = FaceGallery(names, feats)
+
+    # Probes: noisy re-captures of enrolled faces
+    src = rng.choice(len(gallery), args.queries)
+    probes = l2_normalize(gallery.embeddings[src] + args.noise / np.sqrt(128) * rng.standard_normal((args.queries, 128)))
+
+    exact_idx, exact_ms = timed_search(lambda q: gallery.search(q, k=1), probes, args.batch)
+    print(f"Gallery: {len(gallery)} identities | {args.queries} probes | {args.batch} face(s) per frame")
+
+    t0 = time.perf_counter()
+    gallery.build_ivf(nlist=args.nlist)
+    print(f"IVF build: {gallery.index.nlist} cells in {time.perf_counter() - t0:.1f}s\n")
+
+    print(f"{'mode':>12} {'recall@1':>9} {'ms/face':>9} {'speedup':>8}")
+    print(f"{'exact':>12} {1.0:>9.3f} {exact_ms:>9.3f} {1.0:>7.1f}x")
+    for nprobe in NPROBE_VALUES:
+        if nprobe > gallery.index.nlist:
+            break
+        ann_idx, ann_ms = timed_search(
+            lambda q: gallery.index.search(q, gallery.embeddings, k=1, nprobe=nprobe), probes, args.batch)
+        recall = float(np.mean(ann_idx[:, 0] == exact_idx[:, 0]))
+        print(f"{'ivf/' + str(nprobe):>12} {recall:>9.3f} {ann_ms:>9.3f} {exact_ms / ann_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+AI chat: reply cache and conversation (prefix) reuse.
+
+Runs the app's chat path (final_attendance_app.chat_replies) against
+benchmarks/stub_ollama.py, in a temporary folder with a synthetic log. The
+stub takes `--first-token` s plus `--per-prompt-token` s per prompt token
+before its first token, like a local model reading the prompt.
+
+  1. repeated   each of a few questions asked `--repeat` times, from fresh
+                conversations: the first is generated, the rest are cache
+                hits. Hit rate and the generation time they saved. A
+                follow-up after a hit continues on the cached exchange.
+  2. follow-up  one conversation of several questions: the first sends the
+                whole prompt, later ones only the new part plus the model
+                context from the previous answer. Each follow-up is also
+                asked in a fresh conversation for comparison.
+  3. new data   a new event arrives: the same question is generated again
+                (the data version changed), never served stale.
+
+    python benchmarks/bench_chat_cache.py
+    python benchmarks/bench_chat_cache.py --per-prompt-token 0.004 --repeat 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_ollama import start_stub  # noqa: E402
+
+QUESTIONS = [
+    "Is Student_7 in trouble?",
+    "Summarize the notes about Student_12",
+    "Any advice for the class on punctuality?",
+]
+FOLLOW_UPS = [
+    "Tell me about Student_3",
+    "And what about Student_4?",
+    "Which of them should I talk to first?",
+    "Write them a short reminder",
+]
+
+
+def ask(app, question, conversation):
+    t0 = time.perf_counter()
+    first, done = None, {}
+    for kind, data in app.chat_replies(question, conversation):
+        if kind == 'token' and first is None:
+            first = time.perf_counter() - t0
+        elif kind == 'done':
+            done = data
+        elif kind == 'error':
+            raise RuntimeError(data['reply'])
+    return first, time.perf_counter() - t0, done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--per-prompt-token", type=float, default=0.001)
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--repeat", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_stub(first_token=args.first_token, rate=args.rate, per_prompt_token=args.per_prompt_token)
+    with open(os.path.join(ROOT, "student_notes.md"), encoding="utf-8") as f:
+        notes = f.read()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        import final_attendance_app as app
+        app.EVENT_DB = os.path.join(tmp, "lobby_log.db")
+        app.LOG_FILE = os.path.join(tmp, "lobby_log.csv")
+        app.NOTES_FILE = os.path.join(tmp, "student_notes.md")
+        app.OLLAMA_URL = f"http://127.0.0.1:{server.server_port}/api/generate"
+        with open(app.NOTES_FILE, "w", encoding="utf-8") as f:
+            f.write(notes)
+        store = app.get_event_store()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        store.write_rows([(now, "ENTERED", f"Student_{i}", "", "Cam0") for i in range(20)])
+        store.flush()
+
+        print(f"stub: {args.first_token} s + {args.per_prompt_token * 1000:.1f} ms per prompt token to first token\n")
+        print(f"{'1. repeated':<14} {'source':>7} {'reply s':>8}")
+        for q in QUESTIONS:
+            for i in range(args.repeat):
+                _, total, done = ask(app, q, f"repeat-{q}-{i}")
+                print(f"{q[:14]:<14} {done.get('source', '?'):>7} {total:>8.3f}")
+        stats = app.chat_reply_cache.snapshot()
+        print(f"hit rate {stats['hit_rate']:.0%}, generation time saved {stats['saved_ms'] / 1000:.2f} s")
+        _, _, done = ask(app, FOLLOW_UPS[1], f"repeat-{QUESTIONS[0]}-1") # That conversation's answer was a hit
+        print(f"follow-up after a hit: {done.get('source')}, continued: {done.get('continued')}\n")
+        assert done.get('source') == 'ai' and done.get('continued')
+
+        print(f"{'2. follow-up':<14} {'continued s':>14} {'fresh s':>14}")
+        for i, q in enumerate(FOLLOW_UPS):
+            first, _, done = ask(app, q, "follow-up")
+            fresh = ask(app, q, f"fresh-{i}")[0] if done.get('continued') else first
+            print(f"{q[:14]:<14} {first:>14.3f} {fresh:>14.3f}")
+        stats = app.chat_conversations.snapshot()
+        print(f"{stats['prefix_reused']} follow-ups continued on the model context, "
+              f"{stats['prompt_chars_saved']} prompt characters not re-sent\n")
+
+        print("3. new data")
+        _, _, before = ask(app, QUESTIONS[0], "new-data-1")
+        store.write_rows([(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "EXITED", "Student_7", "", "Cam0")])
+        store.flush()
+        _, _, after = ask(app, QUESTIONS[0], "new-data-2")
+        print(f"before the event: {before.get('source')}, after: {after.get('source')}")
+        assert before.get('source') == 'cache' and after.get('source') == 'ai'
+        store.close()
+        os.chdir(ROOT)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
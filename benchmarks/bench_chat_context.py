@@ -0,0 +1,92 @@
+"""
+AI chat prompt size and build time: whole log vs. retrieved context.
+
+For each log size in `--rows` (default 10k, 100k, 1M synthetic events) builds
+the /api/chat context for a few typical questions:
+
+  full       the old get_logs_context(): every event as CSV, plus all notes
+  retrieved  chat_context.ContextBuilder: matched names/dates, daily summary,
+             ranked notes, within --budget tokens
+
+"cold" is the first question after start (it builds the daily summary from
+the whole log); "warm" is every later one. Prompt tokens are estimated at 4
+characters per token; time to first token grows with them (a 7B model on a
+CPU reads roughly 50-200 prompt tokens per second).
+
+    python benchmarks/bench_chat_context.py
+    python benchmarks/bench_chat_context.py --rows 10000 100000 --budget 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from event_log import EventStore, STORE_FORMAT  # noqa: E402
+from chat_context import ContextBuilder, estimate_tokens  # noqa: E402
+
+QUESTIONS = [
+    "Was Student_7 here today?",
+    "Who came in yesterday?",
+    "How long did Student 12 stay last week?",
+    "Is Vishwajeet in trouble?",
+]
+
+
+def fill_store(store, n, people=300):
+    t = datetime(2025, 1, 1, 8, 0, 0)
+    batch = []
+    for i in range(n):
+        t += timedelta(seconds=7)
+        event = "ENTERED" if (i // people) % 2 == 0 else "EXITED"
+        batch.append((t.strftime(STORE_FORMAT), event, f"Student_{i % people}", "", None))
+        if len(batch) == 50000:
+            store.write_rows(batch)
+            batch = []
+    if batch:
+        store.write_rows(batch)
+    store.flush()
+    return t.date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--budget", type=int, default=1500, help="context tokens for the retrieved prompt")
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "student_notes.md"), encoding="utf-8") as f:
+        notes = f.read()
+
+    print(f"{'rows':>9} {'context':>10} {'tokens':>9} {'build ms':>9}")
+    for n in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = EventStore(os.path.join(tmp, "lobby_log.db"))
+            today = fill_store(store, n)
+
+            t0 = time.perf_counter()
+            full = "".join(store.iter_csv()) + notes
+            full_ms = (time.perf_counter() - t0) * 1000
+            print(f"{n:>9} {'full':>10} {estimate_tokens(full):>9} {full_ms:>9.0f}")
+
+            builder = ContextBuilder(store, budget=args.budget)
+            t0 = time.perf_counter()
+            text, _ = builder.build(QUESTIONS[0], notes, today=today)
+            cold_ms = (time.perf_counter() - t0) * 1000
+            print(f"{n:>9} {'cold':>10} {estimate_tokens(text):>9} {cold_ms:>9.0f}")
+
+            tokens, times = [], []
+            for q in QUESTIONS:
+                t0 = time.perf_counter()
+                text, _ = builder.build(q, notes, today=today)
+                times.append((time.perf_counter() - t0) * 1000)
+                tokens.append(estimate_tokens(text))
+            print(f"{n:>9} {'warm':>10} {max(tokens):>9} {sum(times) / len(times):>9.1f}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+AI chat: blocking requests.post() vs. the pooled, streaming, queued client.
+
+Runs against benchmarks/stub_ollama.py (started here on a free port), which
+takes `--first-token` s to start and then writes `--rate` tokens/s, one
+reply at a time like a local model.
+
+  1. Time until the user sees text: the old call ("stream": False, new
+     connection each time) only returns when the whole reply is done;
+     ollama_client.OllamaClient.generate_stream() returns the first token.
+  2. Connections opened for `--questions` questions in a row.
+  3. `--users` people asking at once with OLLAMA_MAX_CONCURRENT=1 and a queue
+     of `--queue`: who waited (and the positions they were told), who was
+     turned away, and how many requests the model server had waiting.
+
+    python benchmarks/bench_chat_streaming.py
+    python benchmarks/bench_chat_streaming.py --first-token 2 --rate 8 --users 12
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ollama_client import OllamaClient, QueueFull  # noqa: E402
+from stub_ollama import start_stub  # noqa: E402
+
+PROMPT = "Who came in today? " * 50
+
+
+def stub_stats(base):
+    return requests.get(base + "stats", timeout=2).json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token", type=float, default=0.5)
+    parser.add_argument("--rate", type=float, default=20.0)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_stub(first_token=args.first_token, rate=args.rate)
+    base = f"http://127.0.0.1:{server.server_port}/"
+    url = base + "api/generate"
+
+    # 1 + 2. Sequential questions
+    conns = stub_stats(base)['connections']
+    waits = []
+    for _ in range(args.questions):
+        t0 = time.perf_counter()
+        requests.post(url, json={"model": "stub", "prompt": PROMPT, "stream": False}, timeout=90).json()
+        waits.append(time.perf_counter() - t0)
+    old_conns = stub_stats(base)['connections'] - conns - 1 # Not counting the stats request itself
+
+    client = OllamaClient(url, "stub")
+    conns = stub_stats(base)['connections']
+    firsts, totals = [], []
+    for _ in range(args.questions):
+        t0 = time.perf_counter()
+        for kind, _ in client.generate_stream(PROMPT):
+            if kind == 'token' and len(firsts) < len(totals) + 1:
+                firsts.append(time.perf_counter() - t0)
+        totals.append(time.perf_counter() - t0)
+    new_conns = stub_stats(base)['connections'] - conns - 1
+
+    print(f"{args.questions} questions in a row (stub: {args.first_token} s to first token, {args.rate:.0f} tokens/s)\n")
+    print(f"{'client':>10} {'first text s':>13} {'reply done s':>13} {'connections':>12}")
+    print(f"{'blocking':>10} {sum(waits) / len(waits):>13.2f} {sum(waits) / len(waits):>13.2f} {old_conns:>12}")
+    print(f"{'streaming':>10} {sum(firsts) / len(firsts):>13.2f} {sum(totals) / len(totals):>13.2f} {new_conns:>12}")
+
+    # 3. Simultaneous users
+    client = OllamaClient(url, "stub", max_concurrent=1, max_queue=args.queue)
+    server.stats['max_waiting'] = 0
+    results = [None] * args.users
+
+    def ask(i):
+        positions, t0 = [], time.perf_counter()
+        try:
+            first = None
+            for kind, data in client.generate_stream(PROMPT):
+                if kind == 'queued':
+                    positions.append(data['position'])
+                elif kind == 'token' and first is None:
+                    first = time.perf_counter() - t0
+            results[i] = ("answered", first, positions)
+        except QueueFull:
+            results[i] = ("busy", time.perf_counter() - t0, positions)
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(args.users)]
+    for t in threads:
+        t.start()
+        time.sleep(0.01) # Arrive in order
+    for t in threads:
+        t.join()
+
+    print(f"\n{args.users} users at once, 1 generation at a time, queue of {args.queue}\n")
+    print(f"{'user':>5} {'result':>9} {'first text s':>13}  positions told")
+    for i, (result, secs, positions) in enumerate(results):
+        told = " -> ".join(str(p) for p in dict.fromkeys(positions)) or "-"
+        print(f"{i + 1:>5} {result:>9} {secs:>13.2f}  {told}")
+    print(f"\nrequests waiting at the model server at most: {server.stats['max_waiting']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+/api/logs latency: legacy lobby_log.csv vs. the SQLite event store.
+
+Builds a synthetic log of `--rows` events (default 1,000,000) both as a CSV
+and as lobby_log.db, then times what /api/logs does per dashboard poll:
+
+  csv     the old handler: csv.DictReader over the whole file, keep the last 500
+  sqlite  GET /api/logs through Flask's test client (latest 500)
+
+plus the cursor API: an idle dashboard's ?since= poll answered 304 via
+If-None-Match, a ?since= poll with 10 new rows, a name filter and a date range.
+
+Also reports the one-shot CSV import time. Files go to a temporary directory.
+
+    python benchmarks/bench_event_store.py
+    python benchmarks/bench_event_store.py --rows 100000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from event_log import EventStore, LOG_HEADER, DISPLAY_FORMAT  # noqa: E402
+
+REPEATS = 5
+PEOPLE = 300 # synthetic_rows() cycles through Student_0 .. Student_299
+
+
+def synthetic_rows(n, people=PEOPLE):
+    t = datetime(2025, 1, 1, 8, 0, 0)
+    for i in range(n):
+        t += timedelta(seconds=7)
+        name = f"Student_{i % people}"
+        event = "ENTERED" if (i // people) % 2 == 0 else "EXITED"
+        photo = f"attendance_photos/Attendance_{name}_{t:%Y%m%d_%H%M%S}.jpg" if event == "ENTERED" else ""
+        yield t.strftime(DISPLAY_FORMAT), event, name, photo
+
+
+def legacy_api_logs(path):
+    entries = []
+    with open(path, 'r') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            entries.append(row)
+    return entries[-500:][::-1]
+
+
+def best_ms(fn, rows=500):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    if rows is not None:
+        assert len(result) == rows, len(result)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "lobby_log.csv")
+        db_path = os.path.join(tmp, "lobby_log.db")
+        with open(csv_path, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(LOG_HEADER)
+            writer.writerows(synthetic_rows(args.rows))
+        print(f"{args.rows} events, CSV {os.path.getsize(csv_path) / 1e6:.0f} MB\n")
+
+        store = EventStore(db_path)
+        t0 = time.perf_counter()
+        imported, _ = store.import_csv(csv_path)
+        print(f"import: {imported} rows in {time.perf_counter() - t0:.1f}s, "
+              f"DB {os.path.getsize(db_path) / 1e6:.0f} MB\n")
+
+        os.chdir(ROOT)
+        import final_attendance_app as visor
+        visor.event_store = store
+        client = visor.app.test_client()
+
+        def events(url, **kw):
+            return client.get(url, **kw).get_json()['events']
+
+        cursor = store.last_id()
+        idle = client.get(f"/api/logs?since={cursor}")
+        etag = idle.headers['ETag']
+
+        def idle_poll():
+            response = client.get(f"/api/logs?since={cursor}", headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            return []
+
+        last_day = store.query(limit=1)[0]['Timestamp'].split(' ')[0]
+        page = min(500, args.rows)
+        student_7 = min(500, max(0, (args.rows - 8) // PEOPLE + 1)) # Rows i with i % PEOPLE == 7
+        print(f"{'request':>28} {'ms':>9}")
+        print(f"{'csv: last 500':>28} {best_ms(lambda: legacy_api_logs(csv_path), rows=page):>9.1f}")
+        print(f"{'sqlite: last 500':>28} {best_ms(lambda: events('/api/logs'), rows=page):>9.1f}")
+        print(f"{'since=cursor, idle (304)':>28} {best_ms(idle_poll, rows=0):>9.2f}")
+        print(f"{'since=cursor-10':>28} {best_ms(lambda: events(f'/api/logs?since={cursor - 10}'), rows=10):>9.2f}")
+        print(f"{'name=Student_7':>28} {best_ms(lambda: events('/api/logs?name=Student_7'), rows=student_7):>9.1f}")
+        print(f"{'from=to=last day':>28} "
+              f"{best_ms(lambda: events(f'/api/logs?from={last_day}&to={last_day}'), rows=None):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+MJPEG load test: process CPU and latency vs. number of viewers, per-client
+encode + polling vs. the shared MjpegBroadcaster on a FrameHub.
+
+A publisher thread publishes a 640x480 frame at `--fps` (like the render
+thread). N viewer threads drain a stream generator as fast as it yields, the
+same way Flask writes it to a socket. "legacy" is the old generate_frames:
+every viewer polls a shared buffer every 40 ms and runs cv2.imencode on it.
+"broadcast" is mjpeg_stream.py: viewers wake on publish and each frame is
+encoded once, whatever the number of viewers. Latency is frame capture ->
+bytes handed to the server.
+
+    python benchmarks/bench_mjpeg_viewers.py
+    python benchmarks/bench_mjpeg_viewers.py --viewers 1 2 5 10 20 --seconds 5
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mjpeg_stream import MjpegBroadcaster  # noqa: E402
+from vision_pipeline import FrameHub  # noqa: E402
+
+
+class Publisher(threading.Thread):
+    def __init__(self, frame, fps):
+        super().__init__(daemon=True)
+        self.frame, self.fps = frame, fps
+        self.current, self.current_time = None, 0.0
+        self.hub = FrameHub()
+        self.running = True
+
+    def run(self):
+        rng = np.random.default_rng(0)
+        while self.running:
+            f = self.frame.copy()
+            # Change a patch so every frame is a genuinely new image to encode
+            y, x = rng.integers(0, 400), rng.integers(0, 560)
+            f[y:y + 80, x:x + 80] = rng.integers(0, 255, 3)
+            now = time.time()
+            self.current, self.current_time = f, now
+            self.hub.publish(f, now)
+            time.sleep(1.0 / self.fps)
+
+
+def legacy_stream(pub, stop, latencies):
+    # The old per-client generator: encode whatever is there, sleep 40 ms
+    while not stop.is_set():
+        if pub.current is None:
+            time.sleep(0.1)
+            continue
+        frame, captured = pub.current, pub.current_time
+        ret, buffer = cv2.imencode('.jpg', frame)
+        latencies.append((time.time() - captured) * 1000)
+        yield b'--frame\r\n' + buffer.tobytes()
+        time.sleep(0.04)
+
+
+def measure(mode, viewers, pub, seconds, viewer_fps):
+    stop = threading.Event()
+    broadcaster = MjpegBroadcaster(pub.hub)
+    sent = [0] * viewers
+    legacy_latencies = []
+
+    def viewer(i):
+        gen = legacy_stream(pub, stop, legacy_latencies) if mode == "legacy" else broadcaster.stream(max_fps=viewer_fps)
+        for _ in gen:
+            sent[i] += 1
+            if stop.is_set():
+                break
+        gen.close()
+
+    threads = [threading.Thread(target=viewer, args=(i,), daemon=True) for i in range(viewers)]
+    for t in threads:
+        t.start()
+    time.sleep(0.5) # Warm-up
+    sent_before = sum(sent)
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    time.sleep(seconds)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - t0
+    frames = sum(sent) - sent_before
+    if mode == "legacy":
+        latency = np.mean(legacy_latencies) if legacy_latencies else float("nan")
+    else:
+        clients = broadcaster.snapshot()['clients'].values()
+        latency = np.mean([c['latency_ms'] for c in clients]) if clients else float("nan")
+    stop.set()
+    for t in threads:
+        t.join(timeout=2.0)
+    return 100.0 * cpu / wall, frames / wall / viewers, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--fps", type=float, default=30.0, help="camera frame rate")
+    parser.add_argument("--viewer-fps", type=float, default=25.0, help="?fps= asked by broadcast viewers")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--image", default=os.path.join("faces", "Obama.jpg"))
+    args = parser.parse_args()
+
+    image = cv2.imread(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), args.image))
+    if image is None:
+        image = np.random.default_rng(1).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    frame = cv2.resize(image, (640, 480))
+
+    pub = Publisher(frame, args.fps)
+    pub.start()
+    print(f"camera {args.fps:.0f} fps, 640x480\n")
+    print(f"{'viewers':>8} {'mode':>10} {'CPU %':>7} {'fps/viewer':>11} {'latency ms':>11}")
+    for n in args.viewers:
+        for mode in ("legacy", "broadcast"):
+            cpu, fps, latency = measure(mode, n, pub, args.seconds, args.viewer_fps)
+            print(f"{n:>8} {mode:>10} {cpu:>7.0f} {fps:>11.1f} {latency:>11.1f}")
+    pub.running = False
+
+
+if __name__ == "__main__":
+    main()
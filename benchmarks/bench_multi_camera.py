@@ -0,0 +1,128 @@
+"""
+Multi-camera throughput benchmark: total faces recognized per second as
+cameras are added to one shared inference pool.
+
+Each "camera" replays the same photo (default faces/Obama.jpg) at `--fps`
+through the real FrameGrabber -> InferenceScheduler -> inference_worker
+path of final_attendance_app.py (SURVEILLANCE mode, every frame submitted,
+no render/recording). Needs the YuNet + SFace models in models/.
+
+    python benchmarks/bench_multi_camera.py
+    python benchmarks/bench_multi_camera.py --max-cameras 8 --workers 2 --batch 4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT) # BASE_DIR and model paths are relative to the repo
+import final_attendance_app as visor  # noqa: E402
+from vision_pipeline import FrameGrabber, InferenceScheduler  # noqa: E402
+
+
+class LoopingCapture:
+    """Stands in for cv2.VideoCapture: returns the same frame at a fixed rate."""
+
+    def __init__(self, frame, fps):
+        self.frame = frame
+        self.interval = 1.0 / fps
+        self.next_time = time.perf_counter()
+
+    def read(self):
+        delay = self.next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time + self.interval, time.perf_counter())
+        return True, self.frame.copy()
+
+    def release(self):
+        pass
+
+
+def run(n_cameras, frame, args):
+    visor.cameras.clear()
+    visor.inference_scheduler = InferenceScheduler()
+    visor.pipeline_stats.counters.clear()
+    visor.INFERENCE_BATCH = args.batch
+
+    for i in range(n_cameras):
+        cam = visor.CameraState({"id": f"cam{i}", "label": f"Cam {i}"})
+        cam.capture = LoopingCapture(frame, args.fps)
+        cam.grabber = FrameGrabber(cam.capture, visor.pipeline_stats, name=f"cam{i}/grab")
+        visor.cameras[cam.id] = cam
+
+    workers = [threading.Thread(target=visor.inference_worker, args=(visor.create_models(),), daemon=True)
+               for _ in range(args.workers)]
+    for t in workers:
+        t.start()
+
+    stop = threading.Event()
+
+    def feed(cam):
+        # The render thread's hand-off, without the drawing
+        last_seq = 0
+        while not stop.is_set():
+            last_seq, f, _ = cam.grabber.read(last_seq, timeout=0.5)
+            if f is not None:
+                visor.inference_scheduler.submit(cam.id, (f, "SURVEILLANCE"))
+
+    feeders = []
+    for cam in visor.cameras.values():
+        cam.grabber.start()
+        feeders.append(threading.Thread(target=feed, args=(cam,), daemon=True))
+        feeders[-1].start()
+
+    time.sleep(args.warmup)
+    start_faces = visor.pipeline_stats.counters.get('faces_recognized', 0)
+    t0 = time.perf_counter()
+    time.sleep(args.seconds)
+    elapsed = time.perf_counter() - t0
+    faces = visor.pipeline_stats.counters.get('faces_recognized', 0) - start_faces
+
+    stop.set()
+    for cam in visor.cameras.values():
+        cam.grabber.stop()
+    visor.inference_scheduler.close()
+    for t in workers + feeders:
+        t.join(timeout=2.0)
+    dropped = sum(visor.inference_scheduler.dropped.values())
+    return faces / elapsed, dropped / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", default=os.path.join("faces", "Obama.jpg"))
+    parser.add_argument("--max-cameras", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1, help="inference worker threads")
+    parser.add_argument("--batch", type=int, default=4, help="max frames per worker pass")
+    parser.add_argument("--fps", type=float, default=30.0, help="frames/sec per fake camera")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--warmup", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if not os.path.exists(visor.DETECTOR_PATH) or not os.path.exists(visor.RECOGNIZER_PATH):
+        print("❌ Models not found! Run 'download_models.py' first.")
+        return
+    image = cv2.imread(args.image)
+    if image is None:
+        print(f"❌ Could not read {args.image}")
+        return
+    frame = cv2.resize(image, (visor.FRAME_WIDTH, visor.FRAME_HEIGHT))
+
+    # The gallery only has to exist; what matters is the per-face cost
+    visor.reload_gallery()
+
+    print(f"{args.workers} worker(s), batch {args.batch}, {args.fps:.0f} fps per camera\n")
+    print(f"{'cameras':>8} {'faces/s':>9} {'dropped/s':>10}")
+    for n in range(1, args.max_cameras + 1):
+        faces_per_sec, dropped_per_sec = run(n, frame, args)
+        print(f"{n:>8} {faces_per_sec:>9.1f} {dropped_per_sec:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
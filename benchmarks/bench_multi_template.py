@@ -0,0 +1,125 @@
+"""
+Latency + accuracy benchmark: single-template vs. centroid vs. max-over-templates.
+
+Real mode (needs the YuNet/SFace models): enrolls `--enroll-dir` (laid out
+like faces/, i.e. faces/<name>/*.jpg or faces/<name>.jpg) and probes with a
+labelled `--test-dir` laid out as <test-dir>/<name>/*.jpg. Folders whose name
+is not enrolled count as impostors.
+
+Synthetic mode (default): simulates identities whose photos fall into a few
+pose/lighting clusters, enrolls 1 or several photos per person, and probes
+with fresh photos plus impostors.
+
+Reports, at COSINE_THRESHOLD: TAR (genuine probe matched to the right person),
+FAR (impostor accepted as anyone) and match latency per face.
+
+    python benchmarks/bench_multi_template.py
+    python benchmarks/bench_multi_template.py --enroll-dir faces --test-dir faces_test
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from face_gallery import FaceGallery, COSINE_THRESHOLD, UNKNOWN_NAME, l2_normalize  # noqa: E402
+
+
+def synthetic_data(people, photos, probes, poses, rng):
+    """Returns (enroll {name: (n,128)}, probe features, probe labels); label None = impostor."""
+    def person():
+        center = l2_normalize(rng.standard_normal((1, 128)))
+        modes = center + 0.9 * l2_normalize(rng.standard_normal((poses, 128)))
+        return modes
+
+    def photo(modes):
+        mode = modes[rng.integers(len(modes))]
+        return l2_normalize(mode + 0.7 * l2_normalize(rng.standard_normal((1, 128))))
+
+    everyone = [person() for _ in range(people)]
+    enroll = {f"person_{i}": np.vstack([photo(m) for _ in range(photos)]) for i, m in enumerate(everyone)}
+
+    feats, labels = [], []
+    for _ in range(probes):
+        i = int(rng.integers(people))
+        feats.append(photo(everyone[i]))
+        labels.append(f"person_{i}")
+    for _ in range(probes // 2):
+        feats.append(photo(person()))
+        labels.append(None)
+    return enroll, np.vstack(feats), labels
+
+
+def real_data(enroll_dir, test_dir):
+    import reencode_faces as rf
+    rf._init_worker()
+
+    def embed_tree(base):
+        out = {}
+        for rel in sorted(rf.scan_faces_dir(base)):
+            feature, message = rf.embed_file(os.path.join(base, rel))
+            if feature is None:
+                print(message)
+                continue
+            out.setdefault(rf.identity_name(rel), []).append(feature.reshape(1, -1))
+        return {name: np.vstack(f) for name, f in out.items()}
+
+    enroll = embed_tree(enroll_dir)
+    tests = embed_tree(test_dir)
+    feats, labels = [], []
+    for name, f in tests.items():
+        feats.append(f)
+        labels += [name if name in enroll else None] * len(f)
+    return enroll, np.vstack(feats), labels
+
+
+def evaluate(gallery, feats, labels, threshold):
+    t0 = time.perf_counter()
+    results = [gallery.best_match(f, threshold) for f in feats]
+    ms = (time.perf_counter() - t0) * 1000 / len(feats)
+
+    genuine = [(r, l) for r, l in zip(results, labels) if l is not None]
+    impostor = [r for r, l in zip(results, labels) if l is None]
+    tar = np.mean([name == label for (name, _), label in genuine]) if genuine else float("nan")
+    far = np.mean([name != UNKNOWN_NAME for name, _ in impostor]) if impostor else float("nan")
+    return tar, far, ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enroll-dir", help="labelled enrollment photos (real mode)")
+    parser.add_argument("--test-dir", help="labelled probe photos (real mode)")
+    parser.add_argument("--people", type=int, default=2000)
+    parser.add_argument("--photos", type=int, default=5, help="enrolled photos per person (synthetic)")
+    parser.add_argument("--poses", type=int, default=3, help="appearance clusters per person (synthetic)")
+    parser.add_argument("--probes", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=COSINE_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.enroll_dir and args.test_dir:
+        os.chdir(ROOT) # model paths in reencode_faces.py are relative to the repo
+        enroll, feats, labels = real_data(args.enroll_dir, args.test_dir)
+    else:
+        rng = np.random.default_rng(0)
+        enroll, feats, labels = synthetic_data(args.people, args.photos, args.probes, args.poses, rng)
+
+    names = list(enroll)
+    configs = [
+        ("single photo", FaceGallery.from_templates(names, [t[:1] for t in enroll.values()])),
+        ("centroid", FaceGallery.from_templates(names, list(enroll.values()), scoring="centroid")),
+        ("max", FaceGallery.from_templates(names, list(enroll.values()), scoring="max")),
+    ]
+    templates = sum(len(t) for t in enroll.values())
+    print(f"{len(names)} people, {templates} enrolled photos, {len(feats)} probes "
+          f"({labels.count(None)} impostors), threshold {args.threshold}\n")
+    print(f"{'scoring':>13} {'TAR':>7} {'FAR':>7} {'ms/face':>9}")
+    for label, gallery in configs:
+        tar, far, ms = evaluate(gallery, feats, labels, args.threshold)
+        print(f"{label:>13} {tar:>7.3f} {far:>7.3f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+/api/photos latency: the old directory scan vs. the photo index.
+
+Fills a temporary folder with `--photos` empty Attendance_<Name>_<date>.jpg
+files (default 30,000, about a term of entries) and times:
+
+  scan       the old handler: listdir + getmtime sort + getmtime per file, every photo
+  load       PhotoIndex.load() on start: with no saved index, then with one
+  page       one /api/photos page (60 newest) from the index
+  name/date  a name filter and a one-day range
+
+    python benchmarks/bench_photo_index.py
+    python benchmarks/bench_photo_index.py --photos 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from photo_index import PhotoIndex  # noqa: E402
+
+REPEATS = 5
+
+
+def legacy_scan(photos_dir):
+    files = [f for f in os.listdir(photos_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    files.sort(key=lambda x: os.path.getmtime(os.path.join(photos_dir, x)), reverse=True)
+    photo_data = []
+    for filename in files:
+        parts = filename.split('_')
+        display_name = " ".join(parts[1:-2]) if len(parts) >= 3 and parts[0] == "Attendance" else "Unknown"
+        dt = datetime.fromtimestamp(os.path.getmtime(os.path.join(photos_dir, filename)))
+        photo_data.append({'filename': filename, 'name': display_name,
+                           'timestamp': dt.strftime("%Y-%m-%d %I:%M:%S %p"), 'url': f'/photos/{filename}'})
+    return photo_data
+
+
+def best_ms(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=30_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t = datetime(2025, 1, 6, 8, 0, 0)
+        for i in range(args.photos):
+            t += timedelta(seconds=97)
+            open(os.path.join(tmp, f"Attendance_Student_{i % 300}_{t:%Y%m%d_%H%M%S}.jpg"), 'wb').close()
+        last_day = t.strftime("%Y-%m-%d")
+
+        def cold_load():
+            index_file = os.path.join(tmp, ".photo_index.json")
+            if os.path.exists(index_file):
+                os.remove(index_file)
+            PhotoIndex(tmp).load()
+
+        index = PhotoIndex(tmp)
+        index.load()
+        print(f"{args.photos} photos\n")
+        print(f"{'request':>24} {'ms':>9}")
+        print(f"{'scan: all photos':>24} {best_ms(lambda: legacy_scan(tmp)):>9.1f}")
+        print(f"{'load: no saved index':>24} {best_ms(cold_load):>9.1f}")
+        print(f"{'load: saved index':>24} {best_ms(lambda: PhotoIndex(tmp).load()):>9.1f}")
+        print(f"{'index: newest page':>24} {best_ms(lambda: index.query(limit=60)):>9.2f}")
+        print(f"{'index: page 100':>24} {best_ms(lambda: index.query(offset=99 * 60, limit=60)):>9.2f}")
+        print(f"{'index: name=student 7':>24} {best_ms(lambda: index.query(name='student 7', limit=60)):>9.2f}")
+        print(f"{'index: last day':>24} {best_ms(lambda: index.query(date_from=last_day, date_to=last_day)):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
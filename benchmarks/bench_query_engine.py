@@ -0,0 +1,195 @@
+"""
+Attendance questions: query engine vs. the whole log as an LLM prompt.
+
+Generates `--days` of synthetic visits for `--people` people (each one comes
+in on some days, once or twice, and stays a known time), then:
+
+  1. checks attendance_query.AttendanceQuery's answers against the known
+     visits (presence, duration, attendees, count, visits), on a log with
+     missing exits, and on open-ended questions it must not answer, failing
+     loudly on a mismatch, and
+  2. times each intent against building the old prompt (every event as CSV),
+     which the LLM then has to read before it can answer.
+
+    python benchmarks/bench_query_engine.py
+    python benchmarks/bench_query_engine.py --people 500 --days 120
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from event_log import EventStore, STORE_FORMAT  # noqa: E402
+from attendance_query import AttendanceQuery, format_duration  # noqa: E402
+from chat_context import estimate_tokens, parse_dates  # noqa: E402
+
+
+def generate(store, people, days, today, seed=0):
+    """Writes the log; returns the ground truth {day: {name: [seconds per visit]}}."""
+    rng = random.Random(seed)
+    truth, rows = {}, []
+    for d in range(days):
+        day = today - timedelta(days=days - 1 - d)
+        for p in range(people):
+            if rng.random() < 0.4:
+                continue
+            name = f"Student_{p}"
+            t = datetime.combine(day, datetime.min.time()) + timedelta(hours=8, minutes=rng.randrange(0, 120))
+            for _ in range(rng.choice((1, 1, 2))):
+                stay = rng.randrange(5, 90) * 60
+                rows.append((t.strftime(STORE_FORMAT), "ENTERED", name, "", "Cam0"))
+                rows.append(((t + timedelta(seconds=stay)).strftime(STORE_FORMAT), "EXITED", name, "", "Cam0"))
+                truth.setdefault(day, {}).setdefault(name, []).append(stay)
+                t += timedelta(seconds=stay + rng.randrange(10, 60) * 60)
+    rows.sort(key=lambda r: r[0])
+    for i in range(0, len(rows), 50000):
+        store.write_rows(rows[i:i + 50000])
+    store.flush()
+    return truth, len(rows)
+
+
+def check(engine, truth, today, people):
+    now = datetime.combine(today, datetime.max.time().replace(microsecond=0))
+    checked = 0
+    for day, present in truth.items():
+        when = "today" if day == today else day.isoformat()
+        intent, text = engine.answer(f"How many people came {when}?", now)
+        assert intent == "count" and text.startswith(f"{len(present)} "), (day, text)
+        intent, text = engine.answer(f"Who came in {when}?", now)
+        assert intent == "attendees" and text.startswith(f"{len(present)} came in"), (day, text)
+        for p in range(0, people, max(1, people // 20)):
+            name = f"Student_{p}"
+            if name.lower() not in engine.names:
+                continue # Never in the log: not a name the engine can know
+            intent, text = engine.answer(f"Was {name} here {when}?", now)
+            assert intent == "presence" and text.startswith("Yes" if name in present else "No"), (name, day, text)
+            if name in present:
+                intent, text = engine.answer(f"How long did {name} stay {when}?", now)
+                expected = f"{name} spent {format_duration(sum(present[name]))} "
+                assert intent == "duration" and text.startswith(expected), (name, day, text, expected)
+                intent, text = engine.answer(f"How many times did {name} come {when}?", now)
+                n = len(present[name])
+                assert intent == "visits" and f" {n} time" in text, (name, day, text)
+            checked += 1
+    return checked
+
+
+def check_dates(today):
+    """Month-day dates are read from month names only, never from words that start like one."""
+    feb_11 = date(today.year if today >= date(today.year, 2, 11) else today.year - 1, 2, 11)
+    cases = {
+        "Was Student 12 here on feb 11?": feb_11,
+        "Did Student_3 come on 11th February?": feb_11,
+        "Did Marcus 2 come?": None,
+        "Was Mary 3 here?": None,
+        "Who decided 3 times to leave early?": None,
+        "Did anyone read 5 novels?": None,
+    }
+    for question, expected in cases.items():
+        got = parse_dates(question, today)[0]
+        assert got == expected, (question, got, expected)
+    return len(cases)
+
+
+def check_edge_cases(path, today):
+    """
+    A visit whose exit was never logged must not swallow the person's later
+    visits, a name that reads like a date ("May 5") is a person, and
+    open-ended questions are left to the LLM.
+    """
+    yesterday = today - timedelta(days=1)
+
+    def at(d, hhmm):
+        return f"{d.isoformat()} {hhmm}:00"
+
+    store = EventStore(path)
+    store.write_rows([
+        (at(yesterday, "09:00"), "ENTERED", "Ghost", "", "Cam0"), # Exit lost overnight
+        (at(today, "08:00"), "ENTERED", "Ghost", "", "Cam0"), # Exit lost (app restarted)
+        (at(today, "08:00"), "ENTERED", "Ghost", "", "Cam0"), # Duplicate entry
+        (at(today, "13:00"), "ENTERED", "Ghost", "", "Cam0"),
+        (at(today, "13:20"), "EXITED", "Ghost", "", "Cam0"),
+        (at(today, "09:00"), "ENTERED", "May_5", "", "Cam0"),
+        (at(today, "09:30"), "EXITED", "May_5", "", "Cam0"),
+        (at(today, "10:00"), "ENTERED", "Marcus_2", "", "Cam0"),
+        (at(today, "10:45"), "EXITED", "Marcus_2", "", "Cam0"),
+    ])
+    store.flush()
+    engine = AttendanceQuery(store)
+    now = datetime.combine(today, datetime.min.time()) + timedelta(hours=18)
+    expected = [
+        ("Was Ghost here today?", "presence", "Yes, Ghost was here today: first came in at 08:00 AM, last left at 01:20 PM."),
+        ("How long did Ghost stay today?", "duration", "Ghost spent 20 min in the lobby today over 2 visits (1 without a recorded exit, not counted)."),
+        ("How many times did Ghost come today?", "visits", "Ghost came in 2 times today."),
+        ("When did Ghost leave today?", "arrival", "Ghost last left at 01:20 PM today."),
+        ("How long did Ghost stay yesterday?", "duration", "Ghost spent 0 min in the lobby yesterday over 1 visit (1 without a recorded exit, not counted)."),
+        ("How long did May 5 stay?", "duration", "May_5 spent 30 min in the lobby today over 1 visit."),
+        ("When did May 5 arrive?", "arrival", "May_5 first came in at 09:00 AM today."),
+        ("Did Marcus 2 come?", "presence", "Yes, Marcus_2 was here today: first came in at 10:00 AM, last left at 10:45 AM."),
+        ("How many times did Marcus 2 come?", "visits", "Marcus_2 came in 1 time today."),
+    ]
+    for question, intent, text in expected:
+        got = engine.answer(question, now)
+        assert got == (intent, text), (question, got)
+    assert engine.present_now() == [], engine.present_now()
+    # Open-ended questions go to the LLM even though they name someone and say "come"
+    for question in ("Why does Ghost never come to class on time? check his notes",
+                     "Tell me about Ghost attendance habits", "Any advice for Ghost on coming in earlier?"):
+        assert engine.answer(question, now) is None, question
+    store.close()
+    return len(expected) + 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--people", type=int, default=300)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=50, help="answers timed per intent")
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EventStore(os.path.join(tmp, "lobby_log.db"))
+        truth, n_rows = generate(store, args.people, args.days, today)
+        print(f"{n_rows} events, {args.people} people, {args.days} days\n")
+
+        engine = AttendanceQuery(store, lobby=lambda: ["Student_1"])
+        t0 = time.perf_counter()
+        engine.refresh()
+        print(f"index build: {(time.perf_counter() - t0) * 1000:.0f} ms")
+        checked = check(engine, truth, today, args.people)
+        print(f"correctness: {checked} person-days checked against the generated visits, all match")
+        print(f"dates: {check_dates(today)} questions parsed as expected")
+        print(f"edge cases: {check_edge_cases(os.path.join(tmp, 'edge_cases.db'), today)} answers checked\n")
+
+        questions = [
+            ("lobby", "Who is in the lobby right now?"),
+            ("presence", "Was Student_7 here today?"),
+            ("duration", "How long did Student_12 stay yesterday?"),
+            ("arrival", "When did Student_3 arrive today?"),
+            ("visits", "How many times did Student_9 come this week?"),
+            ("attendees", "Who came in yesterday?"),
+            ("count", "How many people came last week?"),
+        ]
+        print(f"{'intent':>10} {'ms/answer':>10}")
+        for intent, q in questions:
+            got = engine.answer(q)
+            assert got is not None and got[0] == intent, (q, got)
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                engine.answer(q)
+            print(f"{intent:>10} {(time.perf_counter() - t0) * 1000 / args.repeat:>10.2f}")
+
+        t0 = time.perf_counter()
+        full = "".join(store.iter_csv())
+        full_ms = (time.perf_counter() - t0) * 1000
+        print(f"\nfull-log prompt: {full_ms:.0f} ms to build, ~{estimate_tokens(full)} tokens for the LLM to read")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
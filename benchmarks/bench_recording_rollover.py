@@ -0,0 +1,95 @@
+"""
+Recording cost on the render thread: inline VideoWriter vs. the Recorder thread.
+
+Feeds `--seconds` of 640x480 frames at `--fps` with segments of
+`--segment` seconds, and times what the render loop spends per frame on
+recording:
+
+  inline    the old loop: video_writer.write() in the loop, and at every
+            rollover release() + a fresh avc1 -> mp4v -> vp09 probe
+  recorder  recorder.Recorder: write() only queues; encoding, pre-opened
+            segments and the remembered codec are on its own thread
+
+Files go to a temporary directory.
+
+    python benchmarks/bench_recording_rollover.py
+    python benchmarks/bench_recording_rollover.py --seconds 20 --segment 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import recorder  # noqa: E402
+
+
+def legacy_start(path, w, h):
+    writer = None
+    for codec in recorder.CODECS:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), 20.0, (w, h))
+        if writer.isOpened():
+            return writer
+        writer.release()
+    return writer
+
+
+def run(mode, frames, fps, segment, tmp):
+    h, w = frames[0].shape[:2]
+    costs = []
+    if mode == "recorder":
+        rec = recorder.Recorder(tmp, f"bench_{mode}", segment_duration=segment, fps=fps)
+        rec.start()
+    else:
+        writer, seg_start, n = None, 0.0, 0
+    t_start = time.time()
+    for i, frame in enumerate(frames):
+        now = t_start + i / fps # Frame clock (the loop sleeps to keep real time below)
+        t0 = time.perf_counter()
+        if mode == "recorder":
+            rec.write(frame, now)
+        else:
+            if writer is None or now - seg_start > segment:
+                if writer is not None:
+                    writer.release()
+                n += 1
+                writer = legacy_start(os.path.join(tmp, f"legacy_{n}.mp4"), w, h)
+                seg_start = now
+            writer.write(frame)
+        cost = time.perf_counter() - t0
+        costs.append(cost * 1000)
+        time.sleep(max(0.0, 1.0 / fps - cost))
+    if mode == "recorder":
+        rec.close()
+        dropped = rec.queue.dropped
+    else:
+        writer.release()
+        dropped = 0
+    return np.mean(costs), np.percentile(costs, 99), max(costs), dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=20.0)
+    parser.add_argument("--segment", type=float, default=3.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    frames = [np.roll(base, i * 4, axis=1) for i in range(int(args.seconds * args.fps))]
+
+    print(f"{len(frames)} frames at {args.fps:.0f} fps, {args.segment:.0f} s segments\n")
+    print(f"{'mode':>9} {'mean ms':>9} {'p99 ms':>8} {'max ms':>8} {'dropped':>8}")
+    for mode in ("inline", "recorder"):
+        with tempfile.TemporaryDirectory() as tmp:
+            mean, p99, worst, dropped = run(mode, frames, args.fps, args.segment, tmp)
+        print(f"{mode:>9} {mean:>9.2f} {p99:>8.2f} {worst:>8.2f} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+/api/status: probing Ollama per request vs. the background health monitor.
+
+Simulates `--dashboards` dashboards each calling /api/status `--calls`
+times, with the model server (benchmarks/stub_ollama.py) up, then hung (a
+socket that accepts connections but never answers, e.g. a model loading):
+
+  per-request  the old handler: requests.get("http://localhost:11434/",
+               timeout=0.2) inside every call
+  monitor      the app's /api/status (Flask test client): the last result of
+               health_monitor.HealthMonitor, which probes on its own interval
+               and backs off while the server is down
+
+Reports ms per status call and how many probes reached the model server.
+
+    python benchmarks/bench_status.py
+    python benchmarks/bench_status.py --dashboards 20 --calls 50
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_ollama import start_stub  # noqa: E402
+
+
+def hung_server():
+    """Listens (so connects succeed) but never reads or answers."""
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    s.listen(1024)
+    return s
+
+
+def run(call, dashboards, calls):
+    def dashboard(_):
+        times = []
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            call()
+            times.append((time.perf_counter() - t0) * 1000)
+        return times
+    with ThreadPoolExecutor(dashboards) as pool:
+        times = [t for ts in pool.map(dashboard, range(dashboards)) for t in ts]
+    return sum(times) / len(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dashboards", type=int, default=10)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    server = start_stub()
+    up_url = f"http://127.0.0.1:{server.server_port}/"
+    hung = hung_server()
+    hung_url = f"http://127.0.0.1:{hung.getsockname()[1]}/"
+
+    def old_status(url):
+        def call():
+            try:
+                return requests.get(url, timeout=0.2).status_code == 200
+            except Exception:
+                return False
+        return call
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        import final_attendance_app as app
+        app.EVENT_DB = os.path.join(tmp, "lobby_log.db")
+        app.LOG_FILE = os.path.join(tmp, "lobby_log.csv")
+        app.OLLAMA_URL = up_url + "api/generate"
+        client = app.app.test_client()
+        client.get('/api/status') # Starts the monitor
+        time.sleep(0.5)
+
+        def new_status():
+            return client.get('/api/status?history=0').get_json()['ollama_online']
+
+        print(f"{args.dashboards} dashboards x {args.calls} status calls\n")
+        print(f"{'server':>7} {'handler':>12} {'mean ms':>8} {'max ms':>8} {'probes':>7}")
+        for state, url in (("up", up_url), ("hung", hung_url)):
+            for name, call in (("per-request", old_status(url)), ("monitor", new_status)):
+                if name == "monitor" and state == "hung":
+                    app.get_ollama_client().base_url = hung_url # Point the monitor's probe at it
+                    app.get_health_monitor().check_now('ai')
+                before = server.stats['connections'] if state == "up" else None
+                t0 = time.time()
+                mean, worst = run(call, args.dashboards, args.calls)
+                if state == "up":
+                    probes = server.stats['connections'] - before
+                else:
+                    # Probes sent while the calls ran (per-request: one per call)
+                    history = app.get_health_monitor().snapshot()['ai']['history']
+                    probes = (sum(1 for h in history if h[0] >= t0 - 0.1) if name == "monitor"
+                              else args.dashboards * args.calls)
+                print(f"{state:>7} {name:>12} {mean:>8.2f} {worst:>8.2f} {probes:>7}")
+        os.chdir(ROOT)
+    server.shutdown()
+    hung.close()
+
+
+if __name__ == "__main__":
+    main()
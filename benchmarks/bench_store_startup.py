@@ -0,0 +1,64 @@
+"""
+Startup-time benchmark: legacy pickle cache vs. binary embedding store.
+
+For each roster size, times what run_face_recognition_loop does at startup:
+load the encodings from disk and build a ready-to-match FaceGallery.
+Files are written to a temporary directory and removed afterwards.
+
+    python benchmarks/bench_store_startup.py
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from face_gallery import FaceGallery, save_store  # noqa: E402
+
+ROSTER_SIZES = [1000, 10000, 100000]
+REPEATS = 3
+
+
+def best_ms(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        gallery = fn()
+        best = min(best, time.perf_counter() - t0)
+    assert len(gallery) > 0
+    return best * 1000
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return FaceGallery.from_dict(pickle.load(f))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'roster':>8} {'format':>10} {'file KB':>10} {'load ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in ROSTER_SIZES:
+            # Same shape reencode_faces.py produces: one (1, 128) float32 per name
+            known_faces = {f"person_{i}": rng.standard_normal((1, 128)).astype(np.float32) for i in range(size)}
+
+            pkl_path = os.path.join(tmp, f"enc_{size}.pkl")
+            with open(pkl_path, "wb") as f:
+                pickle.dump(known_faces, f)
+            rows = [("pickle", pkl_path, lambda: load_pickle(pkl_path))]
+
+            for dtype in ("float32", "float16"):
+                store_path = os.path.join(tmp, f"enc_{size}_{dtype}.vgal")
+                save_store(store_path, list(known_faces.keys()), list(known_faces.values()), dtype=dtype)
+                rows.append((f"vgal/{dtype[-2:]}", store_path, lambda p=store_path: FaceGallery.from_store(p)))
+
+            for label, path, loader in rows:
+                size_kb = os.path.getsize(path) / 1024
+                print(f"{size:>8} {label:>10} {size_kb:>10.0f} {best_ms(loader):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
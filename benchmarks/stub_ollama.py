@@ -0,0 +1,135 @@
+"""
+Stand-in for the Ollama server, for benchmarks and trying the chat without a model.
+
+Answers like Ollama does:
+  GET  /               "Ollama is running"
+  POST /api/generate   {"model", "prompt", "stream", "context"?} -> the reply
+                       as one JSON object, or (stream) one JSON line per token
+
+The reply is a fixed sentence. It takes `--first-token` seconds to "read the
+prompt" (plus `--per-prompt-token` seconds per ~4 prompt characters), then
+one token every 1/`--rate` seconds. Like a single local model, it generates
+one reply at a time. Connections are HTTP/1.1 keep-alive, and each new one
+is counted (stats at GET /stats).
+
+    python benchmarks/stub_ollama.py                # on :11434, instead of Ollama
+    python benchmarks/stub_ollama.py --port 11500 --first-token 2 --rate 10
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("Hello! I'm Visor, a stand-in model. I can't see the attendance log, "
+         "but I'm answering quickly so the chat can be tested end to end.")
+
+
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, first_token=0.5, rate=20.0, per_prompt_token=0.0, reply=REPLY):
+        super().__init__(address, StubHandler)
+        self.first_token = first_token
+        self.rate = rate
+        self.per_prompt_token = per_prompt_token
+        self.reply = reply
+        self.model_lock = threading.Lock() # One generation at a time, like a local model
+        self.stats_lock = threading.Lock()
+        self.stats = {'connections': 0, 'generations': 0, 'max_waiting': 0}
+        self.waiting = 0
+
+    def count(self, key, n=1):
+        with self.stats_lock:
+            self.stats[key] += n
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json"):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.stats_lock:
+                self._send(json.dumps(self.server.stats))
+        else:
+            self._send("Ollama is running", "text/plain")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        tokens = [w + " " for w in server.reply.split(" ")]
+        with server.stats_lock:
+            server.waiting += 1
+            server.stats['max_waiting'] = max(server.stats['max_waiting'], server.waiting)
+        with server.model_lock:
+            with server.stats_lock:
+                server.waiting -= 1
+            prompt_tokens = len(request.get("prompt", "")) // 4
+            time.sleep(server.first_token + prompt_tokens * server.per_prompt_token)
+            server.count('generations')
+            context = list(request.get("context") or []) + list(range(prompt_tokens + len(tokens)))
+            done = {"model": request.get("model"), "response": "", "done": True, "context": context,
+                    "prompt_eval_count": prompt_tokens, "eval_count": len(tokens)}
+            if not request.get("stream", True):
+                time.sleep(len(tokens) / server.rate)
+                done["response"] = "".join(tokens)
+                self._send(json.dumps(done))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(1.0 / server.rate)
+                self._chunk(json.dumps({"model": request.get("model"), "response": token, "done": False}) + "\n")
+            self._chunk(json.dumps(done) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_stub(port=0, **kwargs):
+    """Runs a stub on a background thread. Returns the server (URL: http://127.0.0.1:<server.server_port>)."""
+    server = StubOllama(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-ollama").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--per-prompt-token", type=float, default=0.0, help="extra seconds per prompt token")
+    parser.add_argument("--rate", type=float, default=20.0, help="tokens per second after the first")
+    args = parser.parse_args()
+    server = StubOllama(("127.0.0.1", args.port), first_token=args.first_token, rate=args.rate,
+                        per_prompt_token=args.per_prompt_token)
+    print(f"Stub Ollama on http://127.0.0.1:{args.port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
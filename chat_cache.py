@@ -0,0 +1,157 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ==========================================
+# CHAT CACHES (Replies + model context)
+# ==========================================
+# ResponseCache: asking the same thing twice ("who came in today?") used to
+# rebuild the prompt and run the model again. Replies are now kept, keyed on
+# the normalized question plus a data version: the newest event id, the
+# notes file's mtime, who is in the lobby, and the date (so "today" moves on
+# at midnight). Any new event or note edit changes the version, so a stale
+# reply is never served; entries also expire after `ttl` seconds (the prompt
+# carries the clock) and the least recently used go first when full.
+#
+# Only questions that open a conversation (no model context yet) are cached:
+# a follow-up's answer depends on everything said before it. A hit also hands
+# back the model context of the cached exchange, so the conversation carries
+# on from the turn it was shown, exactly as if it had been generated.
+#
+# ConversationCache: Ollama returns `context` (the tokens of the prompt and
+# the reply) with every answer. A conversation keeps it, and its next
+# question is sent as only the new part (data + question) together with that
+# context: the persona/instructions prefix is not sent or evaluated again,
+# and the model also sees the previous exchange, so follow-ups ("and
+# yesterday?") work. A conversation starts over when its context plus the
+# new turn would not fit in `max_tokens` (the model's window less room for
+# the reply), the prefix changes, or it sits idle for `ttl` seconds.
+
+NORMALIZE = re.compile(r"[^a-z0-9' ]+")
+
+
+def normalize_question(question):
+    """'  Who came in TODAY?? ' -> 'who came in today'."""
+    return " ".join(NORMALIZE.sub(" ", question.lower()).split())
+
+
+def prefix_key(prefix):
+    return hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl=600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # (question, version) -> (expires, reply, cost_ms, model context)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_ms = 0.0 # Generation time the hits would have cost
+
+    def key(self, question, version):
+        return normalize_question(question), version
+
+    def get(self, key):
+        """(reply, model context or None) from the cache, or None."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved_ms += entry[2]
+            return entry[1], entry[3]
+
+    def put(self, key, reply, cost_ms, context=None):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, reply, cost_ms, context)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def snapshot(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                    'evictions': self.evictions, 'saved_ms': round(self.saved_ms, 1)}
+
+
+class ConversationCache:
+    def __init__(self, max_conversations=64, max_tokens=1800, ttl=1800.0):
+        self.max_conversations = max_conversations
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conversations = OrderedDict() # id -> (last used, prefix key, context tokens)
+        self.reused = 0
+        self.started = 0
+        self.prompt_chars_saved = 0
+        self.first_token = {True: [0, 0.0], False: [0, 0.0]} # Continued? -> [answers, total first-token ms]
+
+    def get(self, conversation, prefix, turn_tokens=0):
+        """
+        The model context to continue from, or None (send the full prompt).
+        `turn_tokens` is the size of what will be added to it (the new turn).
+        """
+        if not conversation:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.conversations.get(conversation)
+            if entry is None or entry[1] != prefix_key(prefix) or now - entry[0] > self.ttl \
+                    or len(entry[2]) + turn_tokens > self.max_tokens:
+                self.conversations.pop(conversation, None)
+                self.started += 1
+                return None
+            self.reused += 1
+            self.prompt_chars_saved += len(prefix)
+            return entry[2]
+
+    def has_context(self, conversation, prefix):
+        """True if the conversation has a live model context (its next question is a follow-up)."""
+        with self.lock:
+            entry = self.conversations.get(conversation)
+            return (entry is not None and entry[1] == prefix_key(prefix)
+                    and time.time() - entry[0] <= self.ttl)
+
+    def put(self, conversation, prefix, context):
+        if not conversation or not context:
+            return
+        with self.lock:
+            self.conversations[conversation] = (time.time(), prefix_key(prefix), context)
+            self.conversations.move_to_end(conversation)
+            while len(self.conversations) > self.max_conversations:
+                self.conversations.popitem(last=False)
+
+    def forget(self, conversation):
+        with self.lock:
+            self.conversations.pop(conversation, None)
+
+    def record(self, continued, first_token_ms):
+        with self.lock:
+            stats = self.first_token[continued]
+            stats[0] += 1
+            stats[1] += first_token_ms
+
+    def snapshot(self):
+        with self.lock:
+            def mean(stats):
+                return round(stats[1] / stats[0], 1) if stats[0] else None
+            return {'conversations': len(self.conversations), 'started': self.started,
+                    'prefix_reused': self.reused, 'prompt_chars_saved': self.prompt_chars_saved,
+                    'first_token_ms_fresh': mean(self.first_token[False]),
+                    'first_token_ms_continued': mean(self.first_token[True])}
@@ -0,0 +1,293 @@
+import math
+import re
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+# ==========================================
+# CHAT CONTEXT (Retrieval instead of the whole log)
+# ==========================================
+# /api/chat used to paste the entire log and all notes into every prompt, so
+# the prompt (and time to first token) grew with the log, and once it passed
+# the model's window the oldest rows silently fell off. The context is now
+# built per question, within a token budget:
+#
+#   1. LogSummary keeps one line per person per day (first in, last seen,
+#      entries, exits). It is built once from the event store, then updated
+#      from the rows added since (the log is append-only).
+#   2. The question is matched against the names in the log and parsed for
+#      dates ("today", "yesterday", "last week", "monday", "2026-02-11",
+#      "Feb 11", "last 3 days"). Without a date the last DEFAULT_DAYS count.
+#   3. Notes are split into bullets/paragraphs and ranked by word overlap with
+#      the question (idf-weighted); notes naming someone asked about come first.
+#   4. Sections are filled in order (notes, daily summary, raw events) up to
+#      their share of the budget; what one section leaves over goes to the next.
+#
+# Token counts are estimated at CHARS_PER_TOKEN characters per token.
+
+CHARS_PER_TOKEN = 4
+DEFAULT_BUDGET = 1500 # Tokens of context (the question and instructions come on top)
+DEFAULT_DAYS = 7 # Days summarized when the question names no date
+SHARES = (("notes", 0.25), ("summary", 0.40), ("events", 0.35))
+MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+# A month as written: full name or its usual abbreviation, nothing longer ("Marcus" is not March)
+MONTH = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+STOPWORDS = {"the", "a", "an", "is", "was", "were", "are", "did", "do", "does", "of", "in", "on", "at", "to",
+             "for", "and", "or", "who", "what", "when", "how", "today", "yesterday", "here", "there", "me",
+             "i", "you", "he", "she", "they", "it", "this", "that", "with", "about", "any", "has", "have"}
+WORD = re.compile(r"[a-z0-9']+")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def words(text):
+    return WORD.findall(text.lower())
+
+
+def parse_dates(question, today=None):
+    """(first day, last day) the question is about, as dates, or (None, None)."""
+    today = today or date.today()
+    q = question.lower()
+    m = re.search(r"\b(\d{4})-(\d{2})-(\d{2})\b", q)
+    if m:
+        try:
+            d = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+            return d, d
+        except ValueError:
+            pass
+    m = re.search(r"\b(?:last|past)\s+(\d+)\s+days?\b", q)
+    if m:
+        return today - timedelta(days=int(m.group(1)) - 1), today
+    if "yesterday" in q:
+        d = today - timedelta(days=1)
+        return d, d
+    if "today" in q or "right now" in q or re.search(r"\bnow\b", q):
+        return today, today
+    if "last week" in q:
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6)
+    if "this week" in q:
+        return today - timedelta(days=today.weekday()), today
+    if "last month" in q:
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    if "this month" in q:
+        return today.replace(day=1), today
+    # "feb 11", "11 feb", "february 11th": the first one that is a real day
+    for pattern in (rf"\b{MONTH}\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?\b",
+                    rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+{MONTH}\b"):
+        for m in re.finditer(pattern, q):
+            a, b = m.groups()
+            month, day = (a, b) if a.isalpha() else (b, a)
+            try:
+                d = date(today.year, MONTHS[month[:3]], int(day))
+            except ValueError:
+                continue
+            if d > today:
+                d = d.replace(year=today.year - 1) # "Dec 20" asked in January
+            return d, d
+    for i, name in enumerate(WEEKDAYS):
+        if re.search(rf"\b{name}\b", q):
+            d = today - timedelta(days=(today.weekday() - i) % 7) # Most recent one (today counts)
+            return d, d
+    return None, None
+
+
+def match_names(question, known):
+    """
+    Which of `known` ({lower-case name: name}) the question mentions: whole
+    names ("student 12" for Student_12), else a part of a name that at most
+    two people share ("obama").
+    """
+    q_words = set(words(question))
+    q_text = f" {' '.join(words(question))} "
+    whole, by_part = [], {}
+    for lower, name in known.items():
+        parts = words(lower)
+        if parts and f" {' '.join(parts)} " in q_text:
+            whole.append(name)
+        for p in set(parts):
+            if len(p) > 2 and p not in STOPWORDS:
+                by_part.setdefault(p, []).append(name)
+    if whole:
+        return sorted(whole)
+    return sorted({name for p in q_words for name in by_part.get(p, ()) if len(by_part[p]) <= 2})
+
+
+def without_names(question, names):
+    """
+    The question with the words of `names` (as matched by match_names())
+    taken out, for parse_dates(): "how long did May 5 stay?" is about May_5,
+    not the 5th of May.
+    """
+    q = question.lower()
+    for name in names:
+        parts = words(name)
+        whole = r"\b" + r"[\s_]+".join(re.escape(p) for p in parts) + r"\b"
+        if parts and re.search(whole, q):
+            q = re.sub(whole, " ", q)
+            continue
+        for p in parts:
+            if len(p) > 2 and p not in STOPWORDS:
+                q = re.sub(rf"\b{re.escape(p)}\b", " ", q)
+    return q
+
+
+class LogSummary:
+    """Per day, per person: [first ts, last ts, entries, exits]. Built once, then updated incrementally."""
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.cursor = 0 # Id of the last event folded in
+        self.days = {} # "YYYY-MM-DD" -> {name: [first, last, entries, exits]}
+        self.names = {} # lower-case name -> name
+
+    def refresh(self):
+        """Folds in events added since the last call. Returns how many."""
+        with self.lock:
+            added = 0
+            while True:
+                rows = self.store.rows_since(self.cursor, limit=50000)
+                if not rows:
+                    return added
+                for row_id, ts, event, name, _ in rows:
+                    day = self.days.setdefault(ts[:10], {})
+                    stats = day.get(name)
+                    if stats is None:
+                        stats = day[name] = [ts, ts, 0, 0]
+                        self.names.setdefault(name.lower(), name)
+                    stats[1] = ts
+                    if event == "ENTERED":
+                        stats[2] += 1
+                    elif event == "EXITED":
+                        stats[3] += 1
+                self.cursor = rows[-1][0]
+                added += len(rows)
+
+    def match_names(self, question, extra_names=()):
+        """Names (from the log or `extra_names`) mentioned in the question (see match_names())."""
+        with self.lock:
+            known = dict(self.names)
+        for name in extra_names:
+            known.setdefault(name.lower(), name)
+        return match_names(question, known)
+
+    def lines(self, date_from, date_to, names=None):
+        """Summary lines, newest day first."""
+        wanted = set(names) if names else None
+        with self.lock:
+            # Copy out under the lock; the caller may stop reading half way
+            days = [(d, [(name, tuple(stats)) for name, stats in self.days[d].items()
+                         if wanted is None or name in wanted])
+                    for d in sorted((d for d in self.days if date_from <= d <= date_to), reverse=True)]
+        for d, people in days:
+            for name, (first, last, entries, exits) in sorted(people):
+                yield (f"{d} {name}: first seen {first[11:16]}, last seen {last[11:16]}, "
+                       f"entered {entries}x, exited {exits}x")
+
+
+def note_chunks(notes_text):
+    """Bullets / paragraphs of the notes file, without the '#' instruction header."""
+    chunks, current = [], []
+    for line in notes_text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            if current:
+                chunks.append(" ".join(current))
+                current = []
+            continue
+        if stripped[:1] in "*-" and current:
+            chunks.append(" ".join(current))
+            current = []
+        current.append(stripped)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def rank_notes(chunks, question, names=()):
+    """Chunks scored by idf-weighted word overlap with the question; chunks naming `names` first."""
+    q_words = [w for w in words(question) if w not in STOPWORDS]
+    chunk_words = [set(words(c)) for c in chunks]
+    df = Counter(w for cw in chunk_words for w in cw)
+    n = len(chunks)
+    name_words = {p for name in names for p in words(name)}
+    scored = []
+    for i, (chunk, cw) in enumerate(zip(chunks, chunk_words)):
+        score = sum(math.log(1 + n / df[w]) for w in q_words if w in cw)
+        if name_words & cw:
+            score += 100.0
+        if "general" in cw: # Class-wide notes are always worth a look
+            score += 0.5
+        scored.append((score, -i, chunk))
+    scored.sort(reverse=True)
+    return [chunk for score, _, chunk in scored if score > 0]
+
+
+class ContextBuilder:
+    def __init__(self, store, budget=DEFAULT_BUDGET, default_days=DEFAULT_DAYS):
+        self.store = store
+        self.summary = LogSummary(store)
+        self.budget = budget
+        self.default_days = default_days
+
+    def build(self, question, notes_text="", extra_names=(), today=None):
+        """
+        Returns (context text, info) for one question. `info` has the names
+        and dates matched and the tokens used per section.
+        """
+        today = today or date.today()
+        self.summary.refresh()
+        names = self.summary.match_names(question, extra_names)
+        d_from, d_to = parse_dates(without_names(question, names), today)
+        if d_from is None:
+            d_from, d_to = today - timedelta(days=self.default_days - 1), today
+        day_from, day_to = d_from.isoformat(), d_to.isoformat()
+
+        def notes():
+            return rank_notes(note_chunks(notes_text), question, names)
+
+        def summary():
+            lines = self.summary.lines(day_from, day_to, names or None)
+            first = next(lines, None)
+            if first is None:
+                yield f"(no attendance recorded {day_from} to {day_to}" + (f" for {', '.join(names)})" if names else ")")
+                return
+            yield first
+            yield from lines
+
+        def events():
+            for name in (names or [None]):
+                for row in self.store.query(name=name, date_from=day_from, date_to=day_to, limit=200):
+                    yield f"{row['Timestamp']}, {row['Event']}, {row['Name']}"
+
+        sections = {"notes": notes, "summary": summary, "events": events}
+        titles = {"notes": "STUDENT NOTES (most relevant)",
+                  "summary": f"DAILY SUMMARY {day_from} to {day_to}",
+                  "events": "EVENTS (newest first: time, event, name)"}
+        parts, used, carry = [], {}, 0
+        for key, share in SHARES:
+            allowance = int(self.budget * share) + carry
+            header = f"--- {titles[key]} ---"
+            spent, kept = estimate_tokens(header), []
+            for line in sections[key]():
+                cost = estimate_tokens(line) + 1
+                if spent + cost > allowance:
+                    break
+                kept.append(line)
+                spent += cost
+            if kept:
+                parts.append(header + "\n" + "\n".join(kept))
+            else:
+                spent = 0
+            used[key] = spent
+            carry = allowance - spent
+        info = {'names': names, 'from': day_from, 'to': day_to, 'tokens': used,
+                'total_tokens': sum(used.values())}
+        return "\n\n".join(parts), info
+
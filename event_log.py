@@ -0,0 +1,346 @@
+import argparse
+import csv
+import io
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+LOG_HEADER = ["Timestamp", "Event", "Name", "PhotoPath"]
+DISPLAY_FORMAT = "%Y-%m-%d %I:%M:%S %p" # How timestamps appear in the UI, the CSV and the AI context
+STORE_FORMAT = "%Y-%m-%d %H:%M:%S" # How they are stored: sorts and range-filters as text
+
+
+def to_display(ts):
+    return datetime.strptime(ts, STORE_FORMAT).strftime(DISPLAY_FORMAT)
+
+
+# ==========================================
+# EVENT STORE (SQLite, WAL)
+# ==========================================
+# lobby_log.db replaces lobby_log.csv. WAL mode lets the Flask threads read
+# while the writer thread appends. Indexes on ts and (name, ts) keep "latest
+# N", date-range and per-person lookups independent of how big the log gets.
+# Each thread gets its own connection.
+#
+# New events only ever append (a higher id), but existing rows can be
+# rewritten (clear_photos() after the janitor prunes a day). Each rewrite
+# bumps a version number kept in the `meta` table, so (newest id, version)
+# identifies what the log looks like, across restarts too.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    event TEXT NOT NULL,
+    name TEXT NOT NULL,
+    photo_path TEXT NOT NULL DEFAULT '',
+    camera TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_name_ts ON events(name, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class EventStore:
+    """Attendance events in SQLite. Rows are (ts "YYYY-MM-DD HH:MM:SS", event, name, photo_path, camera)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # WAL + NORMAL: durable at checkpoints, fast commits
+            self.local.conn = conn
+        return conn
+
+    # --- Writer side (EventWriter sink interface) ---
+    def write_rows(self, rows):
+        """Inserts rows (uncommitted until flush()); returns their ids."""
+        conn = self._conn()
+        conn.executemany("INSERT INTO events (ts, event, name, photo_path, camera) VALUES (?, ?, ?, ?, ?)", rows)
+        # One writer, no deletes: the batch got consecutive ids ending at the last insert
+        last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last - len(rows) + 1, last + 1))
+
+    def flush(self):
+        self._conn().commit() # Readers see the batch now
+
+    def sync(self):
+        conn = self._conn()
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.commit()
+            conn.close()
+            self.local.conn = None
+
+    # --- Reader side ---
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def last_id(self):
+        """Id of the newest event (0 if empty): changes with every new event."""
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def version(self):
+        """How many times existing rows were rewritten (see clear_photos()). Appends don't count."""
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self, conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('version', 1) "
+                     "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def query(self, since=None, before=None, limit=500, name=None, event=None, date_from=None, date_to=None):
+        """
+        Newest first, in the old /api/logs shape ({Timestamp, Event, Name, PhotoPath}) plus `id`.
+        since/before are event ids (cursors): only rows after / before them.
+        date_from/date_to are inclusive "YYYY-MM-DD" days.
+        """
+        where, params = [], []
+        if since is not None:
+            where.append("id > ?")
+            params.append(since)
+        if before is not None:
+            where.append("id < ?")
+            params.append(before)
+        if name:
+            where.append("name = ?")
+            params.append(name)
+        if event:
+            where.append("event = ?")
+            params.append(event)
+        if date_from:
+            where.append("ts >= ?")
+            params.append(f"{date_from} 00:00:00")
+        if date_to:
+            where.append("ts <= ?")
+            params.append(f"{date_to} 23:59:59")
+        sql = "SELECT id, ts, event, name, photo_path FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = self._conn().execute(sql, params + [limit])
+        return [{'id': row_id, 'Timestamp': to_display(ts), 'Event': ev, 'Name': nm, 'PhotoPath': photo}
+                for row_id, ts, ev, nm, photo in rows]
+
+    def clear_photos(self, day):
+        """Drops the photo links of one "YYYY-MM-DD" day (its photos were pruned). Returns rows changed."""
+        conn = self._conn()
+        changed = conn.execute("UPDATE events SET photo_path = '' WHERE ts BETWEEN ? AND ? AND photo_path != ''",
+                               (f"{day} 00:00:00", f"{day} 23:59:59")).rowcount
+        if changed:
+            self._bump_version(conn) # Same transaction: readers see both or neither
+        conn.commit()
+        return changed
+
+    def rows_since(self, after_id=0, limit=50000):
+        """Raw (id, ts, event, name, camera) rows after `after_id`, oldest first (for incremental summaries)."""
+        return self._conn().execute("SELECT id, ts, event, name, camera FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                                    (after_id, limit)).fetchall()
+
+    def recent(self, limit=500):
+        return self.query(limit=limit)
+
+    def iter_csv(self, chunk_rows=5000):
+        """The whole log as CSV text chunks, oldest first (same columns as lobby_log.csv)."""
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(LOG_HEADER)
+        cursor = self._conn().execute("SELECT ts, event, name, photo_path FROM events ORDER BY ts, id")
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            writer.writerows((to_display(ts), event, name, photo) for ts, event, name, photo in rows)
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        if out.getvalue():
+            yield out.getvalue()
+
+    def import_csv(self, csv_path, batch_rows=10000):
+        """One-shot import of a lobby_log.csv. Returns (imported, skipped)."""
+        imported, skipped, batch = 0, 0, []
+        with open(csv_path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+            for row in csv.DictReader(f):
+                try:
+                    ts = datetime.strptime(row['Timestamp'].strip(), DISPLAY_FORMAT).strftime(STORE_FORMAT)
+                    batch.append((ts, row['Event'].strip(), row['Name'].strip(), (row.get('PhotoPath') or '').strip(), None))
+                except (KeyError, ValueError, AttributeError):
+                    skipped += 1
+                    continue
+                if len(batch) >= batch_rows:
+                    self.write_rows(batch)
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            self.write_rows(batch)
+            imported += len(batch)
+        self.flush()
+        return imported, skipped
+
+
+# ==========================================
+# EVENT WRITER (Evidence photos + log rows, off the camera threads)
+# ==========================================
+# log_event() only builds the row and queues it. One writer thread burns the
+# caption into the evidence photo, writes the JPEG, and inserts rows into the
+# store in batches: one transaction per batch (readers see rows at once) and
+# a WAL checkpoint every `fsync_interval` seconds.
+#
+# The queue is bounded. When a burst fills it, submit() drops the event and
+# counts it straight away: it runs on the render thread, so waiting for room
+# would stall video. `rows_written` only counts rows whose batch committed;
+# rows of a batch that failed are counted in `rows_failed`.
+
+
+class EventWriter(threading.Thread):
+    def __init__(self, sink, maxsize=256, batch_size=64, fsync_interval=5.0, timer=None,
+                 on_written=None, on_photo=None):
+        super().__init__(daemon=True, name="event-writer")
+        self.sink = sink
+        self.on_written = on_written # Called with [(id, row), ...] once a batch is committed
+        self.on_photo = on_photo # Called with (path, frame) after each evidence photo is saved
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.timer = timer
+        self.lock = threading.Lock()
+        self.stats = {'queued': 0, 'rows_written': 0, 'rows_failed': 0, 'photos_written': 0, 'batches': 0,
+                      'dropped': 0, 'errors': 0, 'max_depth': 0}
+        self.running = True
+
+    def submit(self, row, photo=None):
+        """
+        Queues one log row. `photo` is (path, frame, caption_lines) for an
+        evidence photo. Never waits: returns False if the queue is full and it was dropped.
+        """
+        try:
+            self.queue.put_nowait((time.perf_counter(), row, photo))
+        except queue.Full:
+            with self.lock:
+                self.stats['dropped'] += 1
+            return False
+        with self.lock:
+            self.stats['queued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self.queue.qsize())
+        return True
+
+    def _write_photo(self, path, frame, captions):
+        # Draw timestamp on the photo itself for "hardcopy" proof (Top-Right to avoid overlap)
+        w = frame.shape[1]
+        os.makedirs(os.path.dirname(path), exist_ok=True) # Day folder (first photo of the day)
+        for i, text in enumerate(captions):
+            cv2.putText(frame, text, (w - 340, 20 + 20 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+        if cv2.imwrite(path, frame):
+            print(f"SNAPSHOT SAVED: {path}")
+            return True
+        print(f"⚠️ Could not save snapshot {path}")
+        return False
+
+    def run(self):
+        last_sync = time.time()
+        while self.running or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                batch = []
+            # Take whatever else is already waiting (a class walking in), up to batch_size
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if batch:
+                t0 = time.perf_counter()
+                photos = 0
+                for _, _, photo in batch:
+                    if photo is not None:
+                        try:
+                            if self._write_photo(*photo):
+                                photos += 1
+                                if self.on_photo is not None:
+                                    self.on_photo(photo[0], photo[1])
+                        except Exception as e:
+                            print(f"⚠️ Snapshot failed: {e}")
+                written = []
+                try:
+                    rows = [row for _, row, _ in batch]
+                    ids = self.sink.write_rows(rows)
+                    self.sink.flush()
+                    written = list(zip(ids, rows))
+                except Exception as e:
+                    print(f"⚠️ Event log write failed: {e}")
+                    with self.lock:
+                        self.stats['errors'] += 1
+                if written and self.on_written is not None:
+                    try:
+                        self.on_written(written)
+                    except Exception as e:
+                        print(f"⚠️ Event listener failed: {e}")
+                done = time.perf_counter()
+                with self.lock:
+                    self.stats['rows_written'] += len(written)
+                    self.stats['rows_failed'] += len(batch) - len(written)
+                    self.stats['photos_written'] += photos
+                    self.stats['batches'] += 1
+                if self.timer is not None:
+                    self.timer.record('event_write', (done - t0) * 1000)
+                    for queued_at, _, _ in batch:
+                        self.timer.record('event_latency', (done - queued_at) * 1000) # queued -> on disk
+
+            if time.time() - last_sync >= self.fsync_interval:
+                try:
+                    self.sink.sync()
+                except Exception:
+                    pass
+                last_sync = time.time()
+        self.sink.close()
+
+    def stop(self, timeout=5.0):
+        """Writes out everything still queued, then closes the sink."""
+        self.running = False
+        self.join(timeout)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, depth=self.queue.qsize(), capacity=self.queue.maxsize)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import / export the attendance event store.")
+    parser.add_argument("--db", default="lobby_log.db")
+    parser.add_argument("--import-csv", metavar="CSV", help="append every row of a lobby_log.csv")
+    parser.add_argument("--export-csv", metavar="CSV", help="write the whole log as CSV")
+    args = parser.parse_args()
+
+    store = EventStore(args.db)
+    if args.import_csv:
+        imported, skipped = store.import_csv(args.import_csv)
+        print(f"🎉 Imported {imported} events from '{args.import_csv}'" + (f" ({skipped} unreadable rows skipped)" if skipped else ""))
+    if args.export_csv:
+        with open(args.export_csv, 'w', newline='', encoding='utf-8') as f:
+            for chunk in store.iter_csv():
+                f.write(chunk)
+        print(f"🎉 Exported {store.count()} events to '{args.export_csv}'")
+    if not args.import_csv and not args.export_csv:
+        print(f"{args.db}: {store.count()} events")
@@ -0,0 +1,412 @@
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+# ==========================================
+# FACE GALLERY (Vectorized Matcher)
+# ==========================================
+# SFace cosine similarity is just the dot product of two L2-normalized
+# 128-d features. Instead of calling recognizer.match() once per enrolled
+# person, we keep every known face as one row of a normalized matrix and
+# score all faces in a frame against the whole roster with one matmul.
+
+COSINE_THRESHOLD = 0.45
+UNKNOWN_NAME = "Unknown"
+
+
+def l2_normalize(vectors):
+    """Returns a float32 copy of `vectors` with every row scaled to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(sims, k):
+    """Column indices of the `k` largest values in each row of `sims`, best first."""
+    k = min(k, sims.shape[1])
+    if k == 1:
+        return np.argmax(sims, axis=1)[:, None]
+    # argpartition is O(N) per row; only the k survivors get sorted
+    part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(sims, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+# ==========================================
+# APPROXIMATE SEARCH (IVF)
+# ==========================================
+# Inverted-file index: spherical k-means splits the gallery into `nlist`
+# cells. A query is compared to the cell centroids first and then only to the
+# faces inside its `nprobe` closest cells, so the per-frame cost grows with
+# roughly N * nprobe / nlist instead of N. nprobe trades speed for recall;
+# run benchmarks/bench_ann_recall.py to pick a value for your roster.
+
+IVF_DEFAULT_NPROBE = 16
+
+
+class IVFIndex:
+    """Inverted-file ANN index over an L2-normalized embedding matrix."""
+
+    def __init__(self, embeddings, nlist=None, nprobe=IVF_DEFAULT_NPROBE, iterations=10, seed=0):
+        n = embeddings.shape[0]
+        if nlist is None:
+            nlist = int(4 * np.sqrt(n))
+        self.nlist = max(1, min(nlist, n))
+        self.nprobe = nprobe
+        self.centroids = self._train(embeddings, self.nlist, iterations, seed)
+
+        # Store members cell by cell: `ids[offsets[c]:offsets[c + 1]]` are cell c's rows
+        assign = self._assign(embeddings)
+        self.ids = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=self.nlist)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _assign(self, vectors, chunk=65536):
+        labels = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], chunk):
+            block = vectors[start:start + chunk]
+            labels[start:start + chunk] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def _train(self, embeddings, nlist, iterations, seed):
+        rng = np.random.default_rng(seed)
+        # k-means only needs a sample; 64 points per cell is plenty
+        sample_size = min(embeddings.shape[0], nlist * 64)
+        sample = embeddings[rng.choice(embeddings.shape[0], sample_size, replace=False)]
+        self.centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            # Re-seed empty cells with random sample points so none go to waste
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            self.centroids = l2_normalize(sums)
+        return self.centroids
+
+    def search(self, queries, embeddings, k=1, nprobe=None):
+        """Returns (indices, scores) arrays of shape (Q, k); -1 / -inf pad missing slots."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cells = top_k(queries @ self.centroids.T, nprobe)
+
+        out_idx = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        out_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate([self.ids[self.offsets[c]:self.offsets[c + 1]] for c in cells[row]])
+            if candidates.size == 0:
+                continue
+            sims = embeddings[candidates] @ query
+            best = top_k(sims[None, :], k)[0]
+            out_idx[row, :best.size] = candidates[best]
+            out_scores[row, :best.size] = sims[best]
+        return out_idx, out_scores
+
+
+# ==========================================
+# MULTI-TEMPLATE SCORING
+# ==========================================
+# One person can be enrolled from several photos ("templates"). The gallery
+# keeps every template plus one centroid per person (the re-normalized mean
+# of their templates) and supports two scoring modes:
+#   "centroid" - one row per person, as fast as single-template matching
+#   "max"      - best score over all of a person's templates (more robust
+#                to pose/lighting, cost grows with total template count)
+
+SCORING_MODES = ("centroid", "max")
+MAX_SHORTLIST_FACTOR = 8 # IVF + "max": rescore this many centroid hits per wanted result
+
+
+def centroids_from_templates(templates_per_identity):
+    """One L2-normalized mean vector per identity from its (n_i, 128) templates."""
+    if len(templates_per_identity) == 0:
+        return np.zeros((0, 128), dtype=np.float32)
+    return l2_normalize(np.vstack([l2_normalize(t).mean(axis=0, keepdims=True)
+                                   for t in templates_per_identity]))
+
+
+class FaceGallery:
+    """All enrolled SFace embeddings held as one L2-normalized (N, 128) matrix."""
+
+    def __init__(self, names, embeddings, normalized=False, templates=None, template_counts=None,
+                 scoring="centroid"):
+        self.names = list(names)
+        self.index = None
+        if len(self.names) == 0:
+            self.embeddings = np.zeros((0, 128), dtype=np.float32)
+        elif normalized:
+            # Already unit-length rows (e.g. a memory-mapped store): use as-is, no copy
+            self.embeddings = embeddings
+        else:
+            self.embeddings = l2_normalize(np.vstack([np.asarray(e).reshape(1, -1) for e in embeddings]))
+
+        # Optional per-template matrix; identity i owns rows starts[i]:starts[i] + counts[i]
+        self.templates = None
+        self.template_counts = None
+        self.template_starts = None
+        if templates is not None and len(self.names) > 0:
+            self.templates = templates if normalized else l2_normalize(templates)
+            self.template_counts = np.asarray(template_counts, dtype=np.int64)
+            self.template_starts = np.concatenate([[0], np.cumsum(self.template_counts)[:-1]])
+        self.set_scoring(scoring)
+
+    @classmethod
+    def from_templates(cls, names, templates_per_identity, scoring="centroid"):
+        """Builds a gallery from one (n_i, 128) template array per identity."""
+        templates_per_identity = [np.asarray(t, dtype=np.float32).reshape(-1, 128) for t in templates_per_identity]
+        if len(templates_per_identity) == 0:
+            return cls([], [], scoring=scoring)
+        return cls(names, centroids_from_templates(templates_per_identity), normalized=True,
+                   templates=l2_normalize(np.vstack(templates_per_identity)),
+                   template_counts=[len(t) for t in templates_per_identity], scoring=scoring)
+
+    @classmethod
+    def from_dict(cls, known_faces, scoring="centroid"):
+        """Builds a gallery from the legacy `{name: feature(s)}` pickle dict."""
+        return cls.from_templates(list(known_faces.keys()), list(known_faces.values()), scoring=scoring)
+
+    @classmethod
+    def from_store(cls, path, scoring="centroid", mmap=True):
+        """Builds a gallery from a binary embedding store (see save_store)."""
+        names, matrix, header = load_store(path, mmap)
+        templates, counts = load_store_templates(path, header, mmap)
+        return cls(names, matrix, normalized=True, templates=templates, template_counts=counts,
+                   scoring=scoring)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def template_total(self):
+        return len(self.names) if self.templates is None else int(self.templates.shape[0])
+
+    def set_scoring(self, scoring):
+        """Selects "centroid" (fast) or "max" (max over templates, accurate) scoring."""
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode '{scoring}' (use one of {SCORING_MODES})")
+        self.scoring = scoring
+
+    def build_ivf(self, nlist=None, nprobe=IVF_DEFAULT_NPROBE):
+        """Switches matching to approximate IVF search. Returns self for chaining."""
+        self.index = IVFIndex(self.embeddings, nlist=nlist, nprobe=nprobe) if len(self) else None
+        return self
+
+    def scores(self, features):
+        """Cosine similarity of every query face (rows) against every enrolled identity (cols)."""
+        queries = l2_normalize(features)
+        if self.scoring == "max" and self.templates is not None:
+            # Per identity, keep the best of its (contiguous) template columns
+            return np.maximum.reduceat(queries @ self.templates.T, self.template_starts, axis=1)
+        return queries @ self.embeddings.T
+
+    def _rescore_templates(self, queries, cand_idx, k):
+        """Max-over-templates scores for an IVF shortlist of identities."""
+        out_idx = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        out_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            cands = cand_idx[row][cand_idx[row] >= 0]
+            if cands.size == 0:
+                continue
+            cand_scores = np.array([float(np.max(self.templates[start:start + count] @ query))
+                                    for start, count in zip(self.template_starts[cands], self.template_counts[cands])],
+                                   dtype=np.float32)
+            best = top_k(cand_scores[None, :], k)[0]
+            out_idx[row, :best.size] = cands[best]
+            out_scores[row, :best.size] = cand_scores[best]
+        return out_idx, out_scores
+
+    def search(self, features, k=1):
+        """Returns (indices, scores) of the top-k identities per query, exact or via IVF."""
+        if self.index is not None:
+            queries = l2_normalize(features)
+            if self.scoring == "max" and self.templates is not None:
+                cand_idx, _ = self.index.search(queries, self.embeddings, k * MAX_SHORTLIST_FACTOR)
+                return self._rescore_templates(queries, cand_idx, k)
+            return self.index.search(queries, self.embeddings, k)
+        sims = self.scores(features)
+        idx = top_k(sims, k)
+        return idx, np.take_along_axis(sims, idx, axis=1)
+
+    def match(self, features, threshold=COSINE_THRESHOLD, k=1):
+        """
+        Scores a batch of query features against the whole gallery.
+        Returns one list per query with up to `k` (name, score) pairs, best first,
+        keeping only scores strictly above `threshold` (same rule as the old loop).
+        """
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if len(self) == 0 or features.shape[0] == 0:
+            return [[] for _ in range(features.shape[0])]
+
+        top_idx, top_scores = self.search(features, k)
+        results = []
+        for idxs, scores in zip(top_idx, top_scores):
+            hits = []
+            for idx, score in zip(idxs, scores):
+                if idx >= 0 and score > threshold:
+                    hits.append((self.names[idx], float(score)))
+            results.append(hits)
+        return results
+
+    def best_match(self, feature, threshold=COSINE_THRESHOLD):
+        """Returns (name, score) for a single face, or ("Unknown", 0.0) below threshold."""
+        hits = self.match(feature, threshold, k=1)[0]
+        if not hits:
+            return UNKNOWN_NAME, 0.0
+        return hits[0]
+
+    def best_matches(self, features, threshold=COSINE_THRESHOLD):
+        """Batch version of best_match: one (name, score) pair per query row."""
+        return [hits[0] if hits else (UNKNOWN_NAME, 0.0)
+                for hits in self.match(features, threshold, k=1)]
+
+
+# ==========================================
+# EMBEDDING STORE (Binary, Memory-Mappable)
+# ==========================================
+# Replaces the pickled {name: ndarray} dict. Layout of a .vgal file:
+#
+#   [8s magic "VISORGAL"][uint32 version][uint32 header_len][header JSON]
+#   [padding to 64 bytes][centroids: count x dim, float32/float16, row-major]
+#   [padding][templates: template_count x dim]   (v2, only if someone has >1)
+#   [template counts: count x int32]             (v2, only if templates exist)
+#   [name table: UTF-8 JSON list, `count` entries in row order]
+#
+# Rows are stored L2-normalized, so loading is just an np.memmap of the
+# matrix regions plus parsing the name table. No pickle, no per-identity
+# Python objects, and a float16 store halves the file size.
+
+STORE_MAGIC = b"VISORGAL"
+STORE_VERSION = 2
+STORE_ALIGN = 64
+STORE_DTYPES = ("float32", "float16")
+
+
+def _align(offset):
+    return (offset + STORE_ALIGN - 1) // STORE_ALIGN * STORE_ALIGN
+
+
+def save_store(path, names, embeddings, dtype="float32", source=""):
+    """
+    Writes names + L2-normalized embeddings to `path` atomically.
+    Each entry of `embeddings` is one identity's (n, 128) template array; the
+    per-identity centroid is computed here and all templates are kept when
+    anyone has more than one.
+    """
+    if dtype not in STORE_DTYPES:
+        raise ValueError(f"Unsupported store dtype '{dtype}' (use one of {STORE_DTYPES})")
+    names = list(names)
+    per_identity = [np.asarray(e, dtype=np.float32).reshape(-1, 128) for e in embeddings]
+    matrix = centroids_from_templates(per_identity).astype(dtype)
+    counts = np.array([len(t) for t in per_identity], dtype=np.int32)
+    if np.any(counts > 1):
+        templates = l2_normalize(np.vstack(per_identity)).astype(dtype)
+    else:
+        templates, counts = np.zeros((0, matrix.shape[1]), dtype=dtype), np.zeros(0, dtype=np.int32)
+    name_table = json.dumps(names, ensure_ascii=False).encode("utf-8")
+
+    header = {
+        "dtype": dtype,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "template_count": int(templates.shape[0]),
+        "normalized": True,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": source,
+        # Offsets are filled below once the header size is known
+        "matrix_offset": 0,
+        "templates_offset": 0,
+        "counts_offset": 0,
+        "names_offset": 0,
+        "names_length": len(name_table),
+    }
+    # Header size depends on the offsets it contains; iterate until they settle
+    header_bytes = b""
+    while _align(16 + len(header_bytes)) != header["matrix_offset"]:
+        header["matrix_offset"] = _align(16 + len(header_bytes))
+        header["templates_offset"] = _align(header["matrix_offset"] + matrix.nbytes)
+        header["counts_offset"] = header["templates_offset"] + templates.nbytes
+        header["names_offset"] = header["counts_offset"] + counts.nbytes
+        header_bytes = json.dumps(header).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(STORE_MAGIC + struct.pack("<II", STORE_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (header["matrix_offset"] - f.tell()))
+        f.write(np.ascontiguousarray(matrix).tobytes())
+        f.write(b"\0" * (header["templates_offset"] - f.tell()))
+        f.write(np.ascontiguousarray(templates).tobytes())
+        f.write(counts.astype("<i4").tobytes())
+        f.write(name_table)
+    os.replace(tmp_path, path)
+    return header
+
+
+def read_store_header(path):
+    """Parses and validates the header of a .vgal store."""
+    with open(path, "rb") as f:
+        prefix = f.read(16)
+        if len(prefix) < 16 or prefix[:8] != STORE_MAGIC:
+            raise ValueError(f"{path} is not a Visor embedding store")
+        version, header_len = struct.unpack("<II", prefix[8:])
+        if version > STORE_VERSION:
+            raise ValueError(f"{path} is store version {version}; this build reads up to {STORE_VERSION}")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        header["version"] = version
+        return header
+
+
+def _map_matrix(path, dtype, offset, rows, dim, mmap=True):
+    if mmap:
+        matrix = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(rows, dim))
+    else:
+        # Plain read: no open mapping, so the file can be replaced while we use it (Windows)
+        matrix = np.fromfile(path, dtype=dtype, count=rows * dim, offset=offset).reshape(rows, dim)
+    if matrix.dtype != np.float32:
+        # float16 halves the file, but matmul wants float32: one contiguous upcast
+        matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix
+
+
+def load_store(path, mmap=True):
+    """Returns (names, centroid matrix, header). float32 stores are memory-mapped read-only."""
+    header = read_store_header(path)
+    count, dim = header["count"], header["dim"]
+    with open(path, "rb") as f:
+        f.seek(header["names_offset"])
+        names = json.loads(f.read(header["names_length"]).decode("utf-8"))
+    if len(names) != count:
+        raise ValueError(f"{path}: name table has {len(names)} entries, header says {count}")
+
+    if count == 0:
+        return names, np.zeros((0, dim), dtype=np.float32), header
+    return names, _map_matrix(path, header["dtype"], header["matrix_offset"], count, dim, mmap), header
+
+
+def load_store_templates(path, header, mmap=True):
+    """Returns (templates, per-identity counts), or (None, None) for single-template stores."""
+    template_count = header.get("template_count", 0)
+    if template_count == 0:
+        return None, None
+    counts = np.fromfile(path, dtype="<i4", count=header["count"], offset=header["counts_offset"])
+    if int(counts.sum()) != template_count:
+        raise ValueError(f"{path}: template counts add up to {int(counts.sum())}, header says {template_count}")
+    templates = _map_matrix(path, header["dtype"], header["templates_offset"], template_count, header["dim"], mmap)
+    return templates, counts
+
+
+def convert_pickle_to_store(pkl_path, store_path, dtype="float32"):
+    """One-time migration from the legacy pickled {name: ndarray} dict."""
+    import pickle
+    with open(pkl_path, "rb") as f:
+        known_faces = pickle.load(f)
+    return save_store(store_path, list(known_faces.keys()), list(known_faces.values()),
+                      dtype=dtype, source=os.path.basename(pkl_path))
@@ -0,0 +1,127 @@
+import itertools
+
+import numpy as np
+
+from face_gallery import COSINE_THRESHOLD
+
+# ==========================================
+# FACE TRACKER (Track-then-recognize)
+# ==========================================
+# YuNet runs on every inference pass but SFace does not have to: boxes are
+# linked to tracks from the previous pass (IoU first, centroid distance as a
+# fallback for fast movers between sparse detections), and a track keeps the
+# identity it was given. A track is only re-embedded when it is new, when its
+# identity is Unknown or weak, or when TRACK_REVERIFY_INTERVAL has elapsed.
+#
+# update() must see every pass, including ones with no faces (an empty box
+# list): that is where tracks unseen for TRACK_MAX_AGE are dropped. A track
+# left alive would hand its identity to the next person standing in its spot.
+
+TRACK_IOU_THRESHOLD = 0.3
+TRACK_CENTROID_FACTOR = 0.5 # Fallback: centers closer than this x box size are the same face
+TRACK_MAX_AGE = 1.5 # Seconds a track survives without a matching box
+TRACK_REVERIFY_INTERVAL = 3.0 # Seconds before an identified track is re-embedded anyway
+# Cosine score below which the identity is re-checked every pass. Just above
+# the match threshold: genuine matches mostly score 0.45-0.6, so a higher bar
+# would re-embed nearly every known face and skip little.
+TRACK_MIN_CONFIDENCE = COSINE_THRESHOLD + 0.05
+
+
+def box_iou(a, b):
+    """IoU of two (x, y, w, h) boxes."""
+    ix = max(0.0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    __slots__ = ("id", "box", "name", "score", "last_seen", "last_embedded")
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.name = None # Not embedded yet
+        self.score = 0.0
+        self.last_seen = now
+        self.last_embedded = 0.0
+
+
+class FaceTracker:
+    """Links YuNet boxes across passes and decides which faces need a new SFace embedding."""
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_age=TRACK_MAX_AGE,
+                 reverify_interval=TRACK_REVERIFY_INTERVAL, min_confidence=TRACK_MIN_CONFIDENCE,
+                 unknown_name="Unknown"):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.reverify_interval = reverify_interval
+        self.min_confidence = min_confidence
+        self.unknown_name = unknown_name
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def _same_face(self, track, box):
+        iou = box_iou(track.box, box)
+        if iou >= self.iou_threshold:
+            return iou
+        tx, ty = track.box[0] + track.box[2] / 2, track.box[1] + track.box[3] / 2
+        bx, by = box[0] + box[2] / 2, box[1] + box[3] / 2
+        size = max(track.box[2], track.box[3], box[2], box[3])
+        if np.hypot(tx - bx, ty - by) < TRACK_CENTROID_FACTOR * size:
+            return iou # Still a candidate, ranked after every real overlap
+        return None
+
+    def update(self, boxes, now):
+        """
+        Assigns each (x, y, w, h) box to a track (creating new ones as needed)
+        and forgets tracks unseen for `max_age`. Returns one Track per box.
+        """
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for bi, box in enumerate(boxes):
+                score = self._same_face(track, box)
+                if score is not None:
+                    pairs.append((score, ti, bi))
+        # Greedy: best overlaps first, each track and box used once
+        pairs.sort(reverse=True)
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        for _, ti, bi in pairs:
+            if ti in used_tracks or assigned[bi] is not None:
+                continue
+            used_tracks.add(ti)
+            track = self.tracks[ti]
+            track.box = boxes[bi]
+            track.last_seen = now
+            assigned[bi] = track
+
+        for bi, box in enumerate(boxes):
+            if assigned[bi] is None:
+                assigned[bi] = Track(next(self._ids), box, now)
+                self.tracks.append(assigned[bi])
+
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+        return assigned
+
+    def needs_embedding(self, track, now):
+        return (track.name is None
+                or track.name == self.unknown_name
+                or track.score < self.min_confidence
+                or now - track.last_embedded >= self.reverify_interval)
+
+    def identify(self, track, name, score, now):
+        track.name = name
+        track.score = float(score)
+        track.last_embedded = now
+
+    def live(self, now):
+        """Tracks seen within `max_age` of `now` (the rest are gone, pruned or not)."""
+        return sum(1 for t in list(self.tracks) if now - t.last_seen <= self.max_age)
+
+    def reset(self):
+        self.tracks = []
+
+    def __len__(self):
+        return len(self.tracks)
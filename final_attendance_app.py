@@ -1,4 +1,6 @@
 import os
+import hashlib
+import shutil
 import cv2
 import numpy as np
 import time
@@ -8,24 +10,78 @@ import threading
 import logging
 from flask import Flask, render_template_string, jsonify, send_from_directory, request, Response
 
-import csv
 import requests # Restore requests for Ollama check
+from face_gallery import FaceGallery, COSINE_THRESHOLD
+from vision_pipeline import FrameGrabber, InferenceScheduler, StageTimer, MotionGate, DetectionScheduler, FrameHub
+from face_tracker import FaceTracker
+from mjpeg_stream import MjpegBroadcaster
+from event_log import EventWriter, EventStore, STORE_FORMAT, to_display
+from live_events import EventBus, format_sse
+from photo_index import PhotoIndex
+from storage_janitor import StorageJanitor, day_folder
+from recorder import Recorder, SegmentIndex
+from chat_context import ContextBuilder, estimate_tokens
+from attendance_query import AttendanceQuery
+from ollama_client import OllamaClient, QueueFull
+from chat_cache import ResponseCache, ConversationCache
+from health_monitor import HealthMonitor
 
 # ==========================================
 # CONFIGURATION
 # ==========================================
 BASE_DIR = os.getcwd() # Force use of current directory for external files
 manual_recording_active = False 
-frame_buffer = None 
 show_local_preview = True 
 FACES_DIR = os.path.join(BASE_DIR, "faces")
 PHOTOS_DIR = os.path.join(BASE_DIR, "attendance_photos")
-LOG_FILE = os.path.join(BASE_DIR, "lobby_log.csv")
+LOG_FILE = os.path.join(BASE_DIR, "lobby_log.csv") # Legacy log: imported into EVENT_DB on first start
+EVENT_DB = os.path.join(BASE_DIR, "lobby_log.db") # Attendance events (SQLite); CSV via /api/logs/export.csv
 NOTES_FILE = os.path.join(BASE_DIR, "student_notes.md")
 EXIT_THRESHOLD = 3.0  # Seconds before considering someone "Gone"
 OLLAMA_URL = "http://localhost:11434/api/generate"
 OLLAMA_MODEL = "qwen2.5:7b"
+CHAT_CONTEXT_TOKENS = 1500 # Budget for log/notes context per question (see chat_context.py)
+HEALTH_INTERVALS = {'ai': 10.0, 'cameras': 5.0, 'disk': 60.0, 'recorder': 10.0} # Seconds between probes (see health_monitor.py)
+HEALTH_MAX_BACKOFF = 120.0 # A probe that keeps failing backs off (x2 each time) up to this
+CAMERA_STALE_SECONDS = 5.0 # A camera without a new frame for this long counts as down
+DISK_MIN_FREE_GB = 1.0 # Less free space than this counts as down
+OLLAMA_MAX_CONCURRENT = 1 # Generations at once (a local model answers one question at a time anyway)
+OLLAMA_MAX_QUEUE = 8 # Questions allowed to wait for the model; more get "busy" (see ollama_client.py)
+CHAT_CACHE_SIZE = 256 # Cached replies (same question + same data = same answer, see chat_cache.py)
+CHAT_CACHE_TTL = 600.0 # Seconds a cached reply is served
+CHAT_NUM_CTX = 4096 # Model context window (tokens) requested from Ollama for chat
+CHAT_REPLY_TOKENS = 512 # Longest chat reply (tokens); kept free in the window
+CHAT_CONVERSATION_TOKENS = CHAT_NUM_CTX - CHAT_REPLY_TOKENS # A follow-up starts over unless context + new turn fit in this
 current_mode = "SURVEILLANCE" # Default Mode
+GALLERY_INDEX = "exact" # "exact" (brute force) or "ivf" (approximate, for 100k+ rosters)
+IVF_NPROBE = 16 # Cells searched per face in "ivf" mode (see benchmarks/bench_ann_recall.py)
+MATCH_SCORING = "centroid" # "centroid" (fast, one row per person) or "max" (best of all their photos)
+ENCODINGS_FILE = "face_encodings_sface.vgal"
+LEGACY_ENCODINGS_FILE = "face_encodings_sface.pkl"
+GALLERY_WATCH_INTERVAL = 2.0 # Seconds between checks for a re-encoded face cache (0 = off)
+# Cameras: "source" is a device index (0 = default webcam) or a stream URL (rtsp://..., http://...)
+# "id" is used in URLs (/video_feed/<id>), "label" on screen and in logs.
+CAMERAS = [
+    {"id": "cam0", "source": 0, "label": "Lobby"},
+]
+INFERENCE_WORKERS = 1 # Shared by all cameras; each worker loads its own YuNet + SFace
+INFERENCE_BATCH = 4 # Max frames (from different cameras) a worker recognizes in one pass
+# Detection rate adapts per camera: fast while there is motion / faces, backs off on a static scene
+DETECTION_MAX_FPS = {"SURVEILLANCE": 8.0, "ATTENDANCE": 10.0} # Blink check needs the faster rate
+DETECTION_IDLE_FPS = 1.0 # Floor on an empty, static scene
+DETECTION_CPU_BUDGET = 1.0 # Cores all cameras' inference may use together (0 = no limit)
+MOTION_THRESHOLD = 0.01 # Fraction of changed pixels that counts as motion
+EVENT_QUEUE_SIZE = 256 # Pending events (with their photos) before log_event starts dropping
+EVENT_FSYNC_INTERVAL = 5.0 # Seconds between WAL checkpoints of the event log (rows are committed per batch)
+FACE_TRACKING = True # Surveillance: only run SFace on new / uncertain faces (see face_tracker.py)
+# Retention for the day folders of photos and recordings (see storage_janitor.py). 0 = no limit.
+# "archive" packs a pruned day into ARCHIVE_DIR/<store>_<day>.zip before deleting it.
+STORAGE_POLICY = {
+    "photos": {"max_age_days": 365, "max_gb": 5.0, "action": "archive"},
+    "recordings": {"max_age_days": 30, "max_gb": 50.0, "action": "delete"},
+}
+ARCHIVE_DIR = os.path.join(BASE_DIR, "archive")
+JANITOR_INTERVAL = 3600.0 # Seconds between retention passes
 
 # ==========================================
 # PREMIUM "vishwajeet" UI TEMPLATE
@@ -179,6 +235,11 @@ HTML_TEMPLATE = """
             max-width: 100%; max-height: 500px; border-radius: 12px;
             box-shadow: 0 20px 60px rgba(0,0,0,0.5); border: 1px solid rgba(255,255,255,0.1);
         }
+        .live-grid {
+            display: grid; grid-template-columns: repeat(auto-fit, minmax(320px, 1fr)); gap: 15px; width: 100%;
+        }
+        .live-grid .live-feed-img { width: 100%; max-height: 360px; object-fit: contain; }
+        .live-label { margin-top: 8px; color: var(--stripe-text-dim); font-size: 0.85rem; text-align: center; }
 
         /* CHAT SIDEBAR */
         /* CHAT SIDEBAR */
@@ -322,6 +383,9 @@ HTML_TEMPLATE = """
                         <span class="slider"></span>
                     </label>
                 </div>
+                <div class="form-group">
+                    <button class="tab-btn" style="width:100%" onclick="reloadFaces()">🔄 Reload Faces</button>
+                </div>
             </div>
             
             <div style="margin-top:auto; padding-top:20px; border-top:1px solid rgba(255,255,255,0.1)">
@@ -329,6 +393,7 @@ HTML_TEMPLATE = """
                 <div style="font-size:0.85rem; color:var(--stripe-text-dim); line-height:1.6">
                     <div id="status-mode">Mode: Loading...</div>
                     <div id="status-ollama">AI Model: Checking...</div>
+                    <div id="status-gallery">Faces: Loading...</div>
                 </div>
             </div>
         </aside>
@@ -368,13 +433,35 @@ HTML_TEMPLATE = """
         render();
     }
 
+    // Phones get a lighter MJPEG tier (see /api/streams)
+    function feedUrl(url) {
+        return window.innerWidth < 700 ? url + '?w=320&q=60&fps=12' : url;
+    }
+
     async function render() {
         if(currentTab === 'live') {
-            contentDiv.innerHTML = `
-                <div class="live-container">
-                    <img src="/video_feed" class="live-feed-img" alt="Live Stream">
-                    <p style="margin-top:15px; color:var(--stripe-text-dim)">Real-time Surveillance Feed (MJPEG)</p>
-                </div>`;
+            let cams = [];
+            try {
+                const res = await fetch('/api/cameras');
+                cams = await res.json();
+            } catch(e) {}
+            if(cams.length > 1) {
+                // One tile per camera
+                contentDiv.innerHTML = `
+                    <div class="live-grid">
+                        ${cams.map(c => `
+                            <div>
+                                <img src="${feedUrl(c.feed)}" class="live-feed-img" alt="${c.label}">
+                                <div class="live-label" data-cam="${c.id}">${c.label} &middot; Lobby: ${c.lobby.length}</div>
+                            </div>`).join('')}
+                    </div>`;
+            } else {
+                contentDiv.innerHTML = `
+                    <div class="live-container">
+                        <img src="${feedUrl('/video_feed')}" class="live-feed-img" alt="Live Stream">
+                        <p style="margin-top:15px; color:var(--stripe-text-dim)">Real-time Surveillance Feed (MJPEG)</p>
+                    </div>`;
+            }
         } else if(currentTab === 'logs') {
             renderLogs();
         } else if(currentTab === 'logs') {
@@ -382,22 +469,7 @@ HTML_TEMPLATE = """
         } else if(currentTab === 'notes') {
             renderNotes();
         } else if(currentTab === 'photos') {
-            try {
-                const res = await fetch('/api/photos');
-                const data = await res.json();
-                if(data.length === 0) {
-                     contentDiv.innerHTML = '<div style="padding:20px; color:var(--stripe-text-dim)">No photos found.</div>';
-                     return;
-                }
-                contentDiv.innerHTML = '<div class="grid">' + data.map(p => `
-                    <div class="card" onclick="window.open('${p.url}', '_blank')">
-                        <img src="${p.url}" loading="lazy">
-                        <div class="card-body">
-                            <div class="card-name">${p.name}</div>
-                            <div style="font-size:0.75rem; color:#aaa; margin-top:4px">${p.timestamp}</div>
-                        </div>
-                    </div>`).join('') + '</div>';
-            } catch(e) { contentDiv.innerHTML = 'Error loading photos'; }
+            renderPhotos();
         } else if(currentTab === 'recordings') {
             try {
                 const res = await fetch('/api/videos');
@@ -419,11 +491,40 @@ HTML_TEMPLATE = """
         }
     }
 
+    // Logs are fetched once, then only deltas: ?since=<cursor> (an idle log answers 304)
+    let logsNewest = null; // Newest event id we have
+    let logsVersion = 0; // Store version our rows are from (bumped when old rows are rewritten)
+    let logsOldest = null; // Oldest event id we have (for loading older pages)
+    let logsHasMore = false;
+
+    function setLogsCursor(cursor) {
+        const [newest, version] = cursor.split('.');
+        logsNewest = parseInt(newest); logsVersion = parseInt(version);
+    }
+
     async function renderLogs() {
-        // Fetch only if not cached or forcing refresh (we'll just re-fetch for simplicity/live updates)
-        const res = await fetch('/api/logs');
-        cachedLogs = await res.json();
-        updateLogsTable();
+        if(logsNewest === null) {
+            const res = await fetch('/api/logs?limit=500');
+            const d = await res.json();
+            cachedLogs = d.events;
+            setLogsCursor(d.cursor); logsOldest = d.oldest; logsHasMore = d.has_more;
+        } else {
+            const res = await fetch(`/api/logs?since=${logsNewest}.${logsVersion}`);
+            const d = await res.json();
+            if(d.has_more || d.reset) { logsNewest = null; return renderLogs(); } // Behind or out of date: start over
+            setLogsCursor(d.cursor);
+            if(d.events.length === 0 && contentDiv.querySelector('.data-table')) return; // Nothing new
+            cachedLogs = d.events.concat(cachedLogs);
+        }
+        if(currentTab === 'logs') updateLogsTable();
+    }
+
+    async function loadOlderLogs() {
+        const res = await fetch(`/api/logs?before=${logsOldest}&limit=500`);
+        const d = await res.json();
+        cachedLogs = cachedLogs.concat(d.events);
+        if(d.oldest !== null) logsOldest = d.oldest;
+        logsHasMore = d.has_more;
     }
 
     function updateLogsTable() {
@@ -435,7 +536,10 @@ HTML_TEMPLATE = """
         const end = start + LOGS_PER_PAGE;
         const pageItems = cachedLogs.slice(start, end);
         
-        let html = `<h3>Activity Log</h3>
+        let html = `<div style="display:flex; justify-content:space-between; align-items:center;">
+            <h3>Activity Log</h3>
+            <a href="/api/logs/export.csv" style="color:var(--stripe-accent); font-size:0.85rem">⬇ Export CSV</a>
+        </div>
         <table class="data-table">
             <thead><tr><th>Time</th><th>Event</th><th>Name</th><th>Verification</th></tr></thead>
             <tbody>`;
@@ -446,7 +550,7 @@ HTML_TEMPLATE = """
                 <td>${row.Timestamp.split(' ')[1]} ${row.Timestamp.split(' ')[2]}</td>
                 <td><span class="status-badge ${badgeClass}">${row.Event}</span></td>
                 <td style="font-weight:600">${row.Name}</td>
-                <td>${row.PhotoPath ? `<a href="/photos/${row.PhotoPath.split('/').pop()}" target="_blank" style="color:var(--stripe-accent)">View Photo</a>` : '-'}</td>
+                <td>${row.PhotoPath ? `<a href="/photos/${row.PhotoPath.split('attendance_photos/').pop()}" target="_blank" style="color:var(--stripe-accent)">View Photo</a>` : '-'}</td>
             </tr>`;
         });
         html += `</tbody></table>`;
@@ -455,17 +559,71 @@ HTML_TEMPLATE = """
         html += `<div style="display:flex; justify-content:center; align-items:center; gap:15px; margin-top:20px;">
             <button class="tab-btn" onclick="changeLogPage(-1)" ${currentLogPage===1?'disabled style="opacity:0.5"':''}>◀ Prev</button>
             <span style="color:var(--stripe-text-dim); font-size:0.9rem">Page ${currentLogPage} of ${totalPages || 1}</span>
-            <button class="tab-btn" onclick="changeLogPage(1)" ${currentLogPage>=totalPages?'disabled style="opacity:0.5"':''}>Next ▶</button>
+            <button class="tab-btn" onclick="changeLogPage(1)" ${currentLogPage>=totalPages && !logsHasMore?'disabled style="opacity:0.5"':''}>Next ▶</button>
         </div>`;
         
         contentDiv.innerHTML = html;
     }
 
-    function changeLogPage(delta) {
+    async function changeLogPage(delta) {
         currentLogPage += delta;
+        // Past the last loaded page: fetch the next older page from the server
+        if(currentLogPage > Math.ceil(cachedLogs.length / LOGS_PER_PAGE) && logsHasMore) {
+            await loadOlderLogs();
+        }
         updateLogsTable();
     }
 
+    // PHOTOS: one page of thumbnails at a time, filtered on the server
+    let photoPage = 1;
+    let photoFilter = {name: '', date: ''};
+
+    async function renderPhotos() {
+        let data;
+        try {
+            const q = new URLSearchParams({page: photoPage, limit: 60});
+            if(photoFilter.name) q.set('name', photoFilter.name);
+            if(photoFilter.date) { q.set('from', photoFilter.date); q.set('to', photoFilter.date); }
+            const res = await fetch('/api/photos?' + q);
+            data = await res.json();
+        } catch(e) { contentDiv.innerHTML = 'Error loading photos'; return; }
+
+        let html = `<div style="display:flex; gap:10px; align-items:center; margin-bottom:15px;">
+            <input type="text" placeholder="Name" value="${photoFilter.name}" onchange="filterPhotos('name', this.value)">
+            <input type="date" value="${photoFilter.date}" onchange="filterPhotos('date', this.value)">
+            <span style="color:var(--stripe-text-dim); font-size:0.85rem">${data.total} photos</span>
+        </div>`;
+        if(data.photos.length === 0) {
+            contentDiv.innerHTML = html + '<div style="padding:20px; color:var(--stripe-text-dim)">No photos found.</div>';
+            return;
+        }
+        html += '<div class="grid">' + data.photos.map(p => `
+            <div class="card" onclick="window.open('${p.url}', '_blank')">
+                <img src="${p.thumb}" loading="lazy">
+                <div class="card-body">
+                    <div class="card-name">${p.name}</div>
+                    <div style="font-size:0.75rem; color:#aaa; margin-top:4px">${p.timestamp}</div>
+                </div>
+            </div>`).join('') + '</div>';
+        html += `<div style="display:flex; justify-content:center; align-items:center; gap:15px; margin-top:20px;">
+            <button class="tab-btn" onclick="changePhotoPage(-1)" ${data.page<=1?'disabled style="opacity:0.5"':''}>◀ Prev</button>
+            <span style="color:var(--stripe-text-dim); font-size:0.9rem">Page ${data.page} of ${data.pages || 1}</span>
+            <button class="tab-btn" onclick="changePhotoPage(1)" ${data.page>=data.pages?'disabled style="opacity:0.5"':''}>Next ▶</button>
+        </div>`;
+        contentDiv.innerHTML = html;
+    }
+
+    function filterPhotos(key, value) {
+        photoFilter[key] = value.trim();
+        photoPage = 1;
+        renderPhotos();
+    }
+
+    function changePhotoPage(delta) {
+        photoPage = Math.max(1, photoPage + delta);
+        renderPhotos();
+    }
+
     async function renderNotes() {
         // Fetch current notes
         const res = await fetch('/api/notes');
@@ -542,6 +700,7 @@ HTML_TEMPLATE = """
     // Chat Logic
     const chatBox = document.getElementById('chat-box');
     const input = document.getElementById('user-input');
+    const chatConversation = Date.now().toString(36) + Math.random().toString(36).slice(2); // Follow-ups continue this page's conversation
     
     input.addEventListener('keypress', async (e) => {
         if(e.key === 'Enter' && input.value.trim()) {
@@ -558,18 +717,55 @@ HTML_TEMPLATE = """
                 </div>`;
             chatBox.scrollTop = chatBox.scrollHeight;
 
+            // Stream the reply: tokens appear as the model writes them
+            let bubble = null;
+            const showText = (text, color) => {
+                const loader = document.getElementById(loadingId);
+                if(loader) loader.remove();
+                if(!bubble) {
+                    bubble = document.createElement('div');
+                    bubble.className = 'message msg-ai';
+                    bubble.style.whiteSpace = 'pre-wrap';
+                    chatBox.appendChild(bubble);
+                }
+                if(color) bubble.style.color = color;
+                bubble.textContent += text;
+                chatBox.scrollTop = chatBox.scrollHeight;
+            };
             try {
-                const res = await fetch('/api/chat', {
-                    method:'POST', headers:{'Content-Type':'application/json'},
-                    body: JSON.stringify({message: txt})
+                const res = await fetch('/api/chat?stream=1', {
+                    method:'POST', headers:{'Content-Type':'application/json', 'Accept':'text/event-stream'},
+                    body: JSON.stringify({message: txt, conversation: chatConversation})
                 });
-                const data = await res.json();
-                
-                // Remove Loading
-                document.getElementById(loadingId).remove();
-                
-                chatBox.innerHTML += `<div class="message msg-ai">${data.reply}</div>`;
-                chatBox.scrollTop = chatBox.scrollHeight;
+                const reader = res.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while(true) {
+                    const {value, done} = await reader.read();
+                    if(done) break;
+                    buffer += decoder.decode(value, {stream: true});
+                    let end;
+                    while((end = buffer.indexOf('\\n\\n')) >= 0) {
+                        const block = buffer.slice(0, end);
+                        buffer = buffer.slice(end + 2);
+                        let kind = 'message', data = '';
+                        block.split('\\n').forEach(line => {
+                            if(line.startsWith('event: ')) kind = line.slice(7);
+                            else if(line.startsWith('data: ')) data += line.slice(6);
+                        });
+                        if(!data) continue;
+                        const msg = JSON.parse(data);
+                        if(kind === 'queued') {
+                            const loader = document.getElementById(loadingId);
+                            if(loader) loader.innerHTML = `<span style="font-size:12px;opacity:0.7">${msg.position} question(s) ahead of you...</span>`;
+                        } else if(kind === 'token') {
+                            showText(msg.text);
+                        } else if(kind === 'error') {
+                            showText(msg.reply, '#ff4f4f');
+                        }
+                    }
+                }
+                if(!bubble) showText('(no reply)');
             } catch(e) {
                 // Remove Loading on error
                 const loader = document.getElementById(loadingId);
@@ -598,16 +794,71 @@ HTML_TEMPLATE = """
             btn.innerText = '● REC';
         }
     }
-    // Check initial status
-    fetch('/api/status').then(r=>r.json()).then(d=> {
+    function updateStatus(d) {
         updateRecBtn(d.recording);
         document.getElementById('status-ollama').innerText = "AI Model: " + (d.ollama_online ? "Online 🟢" : "Offline 🔴");
-    });
+        if(d.health) {
+            // Every probe on hover ('status' pushes {name: ok}, /api/status sends {name: {ok, ...}})
+            document.getElementById('status-ollama').title = Object.entries(d.health).map(([name, h]) => {
+                const ok = (h !== null && typeof h === 'object') ? h.ok : h;
+                return `${name}: ${ok === null ? 'checking...' : ok ? 'ok' : 'DOWN'}`;
+            }).join('\\n');
+        }
+        if(d.mode) document.getElementById('status-mode').innerText = "Mode: " + d.mode;
+    }
+    // Check initial status
+    fetch('/api/status').then(r=>r.json()).then(updateStatus);
     
     // Load Settings into Sidebar
     loadSettingsToSidebar();
+
+    // FACE GALLERY (Hot Reload)
+    async function updateGalleryStatus() {
+        const res = await fetch('/api/gallery');
+        const g = await res.json();
+        document.getElementById('status-gallery').innerText = g.reloading
+            ? "Faces: Reloading..."
+            : `Faces: ${g.faces} enrolled` + (g.error ? " ⚠️" : "");
+        return g;
+    }
+    async function reloadFaces() {
+        await fetch('/api/gallery/reload', {method:'POST'});
+        // Poll briefly until the background reload finishes
+        for(let i = 0; i < 20; i++) {
+            const g = await updateGalleryStatus();
+            if(!g.reloading) break;
+            await new Promise(r => setTimeout(r, 500));
+        }
+    }
+    updateGalleryStatus();
     
-    setInterval(() => { if(currentTab === 'logs') renderLogs(); }, 3000); // Auto refresh Logs only
+    // LIVE EVENTS (pushed by the server; EventSource reconnects by itself with Last-Event-ID)
+    let liveConnected = false;
+    const live = new EventSource('/api/events');
+    live.onopen = () => { liveConnected = true; };
+    live.onerror = () => { liveConnected = false; };
+    live.addEventListener('status', e => updateStatus(JSON.parse(e.data)));
+    live.addEventListener('log', e => {
+        const row = JSON.parse(e.data);
+        if(logsNewest === null || row.id <= logsNewest) return; // Not loaded yet / already have it
+        cachedLogs.unshift(row);
+        logsNewest = row.id;
+        if(currentTab === 'logs') updateLogsTable();
+    });
+    live.addEventListener('logs_rewritten', e => {
+        // Old rows changed (photos pruned): reload rather than keep dead "View Photo" links
+        if(logsNewest === null) return;
+        logsNewest = null;
+        if(currentTab === 'logs') renderLogs();
+    });
+    live.addEventListener('lobby', e => {
+        const d = JSON.parse(e.data);
+        const label = document.querySelector(`.live-label[data-cam="${d.camera}"]`);
+        if(label) label.innerHTML = `${d.label} &middot; Lobby: ${d.people.length}`;
+    });
+
+    // Fallback while the push channel is down (e.g. a proxy that buffers it)
+    setInterval(() => { if(currentTab === 'logs' && !liveConnected) renderLogs(); }, 3000);
 </script>
 </body>
 </html>
@@ -625,34 +876,112 @@ log.setLevel(logging.ERROR)
 def toggle_record():
     global manual_recording_active
     manual_recording_active = not manual_recording_active
+    publish_status()
     return jsonify({'status': manual_recording_active})
 
 @app.route('/api/status')
 def server_status():
-    # Check Ollama
-    is_online = False
-    try:
-        if requests.get("http://localhost:11434/", timeout=0.2).status_code == 200:
-            is_online = True
-    except: pass
-    
+    """
+    Recording flag, detection rates and the health monitor's last results
+    (no probing here). ?history=0 leaves out the per-probe latency history;
+    ?recheck=1 asks the monitor to probe everything now (results on the next call).
+    """
+    monitor = get_health_monitor()
+    if request.args.get('recheck') == '1':
+        monitor.check_now()
+    health = monitor.snapshot(history=request.args.get('history') != '0')
+
+    # Effective detection rate per camera (adaptive scheduling)
+    detection = detection_scheduler.snapshot()
+    for cam in list(cameras.values()):
+        if cam.id in detection:
+            detection[cam.id]['motion'] = round(cam.motion_gate.motion, 4)
+
     return jsonify({
         'recording': manual_recording_active,
-        'ollama_online': is_online
+        'ollama_online': bool(health.get('ai', {}).get('ok')),
+        'detection': detection,
+        'health': health
     })
 
+LOGS_PAGE_LIMIT = 1000 # Max rows per /api/logs call
+
+def parse_logs_cursor(value):
+    """'<newest id>.<store version>' -> (id, version). A bare id (older clients) -> (id, None)."""
+    if not value:
+        return None, None
+    event_id, _, version = value.partition('.')
+    try:
+        return int(event_id), (int(version) if version else None)
+    except ValueError:
+        return None, None
+
 @app.route('/api/logs')
 def get_logs_json():
-    """Returns parsed CSV logs as JSON."""
-    if not os.path.exists(LOG_FILE): return jsonify([])
+    """
+    Events, newest first, with cursors:
+      ?since=<cursor>  only events newer than a previous response's `cursor` (polling deltas)
+      ?before=<id>     older page (pass the previous page's `oldest`)
+      ?limit=N (default 500), ?name=, ?event=ENTERED|EXITED, ?from=YYYY-MM-DD, ?to=YYYY-MM-DD
+    The cursor is '<newest id>.<store version>'. If rows the client already has
+    were rewritten since (photo links dropped by the janitor), ?since= answers
+    with the latest page and `reset: true` instead of a delta.
+    Sends an ETag; an unchanged log answers 304 to If-None-Match.
+    """
+    args = request.args
+    limit = max(1, min(args.get('limit', 500, type=int), LOGS_PAGE_LIMIT))
+    store = get_event_store()
     try:
-        entries = []
-        with open(LOG_FILE, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                entries.append(row)
-        return jsonify(entries[-500:][::-1]) # Return last 500, reversed
-    except: return jsonify([])
+        newest, version = store.last_id(), store.version()
+        cursor = f"{newest}.{version}"
+        # New events raise the newest id, rewrites raise the version: with the query, that identifies the answer
+        etag = f"{cursor}-{hashlib.sha1(request.query_string).hexdigest()[:12]}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        since, since_version = parse_logs_cursor(args.get('since'))
+        reset = since is not None and since_version is not None and since_version != version
+        if reset:
+            since = None # The client's rows are out of date: send the latest page to start over from
+        events = store.query(since=since, before=args.get('before', type=int), limit=limit,
+                             name=args.get('name') or None, event=args.get('event') or None,
+                             date_from=args.get('from') or None, date_to=args.get('to') or None)
+    except Exception as e:
+        print(f"⚠️ /api/logs failed: {e}")
+        return jsonify({'events': [], 'cursor': None, 'error': str(e)}), 500
+
+    response = jsonify({
+        'events': events,
+        'cursor': cursor, # Pass back as ?since= to get only what is new
+        'reset': reset, # `events` replaces what the client has (see above)
+        'oldest': events[-1]['id'] if events else None, # Pass as ?before= for the next older page
+        'has_more': len(events) == limit, # More rows than fit (older ones, or a gap if ?since=)
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache' # Browsers revalidate with If-None-Match
+    return response
+
+@app.route('/api/events')
+def live_events_stream():
+    """
+    Server-Sent Events: 'log' (each new event, /api/logs row shape), 'lobby'
+    (who is in front of a camera), 'status' (recording, mode, AI model).
+    A reconnecting browser sends Last-Event-ID and gets what it missed.
+    """
+    get_health_monitor() # Make sure the probes are running so 'status' has something to say
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(live_bus.sse_stream(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/logs/export.csv')
+def export_logs_csv():
+    """The whole event log as a spreadsheet-friendly CSV download (same columns as lobby_log.csv)."""
+    filename = f"lobby_log_{datetime.now().strftime('%Y%m%d')}.csv"
+    return Response(get_event_store().iter_csv(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 @app.route('/api/settings', methods=['GET', 'POST'])
 def api_settings():
@@ -660,13 +989,17 @@ def api_settings():
     
     if request.method == 'POST':
         data = request.json
-        if 'exit_threshold' in data: EXIT_THRESHOLD = float(data['exit_threshold'])
+        if 'exit_threshold' in data:
+            EXIT_THRESHOLD = float(data['exit_threshold'])
+            if attendance_query is not None:
+                attendance_query.stale_after = EXIT_THRESHOLD # For events logged from now on
         if 'show_preview' in data: show_local_preview = bool(data['show_preview'])
         if 'mode' in data: 
             # Safe mode switch
             if data['mode'] in ['SURVEILLANCE', 'ATTENDANCE']:
                 pass
             current_mode = data['mode']
+            publish_status()
             
         return jsonify({'status': 'ok', 'mode': current_mode})
         
@@ -676,6 +1009,49 @@ def api_settings():
         'mode': current_mode
     })
 
+@app.route('/api/gallery')
+def api_gallery():
+    return jsonify(gallery_status)
+
+@app.route('/api/gallery/reload', methods=['POST'])
+def api_gallery_reload():
+    """Rebuilds the face gallery in the background; the camera keeps running."""
+    started = reload_gallery_async()
+    return jsonify({'status': 'reloading' if started else 'busy', 'gallery': gallery_status})
+
+@app.route('/api/pipeline')
+def api_pipeline():
+    """Per-stage timings (ms) of the grab / inference / render pipeline."""
+    stats = pipeline_stats.snapshot()
+    stats['cameras'] = {
+        cam.id: {
+            'label': cam.label,
+            'camera_frames_dropped': cam.grabber.dropped if cam.grabber else 0,
+            'inference_jobs_dropped': inference_scheduler.dropped.get(cam.id, 0),
+            'tracks': len(cam.tracker),
+            'stream_viewers': len(cam.broadcaster.clients),
+            'stream_encodes': cam.broadcaster.encodes,
+            'recorder': cam.recorder.snapshot() if cam.recorder else None,
+        }
+        for cam in list(cameras.values())
+    }
+    # Background event writer: queue depth, rows/photos written, drops (latency: event_write / event_latency stages)
+    stats['event_writer'] = event_writer.snapshot() if event_writer else None
+    # AI generations: running/waiting, last first-token and total time, errors, questions turned away
+    stats['ollama'] = ollama_client.snapshot() if ollama_client else None
+    # Reply cache (hit rate, generation ms saved) and conversations continued on the model's context
+    stats['chat_cache'] = chat_reply_cache.snapshot()
+    stats['chat_conversations'] = chat_conversations.snapshot()
+    return jsonify(stats)
+
+@app.route('/api/cameras')
+def api_cameras():
+    """Configured cameras with their lobby and MJPEG feed URL."""
+    return jsonify([
+        {'id': cam.id, 'label': cam.label, 'lobby': cam.lobby(), 'feed': f'/video_feed/{cam.id}'}
+        for cam in list(cameras.values())
+    ])
+
 @app.route('/api/notes', methods=['GET', 'POST'])
 def api_notes():
     if request.method == 'POST':
@@ -690,21 +1066,40 @@ def api_notes():
                 content = f.read()
         return jsonify({'content': content})
 
-def get_logs_context():
-    """Reads the CSV logs and returns them as a string context."""
-    if not os.path.exists(LOG_FILE):
-        return "No logs available."
-    
+chat_context_builder = None
+chat_context_lock = threading.Lock()
+
+def get_chat_context(question):
+    """Notes + log context relevant to `question`, within CHAT_CONTEXT_TOKENS. Returns (text, info)."""
+    global chat_context_builder
+    with chat_context_lock:
+        if chat_context_builder is None:
+            chat_context_builder = ContextBuilder(get_event_store(), budget=CHAT_CONTEXT_TOKENS)
+    gallery = active_gallery
     try:
-        with open(LOG_FILE, 'r') as f:
-            lines = f.readlines()
-            
-        # User requested FULL history context
-        # Sending all lines to the AI
-        context = "".join(lines)
-        return context
+        text, info = chat_context_builder.build(question, get_notes_context(),
+                                                extra_names=gallery.names if gallery is not None else ())
     except Exception as e:
-        return f"Error reading logs: {str(e)}"
+        return f"Error reading logs: {str(e)}", {}
+    lobby = lobby_names()
+    text = f"In the lobby right now: {', '.join(lobby) if lobby else 'nobody'}\n\n" + text
+    facts = get_attendance_query().facts(question)
+    if facts:
+        text += "\n\n--- VISITS (computed from the log: in - out) ---\n" + "\n".join(facts)
+    return text, info
+
+def lobby_names():
+    return sorted({name for cam in list(cameras.values()) for name in cam.lobby()})
+
+attendance_query = None
+
+def get_attendance_query():
+    """Answers common attendance questions straight from the log (see attendance_query.py)."""
+    global attendance_query
+    with chat_context_lock:
+        if attendance_query is None:
+            attendance_query = AttendanceQuery(get_event_store(), lobby=lobby_names, stale_after=EXIT_THRESHOLD)
+        return attendance_query
 
 def get_notes_context():
     """Reads the student notes file and returns content."""
@@ -724,144 +1119,241 @@ def index():
 # Removed duplicate /api/status endpoint to fix collision
 
 @app.route('/video_feed')
-def video_feed():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
-
-def generate_frames():
-    """Generator for MJPEG stream from the global `frame` variable."""
-    global frame_buffer
+@app.route('/video_feed/<cam_id>')
+def video_feed(cam_id=None):
+    """MJPEG stream. Optional ?w=<width>&q=<jpeg quality>&fps=<max fps> for lighter streams (phones)."""
+    if cam_id is not None and cameras and cam_id not in cameras:
+        return jsonify({'error': f'unknown camera {cam_id}'}), 404
+    width = request.args.get('w', type=int)
+    quality = request.args.get('q', type=int)
+    fps = request.args.get('fps', default=25.0, type=float)
+    return Response(generate_frames(cam_id, width, quality, fps), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+def generate_frames(cam_id=None, width=None, quality=None, fps=25.0):
+    """MJPEG stream of one camera (default: the first configured one)."""
+    # Flask runs in a THREAD (not a Process), so it can read the camera's frames directly.
+    # Every viewer of a camera shares its broadcaster: one JPEG encode per new frame per quality tier.
     while True:
-        # We need to access the latest frame. 
-        # In a real multiprocessing app, we'd use a shared Queue or Value.
-        # But here, we can actually serve this directly if we run Flask in a thread share.
-        # Wait, `multiprocessing` creates a separate memory space!
-        # The Flask process CANNOT see the main process `frame` variable directly.
-        # FIX: We must use a Manager or Queue to pass frames.
-        # SIMPLIFICATION for V2.5: 
-        # We will switch Flask to run in a THREAD, not a Process, OR use proper IPC.
-        # Given "Ultra-Lite" goal, threading is LIGHTER than multiprocessing.
-        # Let's Switch to Threading for the server!
-        if frame_buffer is None:
-            time.sleep(0.1)
-            continue
-            
-        try:
-            ret, buffer = cv2.imencode('.jpg', frame_buffer)
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        except Exception:
-            pass
-        time.sleep(0.04) # Limit to ~25 FPS stream
+        cam = cameras.get(cam_id) if cam_id else next(iter(cameras.values()), None)
+        if cam is not None:
+            break
+        time.sleep(0.1) # Camera loop still starting
+    yield from cam.broadcaster.stream(width, quality, fps, frame_width=FRAME_WIDTH)
+
+@app.route('/api/streams')
+def api_streams():
+    """Live viewers per camera: quality tier, fps, frames sent/dropped, bytes/sec and glass-to-browser latency."""
+    return jsonify({cam.id: cam.broadcaster.snapshot() for cam in list(cameras.values())})
 
 @app.route('/api/videos')
 def get_videos():
-    rec_dir = os.path.join(BASE_DIR, "recordings")
-    if not os.path.exists(rec_dir):
-        return jsonify([])
-    
-    files = [f for f in os.listdir(rec_dir) if f.endswith('.mp4')]
-    files.sort(key=lambda x: os.path.getmtime(os.path.join(rec_dir, x)), reverse=True)
-    return jsonify(files)
+    # Finished segments from the segment index ("2026-02-11/Surveillance_....mp4"), newest first
+    return jsonify([seg['file'] for seg in get_segment_index().query()])
+
+@app.route('/api/recordings')
+def api_recordings():
+    """
+    Recording segments overlapping a time range, newest first:
+      ?from=, ?to= ("YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS"), ?camera=<id>
+    Each: {file, url, camera, start, end, frames, codec, bytes}.
+    """
+    args = request.args
+    segments = get_segment_index().query(start=args.get('from') or None, end=args.get('to') or None,
+                                         camera=args.get('camera') or None)
+    return jsonify([dict(seg, url=f"/recordings/{seg['file']}") for seg in segments])
 
 @app.route('/recordings/<path:filename>')
 def serve_video(filename):
-    return send_from_directory(os.path.join(BASE_DIR, 'recordings'), filename)
+    return send_from_directory(RECORDINGS_DIR, filename)
 
 @app.route('/photos/<path:filename>')
 def serve_photo(filename):
     return send_from_directory(PHOTOS_DIR, filename)
 
+@app.route('/api/storage', methods=['GET', 'POST'])
+def api_storage():
+    """Retention policy and the janitor's last report (usage, days pruned, bytes reclaimed). POST runs it now."""
+    janitor = get_storage_janitor()
+    if request.method == 'POST':
+        janitor.run_now()
+    return jsonify(dict(janitor.snapshot(), policy=STORAGE_POLICY, interval=JANITOR_INTERVAL))
+
+PHOTOS_PAGE_LIMIT = 500 # Max photos per /api/photos call
+
+@app.route('/photos/thumbs/<path:filename>')
+def serve_thumbnail(filename):
+    """Small JPEG for the gallery cards (made on first request for photos taken before the index)."""
+    thumb = get_photo_index().thumbnail(filename)
+    if thumb is None:
+        return "Not found", 404
+    response = send_from_directory(os.path.dirname(thumb), os.path.basename(thumb))
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable' # A photo's thumbnail never changes
+    return response
+
 @app.route('/api/photos')
 def get_photos():
-    if not os.path.exists(PHOTOS_DIR):
-        return jsonify([])
-
-    files = [f for f in os.listdir(PHOTOS_DIR) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-    files.sort(key=lambda x: os.path.getmtime(os.path.join(PHOTOS_DIR, x)), reverse=True)
-    
-    photo_data = []
-    for filename in files:
-        parts = filename.split('_')
-        display_name = "Unknown"
-        
-        # Attendance_Name_Date_Time.jpg
-        # Safe heuristic for naming
-        if len(parts) >= 3 and parts[0] == "Attendance":
-             # Re-assemble name parts (vishwajeet_pawar -> vishwajeet pawar)
-             name_parts = parts[1:-2]
-             display_name = " ".join(name_parts)
-        
-        filepath = os.path.join(PHOTOS_DIR, filename)
-        mod_time = os.path.getmtime(filepath)
-        dt = datetime.fromtimestamp(mod_time)
-        timestamp_display = dt.strftime("%Y-%m-%d %I:%M:%S %p")
-
-        photo_data.append({
-            'filename': filename,
-            'name': display_name,
-            'timestamp': timestamp_display,
-            'url': f'/photos/{filename}'
+    """
+    Evidence photos, newest first, from the photo index (no directory scan):
+      ?page=N (from 1), ?limit=N (default 60), ?name= (part of a name), ?from=YYYY-MM-DD, ?to=YYYY-MM-DD
+    Returns {photos, total, page, pages}; each photo has a full-size `url` and a small `thumb`.
+    """
+    args = request.args
+    index = get_photo_index()
+    limit = max(1, min(args.get('limit', 60, type=int), PHOTOS_PAGE_LIMIT))
+    page = max(1, args.get('page', 1, type=int))
+    etag = f"p{index.version}-{hashlib.sha1(request.query_string).hexdigest()[:12]}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        total, photos = index.query(name=args.get('name') or None, date_from=args.get('from') or None,
+                                    date_to=args.get('to') or None, offset=(page - 1) * limit, limit=limit)
+        response = jsonify({
+            'photos': [{'filename': p['path'], 'name': p['name'], 'timestamp': to_display(p['ts']),
+                        'url': f"/photos/{p['path']}", 'thumb': f"/photos/thumbs/{p['path']}"} for p in photos],
+            'total': total,
+            'page': page,
+            'pages': (total + limit - 1) // limit,
         })
-        
-    return jsonify(photo_data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# The persona and instructions never change, so they come first: a conversation's
+# follow-up questions reuse the model's context for them (see chat_cache.py)
+CHAT_SYSTEM_PREFIX = (
+    "You are 'Visor', a helpful and friendly AI assistant. You have access to attendance logs and specific student notes.\n"
+    "Each question comes with the notes and attendance records relevant to it: a daily summary per person and the raw ENTERED/EXITED events.\n\n"
+    "Instructions:\n"
+    "1. **Persona**: You are Visor. Be helpful, friendly, and natural.\n"
+    "2. **Context Aware**: Use the 'Student Notes' to provide personalized context (e.g., if a student dislikes classes).\n"
+    "3. **Attendance Checks**: If the user asks about attendance, use the summary and events to answer factually.\n"
+    "4. **General Chat**: If the user asks about general topics (life, weather, code, etc.), feel free to chat naturally. You are NOT restricted to only talking about attendance.\n"
+    "5. **Honesty**: If you don't know something, just say so.\n\n"
+)
+
+def build_chat_prompt(user_msg):
+    """The per-question part of the prompt (goes after CHAT_SYSTEM_PREFIX). Returns (text, context info)."""
+    # 1. Prepare Context (only what is relevant to this question, within a token budget)
+    context, context_info = get_chat_context(user_msg)
+    
+    # 2. Build Prompt
+    current_time_str = datetime.now().strftime("%Y-%m-%d %I:%M:%S %p")
+    
+    turn = (
+        f"Current System Time: {current_time_str}\n"
+        "--- START CONTEXT ---\n"
+        f"{context}\n"
+        "--- END CONTEXT ---\n\n"
+        f"User Question: {user_msg}\n"
+    )
+    return turn, context_info
+
+CHAT_OPTIONS = {
+    "temperature": 0.4, # Lower temperature for more factual answers
+    "num_ctx": CHAT_NUM_CTX,
+    "num_predict": CHAT_REPLY_TOKENS
+}
+
+chat_reply_cache = ResponseCache(max_entries=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL)
+chat_conversations = ConversationCache(max_tokens=CHAT_CONVERSATION_TOKENS)
+
+def chat_data_version():
+    """Changes whenever an answer could: new event, notes saved, lobby change, new day."""
+    try:
+        notes_mtime = os.path.getmtime(NOTES_FILE)
+    except OSError:
+        notes_mtime = None
+    return (get_event_store().last_id(), notes_mtime, tuple(lobby_names()), datetime.now().date().isoformat())
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
+    """
+    JSON {reply, source, ...} by default. With ?stream=1 (or Accept:
+    text/event-stream) the reply is streamed as Server-Sent Events: 'queued'
+    {position} while waiting for the model, then 'token' {text} as they are
+    generated, then 'done' (or 'error' {reply}). `conversation` (any id the
+    page picks) lets follow-up questions continue from the previous answer.
+    """
     data = request.json
     user_msg = data.get('message', '')
+    conversation = data.get('conversation')
+    replies = chat_replies(user_msg, conversation)
+    if request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', ''):
+        return sse_response(replies)
     
-    # 1. Prepare Context
-    logs = get_logs_context()
-    notes = get_notes_context()
+    parts, result = [], {}
+    for kind, msg in replies:
+        if kind == 'token':
+            parts.append(msg['text'])
+        elif kind == 'done':
+            result = msg
+        elif kind == 'error':
+            return jsonify(msg), (503 if msg.get('busy') else 200)
+    result['reply'] = "".join(parts) or 'Error parsing AI response.'
+    return jsonify(result)
+
+def chat_replies(user_msg, conversation=None):
+    """One answer as (kind, data): from the query engine, the reply cache, or the model."""
+    t0 = time.perf_counter()
+    # 0. Questions the log answers exactly ("was X here today?", "who came yesterday?") skip the LLM
+    try:
+        answered = get_attendance_query().answer(user_msg)
+    except Exception as e:
+        print(f"⚠️ Attendance query failed, asking the AI instead: {e}")
+        answered = None
+    if answered is not None:
+        intent, reply = answered
+        yield 'token', {'text': reply}
+        yield 'done', {'source': 'query', 'intent': intent}
+        return
     
-    # 2. Build Prompt
-    current_time_str = datetime.now().strftime("%Y-%m-%d %I:%M:%S %p")
+    # Same opening question, same data: the answer from last time (follow-ups depend on the conversation)
+    key = None
+    if not chat_conversations.has_context(conversation, CHAT_SYSTEM_PREFIX):
+        key = chat_reply_cache.key(user_msg, chat_data_version())
+        cached = chat_reply_cache.get(key)
+        if cached is not None:
+            reply, cached_context = cached
+            chat_conversations.put(conversation, CHAT_SYSTEM_PREFIX, cached_context) # Follow-ups continue from it
+            yield 'token', {'text': reply}
+            yield 'done', {'source': 'cache'}
+            return
     
-    system_prompt = (
-        f"Current System Time: {current_time_str}\\n"
-        "You are 'Visor', a helpful and friendly AI assistant. You have access to attendance logs and specific student notes.\\n"
-        "CSV Structure: Timestamp, Event (ENTERED/EXITED), Name, PhotoPath\\n"
-        "Data is standard CSV format with headers.\\n\\n"
-        "--- START STUDENT NOTES ---\\n"
-        f"{notes}\\n"
-        "--- END STUDENT NOTES ---\\n\\n"
-        "--- START LOGS ---\\n"
-        f"{logs}\\n"
-        "--- END LOGS ---\\n\\n"
-        f"User Question: {user_msg}\\n\\n"
-        "Instructions:\\n"
-        "1. **Persona**: You are Visor. Be helpful, friendly, and natural.\\n"
-        "2. **Context Aware**: Use the 'Student Notes' to provide personalized context (e.g., if a student dislikes classes).\\n"
-        "3. **Attendance Checks**: If the user asks about attendance, use the CSV logs to answer factually.\\n"
-        "4. **General Chat**: If the user asks about general topics (life, weather, code, etc.), feel free to chat naturally. You are NOT restricted to only talking about attendance.\\n"
-        "5. **Honesty**: If you don't know something, just say so."
-
-
-    )
-    
-    # 3. Call Ollama
-    payload = {
-        "model": OLLAMA_MODEL,
-        "prompt": system_prompt,
-        "stream": False,
-        "options": {
-            "temperature": 0.4, # Lower temperature for more factual answers
-            "num_mid_ctx": 2048
-        }
-    }
+    turn, context_info = build_chat_prompt(user_msg)
+    model_context = chat_conversations.get(conversation, CHAT_SYSTEM_PREFIX, estimate_tokens(turn))
+    prompt = turn if model_context else CHAT_SYSTEM_PREFIX + turn
     
+    # 3. Call Ollama (pooled connection, one generation at a time, the rest queue)
+    parts = []
     try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=90)
-        if response.status_code == 200:
-            ai_reply = response.json().get('response', 'Error parsing AI response.')
-            return jsonify({'reply': ai_reply})
-        else:
-            return jsonify({'reply': f"Ollama Error: {response.status_code}"})
+        for kind, data in get_ollama_client().generate_stream(prompt, CHAT_OPTIONS, model_context):
+            if kind == 'token':
+                parts.append(data['text'])
+            elif kind == 'done':
+                continued = model_context is not None
+                chat_conversations.put(conversation, CHAT_SYSTEM_PREFIX, data['context'])
+                chat_conversations.record(continued, data['first_token_ms'])
+                if parts and key is not None and not continued:
+                    chat_reply_cache.put(key, "".join(parts), (time.perf_counter() - t0) * 1000, data['context'])
+                data = {'source': 'ai', 'context': context_info, 'continued': continued,
+                        'first_token_ms': data['first_token_ms'], 'total_ms': data['total_ms'],
+                        'queued_ms': data['queued_ms']}
+            yield kind, data
+    except QueueFull:
+        yield 'error', {'reply': "Visor is busy with other questions, try again in a moment.", 'busy': True}
     except requests.exceptions.ConnectionError:
-        return jsonify({'reply': "Error: Ollama is offline."})
+        chat_conversations.forget(conversation) # The model may have restarted; its old context is gone
+        yield 'error', {'reply': "Error: Ollama is offline."}
     except Exception as e:
-        return jsonify({'reply': f"Server Error: {str(e)}"})
+        yield 'error', {'reply': f"Server Error: {str(e)}"}
+
+def sse_response(messages):
+    """(kind, data) pairs as a text/event-stream response."""
+    def generate():
+        for msg_id, (kind, data) in enumerate(messages, 1):
+            yield format_sse(msg_id, kind, data)
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 
@@ -887,213 +1379,440 @@ def run_flask_app():
 # ==========================================
 # FACE RECOGNITION SYSTEM
 # ==========================================
-def log_event(event, name, frame=None):
+pipeline_stats = StageTimer()
+event_store = None # SQLite event log (see event_log.py)
+event_writer = None # Background photo + event writer
+event_writer_lock = threading.Lock()
+photo_index = None # attendance_photos/ metadata + thumbnails (see photo_index.py)
+storage_janitor = None # Retention for photos + recordings (see storage_janitor.py)
+segment_index = None # Finished recording segments, searchable by time (see recorder.py)
+
+def get_event_store():
+    global event_store
+    with event_writer_lock:
+        if event_store is None:
+            event_store = EventStore(EVENT_DB)
+            # First start on this version: bring the old CSV history along (the CSV is left as-is)
+            if event_store.count() == 0 and os.path.exists(LOG_FILE):
+                imported, skipped = event_store.import_csv(LOG_FILE)
+                print(f"✅ Imported {imported} events from '{os.path.basename(LOG_FILE)}' into '{os.path.basename(EVENT_DB)}'"
+                      + (f" ({skipped} unreadable rows skipped)." if skipped else "."))
+        return event_store
+
+def get_photo_index():
+    global photo_index
+    with event_writer_lock:
+        if photo_index is None:
+            photo_index = PhotoIndex(PHOTOS_DIR)
+            added, removed = photo_index.load()
+            if added or removed:
+                print(f"✅ Photo index: {len(photo_index)} photos ({added} new, {removed} removed)")
+        return photo_index
+
+def get_segment_index():
+    global segment_index
+    with event_writer_lock:
+        if segment_index is None:
+            segment_index = SegmentIndex(RECORDINGS_DIR)
+            added, removed = segment_index.load()
+            if added or removed:
+                print(f"✅ Recording index: {len(segment_index.segments)} segments ({added} new, {removed} removed)")
+        return segment_index
+
+def on_storage_pruned(store, day, removed):
+    """Janitor callback: keep the photo index and the event log's photo links in step with the disk."""
+    if store == "photos":
+        get_photo_index().remove(removed)
+        store = get_event_store()
+        cleared = store.clear_photos(day)
+        if cleared:
+            live_bus.publish('logs_rewritten', {'version': store.version(), 'day': day})
+        print(f"🧹 Pruned {len(removed)} photos from {day} ({cleared} log entries unlinked)")
+    else:
+        get_segment_index().remove(removed)
+        print(f"🧹 Pruned {len(removed)} {store} from {day}")
+
+def get_storage_janitor():
+    global storage_janitor
+    with event_writer_lock:
+        if storage_janitor is None:
+            stores = {
+                "photos": dict(STORAGE_POLICY["photos"], root=PHOTOS_DIR, extensions=('.png', '.jpg', '.jpeg')),
+                "recordings": dict(STORAGE_POLICY["recordings"], root=RECORDINGS_DIR, extensions=('.mp4',)),
+            }
+            storage_janitor = StorageJanitor(stores, ARCHIVE_DIR, interval=JANITOR_INTERVAL, on_prune=on_storage_pruned)
+            storage_janitor.start()
+        return storage_janitor
+
+def get_event_writer():
+    global event_writer
+    store = get_event_store()
+    photos = get_photo_index()
+    with event_writer_lock:
+        if event_writer is None:
+            event_writer = EventWriter(store, maxsize=EVENT_QUEUE_SIZE,
+                                       fsync_interval=EVENT_FSYNC_INTERVAL, timer=pipeline_stats,
+                                       on_written=publish_logged, on_photo=photos.add)
+            event_writer.start()
+        return event_writer
+
+def log_event(event, name, frame=None, camera=None):
+    """Queues the event for the background writer; never blocks on disk."""
     now_obj = datetime.now()
     now_str = now_obj.strftime("%Y-%m-%d %I:%M:%S %p")
     photo_filename = ""
+    photo = None
     
     # If this is an ENTRY event, save a photo
     if event == "ENTERED" and frame is not None:
         # Create a safe filename
         safe_name = "".join([c for c in name if c.isalnum() or c in (' ', '_')]).strip()
         timestamp_for_file = now_obj.strftime("%Y%m%d_%H%M%S")
-        photo_filename = f"{PHOTOS_DIR}/Attendance_{safe_name}_{timestamp_for_file}.jpg"
-        
-        # Draw timestamp on the photo itself for "hardcopy" proof
-        evidence_frame = frame.copy()
-        # Text at Top-Right to avoid overlap
-        h, w = evidence_frame.shape[:2]
-        cv2.putText(evidence_frame, f"{now_str} - {name}", (w - 340, 20), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-        
-        cv2.imwrite(photo_filename, evidence_frame)
-        print(f"SNAPSHOT SAVED: {photo_filename}")
-
-    print(f"LOG: {event} - {name} at {now_str}")
-    
-    file_exists = os.path.exists(LOG_FILE)
-    with open(LOG_FILE, "a", newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["Timestamp", "Event", "Name", "PhotoPath"])
-        writer.writerow([now_str, event, name, photo_filename])
-
-def run_face_recognition_loop():
-    global frame_buffer
-    global manual_recording_active
-    global show_local_preview
-    global current_mode # Needed for API to update it
-    global EXIT_THRESHOLD
-
-    # Load Models
-    face_cascade_path = "models/haarcascade_frontalface_default.xml"
-    # face_cascade = cv2.CascadeClassifier(face_cascade_path)
+        photo_filename = f"{PHOTOS_DIR}/{day_folder(now_obj)}/Attendance_{safe_name}_{timestamp_for_file}.jpg"
+        captions = [f"{now_str} - {name}"] + ([f"CAM: {camera}"] if camera else [])
+        # Copy now (the caller keeps using its frame); caption + JPEG encode happen on the writer thread
+        photo = (photo_filename, frame.copy(), captions)
 
-    # 1. Setup Directories
-    if not os.path.exists(PHOTOS_DIR):
-        os.makedirs(PHOTOS_DIR)
+    print(f"LOG: {event} - {name} at {now_str}" + (f" [{camera}]" if camera else ""))
     
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "w", newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Timestamp", "Event", "Name", "PhotoPath"])
-            
-    if not os.path.exists(NOTES_FILE):
-        with open(NOTES_FILE, "w", encoding='utf-8') as f:
-            f.write("# Student Notes\n# Add notes about students here.\n")
+    row = (now_obj.strftime(STORE_FORMAT), event, name, photo_filename, camera)
+    if not get_event_writer().submit(row, photo):
+        print(f"⚠️ Event queue full, dropped: {event} - {name}")
 
-    # 2. Setup Video
-    video_capture = cv2.VideoCapture(0)
-    if not video_capture.isOpened():
-        print("ERROR: Could not access the camera.")
-        return
+# ==========================================
+# LIVE EVENTS (pushed to the dashboard over /api/events)
+# ==========================================
+live_bus = EventBus()
+health_monitor = None
+health_lock = threading.Lock()
+
+def publish_logged(written):
+    """EventWriter callback: each committed row goes out in the /api/logs shape."""
+    for row_id, (ts, event, name, photo_path, camera) in written:
+        live_bus.publish('log', {'id': row_id, 'Timestamp': to_display(ts), 'Event': event,
+                                 'Name': name, 'PhotoPath': photo_path})
+
+def publish_status():
+    health = health_monitor.snapshot(history=False) if health_monitor else {}
+    live_bus.publish('status', {'recording': manual_recording_active, 'mode': current_mode,
+                                'ollama_online': bool(health.get('ai', {}).get('ok')),
+                                'health': {name: h['ok'] for name, h in health.items()}})
+
+ollama_client = None
+
+def get_ollama_client():
+    """Shared Ollama client: keep-alive connection pool + generation queue."""
+    global ollama_client
+    with health_lock:
+        if ollama_client is None:
+            ollama_client = OllamaClient(OLLAMA_URL, OLLAMA_MODEL, max_concurrent=OLLAMA_MAX_CONCURRENT,
+                                         max_queue=OLLAMA_MAX_QUEUE)
+        return ollama_client
 
-    # Set resolution
-    frame_width = 640
-    frame_height = 480
-    video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, frame_width)
-    video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_height)
-
-    # ==========================================
-    # INITIALIZATION
-    # ==========================================
-    import pickle
-    import threading
-    import pyttsx3
-    
-    # --- VOICE ENGINE ---
-    def speak_text(text):
-        try:
-            engine = pyttsx3.init()
-            engine.setProperty('rate', 150) # Speed
-            engine.say(text)
-            engine.runAndWait()
-        except:
-            pass
-
-    def speak(text):
-        # Run in thread to not block video
-        threading.Thread(target=speak_text, args=(text,), daemon=True).start()
-
-    # --- IMAGE ENHANCEMENT (Night Vision) ---
-    def adjust_gamma(image, gamma=1.0):
-        # Build a lookup table mapping the pixel values [0, 255] to their adjusted gamma values
-        invGamma = 1.0 / gamma
-        table = np.array([((i / 255.0) ** invGamma) * 255
-            for i in np.arange(0, 256)]).astype("uint8")
-        # Apply gamma correction using the lookup table
-        return cv2.LUT(image, table)
-
-    # --- MODELS ---
-    model_dir = "models"
-    detector_path = os.path.join(model_dir, "face_detection_yunet_2023mar.onnx")
-    recognizer_path = os.path.join(model_dir, "face_recognition_sface_2021dec.onnx")
-    encodings_path = "face_encodings_sface.pkl"
-    # Eye Cascade for Blink
-    eye_cascade_path = os.path.join(model_dir, 'haarcascade_eye_tree_eyeglasses.xml')
-    eye_detector = cv2.CascadeClassifier(eye_cascade_path)
-    
-    if not os.path.exists(detector_path) or not os.path.exists(recognizer_path):
-        print("CRITICAL ERROR: ONNX Models not found. Please run 'download_models.py'.")
-        return
+# ==========================================
+# HEALTH PROBES (run by health_monitor.HealthMonitor, see HEALTH_INTERVALS)
+# ==========================================
+# Each returns (ok, detail). /api/status serves the last results.
+
+def probe_ai():
+    client = get_ollama_client()
+    return client.ping(timeout=2.0), {'url': client.base_url, 'generations': client.snapshot()}
+
+def probe_cameras():
+    now = time.time()
+    detail = {}
+    for cam in list(cameras.values()):
+        grabber = cam.grabber
+        age = round(now - grabber.frame_time, 1) if grabber and grabber.frame_time else None
+        detail[cam.id] = {'label': cam.label, 'frame_age_s': age,
+                          'ok': bool(grabber and grabber.is_alive() and not grabber.failed
+                                     and age is not None and age < CAMERA_STALE_SECONDS)}
+    if not detail:
+        return False, {'error': 'no camera open'}
+    return all(c['ok'] for c in detail.values()), detail
+
+def probe_disk():
+    usage = shutil.disk_usage(BASE_DIR)
+    free_gb = usage.free / 1e9
+    return free_gb >= DISK_MIN_FREE_GB, {'free_gb': round(free_gb, 2), 'used_pct': round(100 * usage.used / usage.total, 1)}
+
+recorder_progress = {} # camera id -> (frames written, recording on) at the last probe
+
+def probe_recorders():
+    detail, ok = {}, True
+    for cam in list(cameras.values()):
+        rec = cam.recorder
+        if rec is None:
+            continue
+        snap = rec.snapshot()
+        # While recording (since the last probe too), a live recorder keeps writing frames between probes
+        stalled = manual_recording_active and recorder_progress.get(cam.id) == (snap['frames_written'], True)
+        recorder_progress[cam.id] = (snap['frames_written'], manual_recording_active)
+        cam_ok = rec.is_alive() and not stalled
+        detail[cam.id] = {'ok': cam_ok, 'alive': rec.is_alive(), 'stalled': stalled, 'recording': snap['recording'],
+                          'file': snap['file'], 'dropped': snap['dropped']}
+        ok = ok and cam_ok
+    return ok, detail
+
+def on_health_change(name, ok):
+    print(f"{'✅' if ok else '⚠️'} Health: {name} is {'up' if ok else 'DOWN'}")
+    publish_status()
+
+def get_health_monitor():
+    """Background probes of the AI model, cameras, disk and recorders; started on first use."""
+    global health_monitor
+    with health_lock:
+        if health_monitor is None:
+            health_monitor = HealthMonitor(on_change=on_health_change, max_backoff=HEALTH_MAX_BACKOFF)
+            for name, probe in (('ai', probe_ai), ('cameras', probe_cameras), ('disk', probe_disk),
+                                ('recorder', probe_recorders)):
+                health_monitor.add(name, probe, HEALTH_INTERVALS[name])
+            health_monitor.start()
+        return health_monitor
 
-    # 1. Initialize Detector (YuNet) - Ultra Lite 320x240
-    # LOWERED THRESHOLD from 0.9 to 0.6 for better dark detection
-    det_w, det_h = 320, 240
-    detector = cv2.FaceDetectorYN.create(
-        detector_path, "", (det_w, det_h), 0.6, 0.3, 5000
-    )
-    
-    # 2. Initialize Recognizer (SFace)
-    recognizer = cv2.FaceRecognizerSF.create(recognizer_path, "")
-    
-    # 3. Load Known Faces
-    known_faces = {}
-    if os.path.exists(encodings_path):
-        with open(encodings_path, 'rb') as f:
-            known_faces = pickle.load(f)
-        print(f"✅ Loaded {len(known_faces)} faces from fast cache.")
+# ==========================================
+# FACE GALLERY (Hot Reload)
+# ==========================================
+active_gallery = None # Swapped atomically; the camera loop reads it once per frame
+gallery_reload_lock = threading.Lock()
+gallery_status = {'faces': 0, 'photos': 0, 'source': None, 'loaded_at': None,
+                  'load_ms': 0, 'reloading': False, 'error': None}
+
+def load_gallery():
+    """Builds a ready-to-match FaceGallery from the face cache on disk."""
+    if os.path.exists(ENCODINGS_FILE):
+        # On Windows a memory-mapped file cannot be replaced, so read it into RAM there
+        # to let reencode_faces.py overwrite the cache while the app is running.
+        gallery = FaceGallery.from_store(ENCODINGS_FILE, scoring=MATCH_SCORING, mmap=(os.name != 'nt'))
+        source = ENCODINGS_FILE
+    elif os.path.exists(LEGACY_ENCODINGS_FILE):
+        # Old pickle cache: still readable, but slow and unsafe for big rosters
+        import pickle
+        with open(LEGACY_ENCODINGS_FILE, 'rb') as f:
+            gallery = FaceGallery.from_dict(pickle.load(f), scoring=MATCH_SCORING)
+        print("⚠️ Using legacy pickle cache. Run 'reencode_faces.py --convert-pkl' once.")
+        source = LEGACY_ENCODINGS_FILE
     else:
         print("⚠️ No face cache found. Please run 'reencode_faces.py'.")
+        return FaceGallery([], []), None
+
+    if GALLERY_INDEX == "ivf" and len(gallery) > 0:
+        gallery.build_ivf(nprobe=IVF_NPROBE)
+    return gallery, source
+
+def reload_gallery():
+    """Loads the face cache and swaps it in. Returns False if a reload is already running."""
+    global active_gallery
+    if not gallery_reload_lock.acquire(blocking=False):
+        return False
+    gallery_status['reloading'] = True
+    try:
+        t0 = time.time()
+        gallery, source = load_gallery()
+        active_gallery = gallery # Single reference assignment: atomic for the camera thread
+        gallery_status.update({
+            'faces': len(gallery), 'photos': gallery.template_total, 'source': source,
+            'loaded_at': datetime.now().strftime("%Y-%m-%d %I:%M:%S %p"),
+            'load_ms': round((time.time() - t0) * 1000, 1), 'error': None,
+        })
+        print(f"✅ Loaded {len(gallery)} faces ({gallery.template_total} photos) in {gallery_status['load_ms']:.0f} ms.")
+    except Exception as e:
+        # Keep matching with the previous gallery rather than dropping everyone
+        gallery_status['error'] = str(e)
+        print(f"⚠️ Gallery reload failed, keeping the previous one: {e}")
+        if active_gallery is None:
+            active_gallery = FaceGallery([], [])
+    finally:
+        gallery_status['reloading'] = False
+        gallery_reload_lock.release()
+    return True
+
+def reload_gallery_async():
+    if gallery_status['reloading']:
+        return False
+    threading.Thread(target=reload_gallery, daemon=True).start()
+    return True
+
+def start_gallery_watcher():
+    """Polls the face cache's mtime/size and reloads in the background when it changes."""
+    if GALLERY_WATCH_INTERVAL <= 0:
+        return
 
-    # --- STATE MANGEMENT ---
-    present_people = {} 
-    
-    # MODES: "SURVEILLANCE" (Silent, No Blink) vs "ATTENDANCE" (Voice, Blink Required)
-    current_mode = "SURVEILLANCE" 
-    
-    # --- RECORDING SETUP ---
-    RECORDINGS_DIR = os.path.join(BASE_DIR, "recordings")
-    if not os.path.exists(RECORDINGS_DIR):
-        os.makedirs(RECORDINGS_DIR)
-        
-    video_writer = None
-    
-    def start_recording(width, height):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(RECORDINGS_DIR, f"Surveillance_{timestamp}.mp4")
-        
-        # Try 1: H.264 (avc1) - BEST FOR WEB
-        fourcc = cv2.VideoWriter_fourcc(*'avc1') 
-        writer = cv2.VideoWriter(filename, fourcc, 20.0, (width, height))
-        
-        if not writer.isOpened():
-            print("⚠️ H.264 failed. Trying MP4V (Windows Default)...")
-            writer.release()
-            # Try 2: MPEG-4 (mp4v) - Robust fallback (but may not play in browser)
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            writer = cv2.VideoWriter(filename, fourcc, 20.0, (width, height))
-            
-            if not writer.isOpened():
-                 print("⚠️ MP4V failed. Trying VP9 (vp09)...")
-                 writer.release()
-                 # Try 3: VP9
-                 fourcc = cv2.VideoWriter_fourcc(*'vp09') # or vp80
-                 writer = cv2.VideoWriter(filename, fourcc, 20.0, (width, height))
-
-        print(f"🔴 RECORDING STARTED: {filename}")
-        return writer
-
-    def stop_recording(writer):
-        if writer is not None:
-            writer.release()
-            print("⏹️ RECORDING STOPPED.")
+    def signature():
+        for path in (ENCODINGS_FILE, LEGACY_ENCODINGS_FILE):
+            if os.path.exists(path):
+                st = os.stat(path)
+                return (path, st.st_mtime, st.st_size)
         return None
 
-    # Auto-start recording REMOVED (Manual Only)
+    def watch():
+        last = signature()
+        while True:
+            time.sleep(GALLERY_WATCH_INTERVAL)
+            try:
+                current = signature()
+            except OSError:
+                continue # File is being replaced right now; look again next tick
+            if current != last:
+                last = current
+                print("🔄 Face cache changed on disk. Reloading gallery...")
+                reload_gallery()
 
-    # ATTENDANCE STATE MACHINE
-    # States: "SEARCHING", "DETECTED", "WAITING_BLINK", "RECOGNIZING", "COOLDOWN"
-    attn_state = "SEARCHING"
-    state_timer = 0
-    blink_counter = 0 # Tracks closed eyes
-    target_face_box = None # storing face to track for blink
-    
-    print("Starting Visor (Dual Mode with Night Vision)...")
-    print(" [M] Toggle Mode (Surveillance <-> Attendance)")
-    print(" [Q] Quit")
-    print(" SERVER: http://localhost:5000 (Running)")
+    threading.Thread(target=watch, daemon=True).start()
 
-    server_process = None
-    COSINE_THRESHOLD = 0.45 
-    frame_count = 0
-    detected_results = [] 
+# ==========================================
+# CAMERAS (Capture + Render, one thread each)
+# ==========================================
+MODEL_DIR = "models"
+DETECTOR_PATH = os.path.join(MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+RECOGNIZER_PATH = os.path.join(MODEL_DIR, "face_recognition_sface_2021dec.onnx")
+EYE_CASCADE_PATH = os.path.join(MODEL_DIR, 'haarcascade_eye_tree_eyeglasses.xml') # Eye Cascade for Blink
+DET_W, DET_H = 320, 240 # YuNet input - Ultra Lite 320x240
+FRAME_WIDTH, FRAME_HEIGHT = 640, 480
+SEGMENT_DURATION = 600 # Recording chunk length (seconds; see recorder.py)
+RECORDINGS_DIR = os.path.join(BASE_DIR, "recordings")
+
+cameras = {} # camera id -> CameraState (insertion order = CAMERAS order)
+inference_scheduler = InferenceScheduler()
+detection_scheduler = DetectionScheduler(max_fps=max(DETECTION_MAX_FPS.values()), idle_fps=DETECTION_IDLE_FPS,
+                                         cpu_budget=DETECTION_CPU_BUDGET)
+
+# --- VOICE ENGINE ---
+def speak_text(text):
+    try:
+        import pyttsx3
+        engine = pyttsx3.init()
+        engine.setProperty('rate', 150) # Speed
+        engine.say(text)
+        engine.runAndWait()
+    except:
+        pass
+
+def speak(text):
+    # Run in thread to not block video
+    threading.Thread(target=speak_text, args=(text,), daemon=True).start()
+
+# --- IMAGE ENHANCEMENT (Night Vision) ---
+def adjust_gamma(image, gamma=1.0):
+    # Build a lookup table mapping the pixel values [0, 255] to their adjusted gamma values
+    invGamma = 1.0 / gamma
+    table = np.array([((i / 255.0) ** invGamma) * 255
+        for i in np.arange(0, 256)]).astype("uint8")
+    # Apply gamma correction using the lookup table
+    return cv2.LUT(image, table)
+
+
+class CameraState:
+    """Everything that belongs to one camera: capture, lobby, attendance state, outputs."""
+
+    def __init__(self, config):
+        self.id = str(config['id'])
+        self.label = config.get('label', self.id)
+        self.source = config.get('source', 0)
+        self.capture = None
+        self.grabber = None
+
+        # Lobby (who is in front of THIS camera) - heartbeats written by inference
+        self.present_people = {}
+        self.lock = threading.Lock()
+
+        # Latest inference output, drawn by the render thread
+        self.detected_results = []
+        self.debug_boxes = []
+
+        # ATTENDANCE STATE MACHINE (only touched by the one worker serving this camera)
+        # States: "SEARCHING", "DETECTED", "WAITING_BLINK", "RECOGNIZING", "COOLDOWN"
+        self.attn_state = "SEARCHING"
+        self.state_timer = 0
+        self.blink_counter = 0 # Tracks closed eyes
+        self.target_face_data = None # storing face to track for blink
+        self.box = (0, 0, 0, 0)
+        self.last_mode = None
+
+        # Surveillance: track id -> identity, so known faces skip SFace
+        self.tracker = FaceTracker()
+        self.motion_gate = MotionGate() # Scene activity for the detection scheduler
+
+        # Outputs
+        self.hub = FrameHub() # Latest frame for this camera's MJPEG feed (copied only while watched)
+        self.broadcaster = MjpegBroadcaster(self.hub, pipeline_stats, name=f"{self.id}/stream")
+        self.display = None # Latest fully-drawn frame for the preview window
+        self.recorder = None # Segment writer thread (see recorder.py), started in open()
+        self.frame_count = 0
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            print(f"ERROR: Could not access camera '{self.label}' ({self.source}).")
+            return False
+        # Set resolution
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+        self.grabber = FrameGrabber(self.capture, pipeline_stats, name=f"{self.id}/grab")
+        # Keep the old file names for a single camera; tag them when there are several
+        prefix = "Surveillance" if len(CAMERAS) == 1 else f"Surveillance_{self.id}"
+        self.recorder = Recorder(RECORDINGS_DIR, prefix, camera=self.id, index=get_segment_index(),
+                                 timer=pipeline_stats, segment_duration=SEGMENT_DURATION)
+        self.recorder.start()
+        return True
+
+    def lobby(self):
+        with self.lock:
+            return list(self.present_people.keys())
+
+    def mark_present(self, name, ts):
+        """Heartbeat for `name`; returns True if they just arrived."""
+        with self.lock:
+            first_time = name not in self.present_people
+            self.present_people[name] = ts
+            people = list(self.present_people.keys())
+        if first_time:
+            self.publish_lobby(people)
+        return first_time
+
+    def expire(self, now, threshold):
+        """Drops people not seen for `threshold` seconds; returns (gone, still present)."""
+        with self.lock:
+            gone = [p_name for p_name, last_seen in self.present_people.items() if (now - last_seen) > threshold]
+            for p_name in gone:
+                del self.present_people[p_name]
+            people = list(self.present_people.keys())
+        if gone:
+            self.publish_lobby(people)
+        return gone, people
+
+    def publish_lobby(self, people):
+        live_bus.publish('lobby', {'camera': self.id, 'label': self.label, 'people': people}, key=f"lobby:{self.id}")
+
+    def log(self, event, name, frame=None):
+        # Tag the event with the camera only when there is more than one to tell apart
+        log_event(event, name, frame, camera=self.label if len(cameras) > 1 else None)
+
+def scale_box(face):
+    box_small = list(map(int, face[:4]))
+    scale_x = FRAME_WIDTH / DET_W
+    scale_y = FRAME_HEIGHT / DET_H
+    return [int(box_small[0]*scale_x), int(box_small[1]*scale_y), int(box_small[2]*scale_x), int(box_small[3]*scale_y)]
+
+def camera_render_loop(cam):
+    """Per-camera thread: night vision, hand-off to inference, exit tracking, overlays, recording."""
     night_vision_active = False
-    
-    # Recording Segment Tracking
-    recording_start_time = time.time()
-    SEGMENT_DURATION = 600 
+    last_seq = 0
 
     while True:
-        ret, frame = video_capture.read()
-        if not ret:
-            break
-        
+        last_seq, frame, capture_time = cam.grabber.read(last_seq, timeout=1.0)
+        if frame is None:
+            if cam.grabber.failed or not cam.grabber.running:
+                break
+            continue
+        t_render = time.perf_counter()
+        mode = current_mode
         current_time_loop = time.time()
-        
+        frame_height, frame_width = frame.shape[:2]
+
         # --- 0. ADAPTIVE NIGHT VISION (EARLY PASS) ---
         # We check every frame (fast enough on resize) or keep state
-        if frame_count % 6 == 0:
+        if cam.frame_count % 6 == 0:
             small_check = cv2.resize(frame, (320, 240))
             avg_brightness = np.mean(small_check)
             if avg_brightness < 90: # Slightly lower threshold to avoid flickering
@@ -1104,17 +1823,23 @@ def run_face_recognition_loop():
         if night_vision_active:
             # Apply to MAIN frame so everything (Recording, Web, Display) sees it
             frame = adjust_gamma(frame, 1.7) # Stronger Gamma
-        
+
+        # --- HAND OFF TO INFERENCE ---
+        # Detection cadence adapts: full rate while something moves or a face is being
+        # followed (a track seen within TRACK_MAX_AGE), backing off to DETECTION_IDLE_FPS on a
+        # static scene (see DetectionScheduler).
+        # If the pool has not picked up this camera's previous frame yet, it is replaced.
+        motion = cam.motion_gate.update(frame)
+        active = (motion > MOTION_THRESHOLD or bool(cam.detected_results) or cam.tracker.live(current_time_loop) > 0
+                  or (mode == "ATTENDANCE" and cam.attn_state != "SEARCHING"))
+        if detection_scheduler.should_detect(cam.id, current_time_loop, active, DETECTION_MAX_FPS.get(mode)):
+            inference_scheduler.submit(cam.id, (frame.copy(), mode))
+
         # --- LOBBY LOGIC (EXIT TRACKING) ---
-        # If person not seen for 3 seconds -> Exited
-        to_remove = []
-        for p_name, last_seen in present_people.items():
-            if (current_time_loop - last_seen) > 3.0:
-                log_event("EXITED", p_name, frame)
-                to_remove.append(p_name)
-        
+        # If person not seen for EXIT_THRESHOLD seconds -> Exited
+        to_remove, lobby_names = cam.expire(current_time_loop, EXIT_THRESHOLD)
         for p_name in to_remove:
-            del present_people[p_name]
+            cam.log("EXITED", p_name, frame)
 
         # --- TIMESTAMP OVERLAY ---
         # Add Ticking Date/Time (Minimal Space)
@@ -1122,241 +1847,41 @@ def run_face_recognition_loop():
         # Bottom-left corner, small font
         cv2.putText(frame, ts_str, (10, frame_height - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
 
-        # Share frame with Flask Thread (now includes Night Vision)
-        frame_buffer = frame.copy()
-            
+        # Share frame with Flask Thread (now includes Night Vision); wakes any MJPEG viewers
+        cam.hub.publish(frame, capture_time)
+
         # Draw Mode UI
-        mode_color = (0, 255, 255) if current_mode == "SURVEILLANCE" else (0, 165, 255) # Yellow vs Orange
-        cv2.putText(frame, f"MODE: {current_mode}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, mode_color, 2)
-        
+        mode_color = (0, 255, 255) if mode == "SURVEILLANCE" else (0, 165, 255) # Yellow vs Orange
+        cv2.putText(frame, f"MODE: {mode}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, mode_color, 2)
+
         # Draw Recording Indicator
-        if video_writer is not None:
+        if cam.recorder.active:
             # Flashing Red Dot
             if int(current_time_loop * 2) % 2 == 0:
                 cv2.circle(frame, (frame_width - 30, 30), 10, (0, 0, 255), -1)
             cv2.putText(frame, "REC", (frame_width - 65, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-            
+
         # Draw Night Vision Indicator (Always visible if active)
         if night_vision_active:
             cv2.putText(frame, "NIGHT VISION", (frame_width - 130, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                
-            # --- CHUNKING LOGIC ---
-            # If recording for > 10 minutes, restart to save file
-            if (current_time_loop - recording_start_time) > SEGMENT_DURATION:
-                print("🔄 Segement Limit Reached. Starting new chunk...")
-                video_writer = stop_recording(video_writer)
-                video_writer = start_recording(frame_width, frame_height)
-                recording_start_time = current_time_loop
-        else:
-             # If NOT recording, should we start?
-             if manual_recording_active and video_writer is None:
-                 video_writer = start_recording(frame_width, frame_height)
-                 recording_start_time = current_time_loop
-        
-        # If recording is active but Manual Flag is FALSE -> Stop
-        if not manual_recording_active and video_writer is not None:
-             video_writer = stop_recording(video_writer)
-             video_writer = None
-
-        # ---------------------------------------------------------
-        # MODE 1: SURVEILLANCE (PASSIVE LOGGING)
-        # ---------------------------------------------------------
-        if current_mode == "SURVEILLANCE":
-            # Run Ultra-Lite Detection (Every 6th frame)
-            if frame_count % 6 == 0:
-                small_frame = cv2.resize(frame, (det_w, det_h))
-                
-                # (Night Vision already applied to 'frame', so small_frame inherits it)
-                
-                faces_check = detector.detect(small_frame)
-                status = faces_check[0] if faces_check is not None else 0
-                faces_data = faces_check[1] if (faces_check is not None and len(faces_check) > 1) else None
-                
-                detected_results = []
-                if status and faces_data is not None:
-                    for face in faces_data:
-                        box_small = list(map(int, face[:4]))
-                        
-                        # Use the BRIGHT frame (which is just 'frame' now) for alignment
-                        aligned_face = recognizer.alignCrop(small_frame, face)
-                        face_feature = recognizer.feature(aligned_face)
-                        
-                        best_name = "Unknown"
-                        max_score = 0.0
-                        for name, known_feature in known_faces.items():
-                            sim_score = recognizer.match(face_feature, known_feature, cv2.FaceRecognizerSF_FR_COSINE)
-                            if sim_score > max_score and sim_score > COSINE_THRESHOLD:
-                                max_score = sim_score
-                                best_name = name
-                        
-                        # Scale box
-                        scale_x = frame_width / det_w
-                        scale_y = frame_height / det_h
-                        real_box = [int(box_small[0]*scale_x), int(box_small[1]*scale_y), int(box_small[2]*scale_x), int(box_small[3]*scale_y)]
-                        detected_results.append((real_box, best_name, max_score))
-                        
-                        # Log immediately in surveillance mode
-                        if best_name != "Unknown":
-                            now_ts = time.time()
-                            if best_name not in present_people: # First time seeing them
-                                log_event("ENTERED", best_name, frame)
-                            
-                            # Always update heartbeat so they don't timeout in Lobby logic
-                            present_people[best_name] = now_ts
-
-        # ---------------------------------------------------------
-        # MODE 2: ATTENDANCE (ACTIVE BLINK + VOICE)
-        # ---------------------------------------------------------
-        else: # ATTENDANCE MODE
-            # We run detection more often for responsiveness (Every 3rd frame)
-            if frame_count % 3 == 0:
-                small_frame = cv2.resize(frame, (det_w, det_h))
-                faces_check = detector.detect(small_frame)
-                status = faces_check[0] if faces_check is not None else 0
-                faces_data = faces_check[1] if (faces_check is not None and len(faces_check) > 1) else None
-                
-                # Logic Flow
-                current_time = time.time()
-                
-                if attn_state == "SEARCHING":
-                    detected_results = [] # Clear visualization
-                    if status and faces_data is not None:
-                        # Pick the largest face (closest person)
-                        primary_face = max(faces_data, key=lambda f: f[2] * f[3]) 
-                        attn_state = "DETECTED"
-                        state_timer = current_time
-                        
-                        # Store face data for next steps
-                        target_face_data = primary_face
-                        
-                        # Visualization
-                        box_small = list(map(int, primary_face[:4]))
-                        scale_x = frame_width / det_w
-                        scale_y = frame_height / det_h
-                        real_box = [int(box_small[0]*scale_x), int(box_small[1]*scale_y), int(box_small[2]*scale_x), int(box_small[3]*scale_y)]
-                        detected_results = [(real_box, "Please Blink", 0.0)]
-
-                elif attn_state == "DETECTED":
-                    # Wait 1.0 second to ensure it's a stable face
-                    if (current_time - state_timer) > 1.0:
-                        speak("Please blink to register")
-                        attn_state = "WAITING_BLINK"
-                        state_timer = current_time # Reset timer for timeout
-                    
-                    # Update tracking of face
-                    if status and faces_data is not None:
-                        primary_face = max(faces_data, key=lambda f: f[2] * f[3])
-                        target_face_data = primary_face
-                        # Vis update
-                        box_small = list(map(int, primary_face[:4]))
-                        scale_x = frame_width / det_w
-                        scale_y = frame_height / det_h
-                        real_box = [int(box_small[0]*scale_x), int(box_small[1]*scale_y), int(box_small[2]*scale_x), int(box_small[3]*scale_y)]
-                        detected_results = [(real_box, "Waiting...", 0.0)]
-                    else:
-                        attn_state = "SEARCHING" # Lost face
-
-                elif attn_state == "WAITING_BLINK":
-                    # Timeout check (8s)
-                    if (current_time - state_timer) > 8.0:
-                        attn_state = "SEARCHING"
-                    
-                    if status and faces_data is not None:
-                        primary_face = max(faces_data, key=lambda f: f[2] * f[3])
-                        target_face_data = primary_face
-                        
-                        # --- BLINK DETECTION ---
-                        # Re-calc box on large frame
-                        box_small = list(map(int, primary_face[:4]))
-                        scale_x = frame_width / det_w
-                        scale_y = frame_height / det_h
-                        x, y, w, h = int(box_small[0]*scale_x), int(box_small[1]*scale_y), int(box_small[2]*scale_x), int(box_small[3]*scale_y)
-                        
-                        # Safety padding
-                        x, y = max(0, x), max(0, y)
-                        
-                        # Eye Region of Interest (ROI) - Top 50%
-                        face_roi = frame[y:y+h, x:x+w]
-                        eye_roi_h = int(h * 0.50)
-                        eye_roi = face_roi[0:eye_roi_h, :]
-                        
-                        eyes_detected_vis = [] # For drawing
-                        
-                        if eye_roi.size > 0:
-                            gray_eyes = cv2.cvtColor(eye_roi, cv2.COLOR_BGR2GRAY)
-                            # Looser threshold: Scale 1.1, Neighbors 3 (easier to find eyes)
-                            eyes = eye_detector.detectMultiScale(gray_eyes, 1.1, 3)
-                            
-                            eyes_open = len(eyes) > 0
-                            
-                            for (ex, ey, ew, eh) in eyes:
-                                eyes_detected_vis.append((x+ex, y+ey, ew, eh))
-                            
-                            if not eyes_open:
-                                blink_counter += 1
-                                print(f"Eyes Closed: {blink_counter}")
-                            else:
-                                # We saw eyes open. Was it closed previously?
-                                if blink_counter > 3: # Threshold: at least 3-4 frames (Less sensitive)
-                                    print(">>> BLINK TRIGGERED! <<<")
-                                    attn_state = "RECOGNIZING"
-                                blink_counter = 0
-
-                        # Visual Feedback
-                        debug_color = (0, 0, 255) # Red (Closed/Waiting)
-                        if blink_counter == 0: debug_color = (255, 0, 0) # Blue (Open)
-                        
-                        detected_results = [( [x,y,w,h], f"Blink Now ({blink_counter})", 0.0)]
-                        
-                        # DRAW DEBUGGING
-                        # 1. Draw Eye ROI Box (Where it thinks eyes are)
-                        cv2.rectangle(frame, (x, y), (x+w, y+eye_roi_h), (255, 255, 0), 1)
-                        # 2. Draw Detected Eyes
-                        for (ex, ey, ew, eh) in eyes_detected_vis:
-                            cv2.rectangle(frame, (ex, ey), (ex+ew, ey+eh), (0, 255, 255), 1)
-                            
-                    else:
-                        attn_state = "SEARCHING"
-
-                elif attn_state == "RECOGNIZING":
-                    # Perform Recognition
-                    # Uses target_face_data from YuNet (on small frame)
-                    aligned_face = recognizer.alignCrop(small_frame, target_face_data)
-                    face_feature = recognizer.feature(aligned_face)
-                    
-                    best_name = "Unknown"
-                    max_score = 0.0
-                    for name, known_feature in known_faces.items():
-                        sim_score = recognizer.match(face_feature, known_feature, cv2.FaceRecognizerSF_FR_COSINE)
-                        if sim_score > max_score and sim_score > COSINE_THRESHOLD:
-                            max_score = sim_score
-                            best_name = name
-                    
-                    if best_name != "Unknown":
-                        log_event("ENTERED", best_name, frame)
-                        present_people[best_name] = time.time() # Track in lobby
-                        speak(f"Attendance registered, {best_name}")
-                        detected_results = [( [x,y,w,h], f"SUCCESS: {best_name}", max_score)]
-                        attn_state = "COOLDOWN"
-                        state_timer = current_time
-                    else:
-                        speak("Face not recognized")
-                        attn_state = "SEARCHING" # Retry
-
-                elif attn_state == "COOLDOWN":
-                    detected_results = [( [x,y,w,h], f"Done. ({int(5.0 - (current_time-state_timer))}s)", 1.0)]
-                    if (current_time - state_timer) > 4.0:
-                        attn_state = "SEARCHING"
-
-        frame_count += 1
-        
+
+        cam.frame_count += 1
+
         # --- DISPLAY RESULTS (Common) ---
+        # Latest inference output (may be a few frames old while inference catches up)
+        with cam.lock:
+            detected_results = cam.detected_results
+            debug_boxes = cam.debug_boxes
+
+        for (bx, by, bw, bh), color in debug_boxes:
+            cv2.rectangle(frame, (bx, by), (bx + bw, by + bh), color, 1)
+
         for box, name, conf in detected_results:
             x, y, w, h = box
             color = (0, 255, 0)
             if name == "Unknown" or "Blink" in name:
                 color = (0, 255, 255)
-            
+
             cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
             cv2.rectangle(frame, (x, y + h - 35), (x + w, y + h), color, cv2.FILLED)
             label = f"{name}"
@@ -1366,21 +1891,341 @@ def run_face_recognition_loop():
         # Show Status
         status_y = 60
         cv2.putText(frame, "LOBBY:", (10, status_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 1)
-        for idx, (name, _) in enumerate(present_people.items()):
+        for idx, name in enumerate(lobby_names):
             if idx > 4: break # Limit display
             status_y += 25
             cv2.putText(frame, f"- {name}", (10, status_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        pipeline_stats.record(f"{cam.id}/render", (time.perf_counter() - t_render) * 1000)
 
-        if show_local_preview:
-            cv2.imshow('Visor Attendance (Dual Mode)', frame)
+        # Handed to the main thread for the preview window
+        cam.display = frame
+
+        # --- RECORD FRAME (Works even if preview hidden) ---
+        # Manual only. The recorder thread encodes, splits segments every SEGMENT_DURATION
+        # and indexes them; here the frame is just queued.
+        if manual_recording_active:
+            cam.recorder.write(frame, current_time_loop)
+        elif cam.recorder.active:
+            cam.recorder.finish()
+        pipeline_stats.count(f"{cam.id}/frames")
+
+    cam.recorder.close() # Finishes the open segment
+    cam.capture.release()
+
+# ==========================================
+# INFERENCE WORKER POOL
+# ==========================================
+# INFERENCE_WORKERS threads serve every camera. Each owns its own YuNet, SFace
+# and eye cascade (OpenCV models are not safe to share between threads). A
+# worker takes up to INFERENCE_BATCH frames from different cameras at once,
+# embeds every face found in them and matches all of those faces against the
+# gallery in one matrix multiply.
+
+def create_models():
+    # LOWERED THRESHOLD from 0.9 to 0.6 for better dark detection
+    detector = cv2.FaceDetectorYN.create(
+        DETECTOR_PATH, "", (DET_W, DET_H), 0.6, 0.3, 5000
+    )
+    recognizer = cv2.FaceRecognizerSF.create(RECOGNIZER_PATH, "")
+    eye_detector = cv2.CascadeClassifier(EYE_CASCADE_PATH)
+    return detector, recognizer, eye_detector
+
+def run_surveillance(cam, frame, faces_data, matches):
+    """Applies one surveillance pass for a camera: boxes, heartbeats, ENTERED events."""
+    detected_results = []
+    for face, (best_name, max_score) in zip(faces_data, matches):
+        detected_results.append((scale_box(face), best_name, max_score))
+
+        # Log immediately in surveillance mode
+        if best_name != "Unknown":
+            # Always update heartbeat so they don't timeout in Lobby logic
+            first_time = cam.mark_present(best_name, time.time())
+            if first_time: # First time seeing them
+                cam.log("ENTERED", best_name, frame)
+    return detected_results
+
+def run_attendance(cam, frame, small_frame, status, faces_data, models, gallery):
+    """Advances one camera's blink-verified attendance state machine by one pass."""
+    detector, recognizer, eye_detector = models
+    debug_boxes = []
+    detected_results = cam.detected_results
+    x, y, w, h = cam.box
+
+    # Logic Flow
+    current_time = time.time()
+
+    if cam.attn_state == "SEARCHING":
+        detected_results = [] # Clear visualization
+        if status and faces_data is not None:
+            # Pick the largest face (closest person)
+            primary_face = max(faces_data, key=lambda f: f[2] * f[3])
+            cam.attn_state = "DETECTED"
+            cam.state_timer = current_time
+
+            # Store face data for next steps
+            cam.target_face_data = primary_face
+
+            # Visualization
+            detected_results = [(scale_box(primary_face), "Please Blink", 0.0)]
+
+    elif cam.attn_state == "DETECTED":
+        # Wait 1.0 second to ensure it's a stable face
+        if (current_time - cam.state_timer) > 1.0:
+            speak("Please blink to register")
+            cam.attn_state = "WAITING_BLINK"
+            cam.state_timer = current_time # Reset timer for timeout
+
+        # Update tracking of face
+        if status and faces_data is not None:
+            primary_face = max(faces_data, key=lambda f: f[2] * f[3])
+            cam.target_face_data = primary_face
+            # Vis update
+            detected_results = [(scale_box(primary_face), "Waiting...", 0.0)]
+        else:
+            cam.attn_state = "SEARCHING" # Lost face
+
+    elif cam.attn_state == "WAITING_BLINK":
+        # Timeout check (8s)
+        if (current_time - cam.state_timer) > 8.0:
+            cam.attn_state = "SEARCHING"
+
+        if status and faces_data is not None:
+            primary_face = max(faces_data, key=lambda f: f[2] * f[3])
+            cam.target_face_data = primary_face
+
+            # --- BLINK DETECTION ---
+            # Re-calc box on large frame
+            x, y, w, h = scale_box(primary_face)
+
+            # Safety padding
+            x, y = max(0, x), max(0, y)
+
+            # Eye Region of Interest (ROI) - Top 50%
+            face_roi = frame[y:y+h, x:x+w]
+            eye_roi_h = int(h * 0.50)
+            eye_roi = face_roi[0:eye_roi_h, :]
+
+            eyes_detected_vis = [] # For drawing
+
+            if eye_roi.size > 0:
+                gray_eyes = cv2.cvtColor(eye_roi, cv2.COLOR_BGR2GRAY)
+                # Looser threshold: Scale 1.1, Neighbors 3 (easier to find eyes)
+                with pipeline_stats.measure('blink'):
+                    eyes = eye_detector.detectMultiScale(gray_eyes, 1.1, 3)
+
+                eyes_open = len(eyes) > 0
+
+                for (ex, ey, ew, eh) in eyes:
+                    eyes_detected_vis.append((x+ex, y+ey, ew, eh))
+
+                if not eyes_open:
+                    cam.blink_counter += 1
+                    print(f"Eyes Closed: {cam.blink_counter}")
+                else:
+                    # We saw eyes open. Was it closed previously?
+                    if cam.blink_counter > 3: # Threshold: at least 3-4 frames (Less sensitive)
+                        print(">>> BLINK TRIGGERED! <<<")
+                        cam.attn_state = "RECOGNIZING"
+                    cam.blink_counter = 0
+
+            detected_results = [( [x,y,w,h], f"Blink Now ({cam.blink_counter})", 0.0)]
+
+            # DEBUG BOXES (drawn by the render thread)
+            # 1. Eye ROI Box (Where it thinks eyes are)
+            debug_boxes.append(((x, y, w, eye_roi_h), (255, 255, 0)))
+            # 2. Detected Eyes
+            for eye_box in eyes_detected_vis:
+                debug_boxes.append((eye_box, (0, 255, 255)))
+
+        else:
+            cam.attn_state = "SEARCHING"
+
+    elif cam.attn_state == "RECOGNIZING":
+        # Perform Recognition
+        # Uses target_face_data from YuNet (on small frame)
+        with pipeline_stats.measure('embed'):
+            aligned_face = recognizer.alignCrop(small_frame, cam.target_face_data)
+            face_feature = recognizer.feature(aligned_face)
+
+        with pipeline_stats.measure('match'):
+            best_name, max_score = gallery.best_match(face_feature, COSINE_THRESHOLD)
+
+        if best_name != "Unknown":
+            cam.log("ENTERED", best_name, frame)
+            cam.mark_present(best_name, time.time()) # Track in lobby
+            speak(f"Attendance registered, {best_name}")
+            detected_results = [( [x,y,w,h], f"SUCCESS: {best_name}", max_score)]
+            cam.attn_state = "COOLDOWN"
+            cam.state_timer = current_time
+        else:
+            speak("Face not recognized")
+            cam.attn_state = "SEARCHING" # Retry
+
+    elif cam.attn_state == "COOLDOWN":
+        detected_results = [( [x,y,w,h], f"Done. ({int(5.0 - (current_time-cam.state_timer))}s)", 1.0)]
+        if (current_time - cam.state_timer) > 4.0:
+            cam.attn_state = "SEARCHING"
+
+    cam.box = (x, y, w, h)
+    return detected_results, debug_boxes
+
+def inference_worker(models):
+    detector, recognizer, _ = models
+    while True:
+        batch = inference_scheduler.take(INFERENCE_BATCH)
+        if not batch:
+            break # Scheduler closed: shutting down
+        t_pass = time.perf_counter()
+        # One gallery per pass: a hot reload swaps the reference, never mid-pass
+        gallery = active_gallery
+
+        # 1. Detect on every frame in the batch
+        passes = []
+        for cam_id, (frame, mode) in batch:
+            cam = cameras[cam_id]
+            if mode != cam.last_mode:
+                cam.attn_state = "SEARCHING" # Reset on mode switch
+                cam.detected_results = []
+                cam.tracker.reset()
+                cam.last_mode = mode
+
+            small_frame = cv2.resize(frame, (DET_W, DET_H))
+            # (Night Vision already applied to 'frame', so small_frame inherits it)
+            with pipeline_stats.measure('detect'):
+                faces_check = detector.detect(small_frame)
+            status = faces_check[0] if faces_check is not None else 0
+            faces_data = faces_check[1] if (faces_check is not None and len(faces_check) > 1) else None
+            passes.append((cam, frame, mode, small_frame, status, faces_data))
+
+        # 2. SURVEILLANCE: embed every face that needs it, from every camera, then ONE matmul
+        # Faces on an already-identified track reuse its identity (no SFace call).
+        face_features, to_identify = [], []
+        per_pass = [[] for _ in passes] # (track or None, face) per detected face
+        now = time.time()
+        with pipeline_stats.measure('embed'):
+            for i, (cam, frame, mode, small_frame, status, faces_data) in enumerate(passes):
+                if mode != "SURVEILLANCE":
+                    continue
+                if not status or faces_data is None:
+                    if FACE_TRACKING:
+                        cam.tracker.update([], now) # Nobody in view: lets tracks age out
+                    continue
+                if FACE_TRACKING:
+                    tracks = cam.tracker.update([tuple(face[:4]) for face in faces_data], now)
+                else:
+                    tracks = [None] * len(faces_data)
+                for track, face in zip(tracks, faces_data):
+                    per_pass[i].append(track)
+                    if track is not None and not cam.tracker.needs_embedding(track, now):
+                        pipeline_stats.count('sface_skipped')
+                        continue
+                    aligned_face = recognizer.alignCrop(small_frame, face)
+                    face_features.append(recognizer.feature(aligned_face))
+                    to_identify.append((i, len(per_pass[i]) - 1))
+        pipeline_stats.count('sface_calls', len(face_features))
+        if face_features:
+            with pipeline_stats.measure('match'):
+                new_matches = gallery.best_matches(np.vstack(face_features), COSINE_THRESHOLD)
+        else:
+            new_matches = []
+        matches = [[(track.name, track.score) if track is not None else None for track in tracks]
+                   for tracks in per_pass]
+        for (i, j), match in zip(to_identify, new_matches):
+            matches[i][j] = match
+            if per_pass[i][j] is not None:
+                passes[i][0].tracker.identify(per_pass[i][j], match[0], match[1], now)
+        pipeline_stats.count('faces_recognized', sum(len(m) for m in matches))
+
+        # 3. Per-camera logic
+        for i, (cam, frame, mode, small_frame, status, faces_data) in enumerate(passes):
+            if mode == "SURVEILLANCE":
+                detected_results = run_surveillance(cam, frame, faces_data if matches[i] else [], matches[i])
+                debug_boxes = []
+            else:
+                detected_results, debug_boxes = run_attendance(cam, frame, small_frame, status, faces_data, models, gallery)
+            with cam.lock:
+                cam.detected_results = list(detected_results)
+                cam.debug_boxes = debug_boxes
+
+        inference_scheduler.done([cam_id for cam_id, _ in batch])
+        pass_s = time.perf_counter() - t_pass
+        detection_scheduler.record_cost(pass_s / len(batch))
+        pipeline_stats.record('inference', pass_s * 1000)
+        pipeline_stats.count('inference_frames', len(batch))
+
+def run_face_recognition_loop():
+    global current_mode # Needed for API to update it
+
+    # 1. Setup Directories
+    if not os.path.exists(PHOTOS_DIR):
+        os.makedirs(PHOTOS_DIR)
+    
+    get_event_store() # Creates lobby_log.db (importing lobby_log.csv the first time)
+    get_photo_index() # Reconciles the photo index with attendance_photos/
+    get_health_monitor() # Background AI/camera/disk/recorder probes (dashboards get changes pushed)
             
-            key = cv2.waitKey(1) & 0xFF
+    if not os.path.exists(NOTES_FILE):
+        with open(NOTES_FILE, "w", encoding='utf-8') as f:
+            f.write("# Student Notes\n# Add notes about students here.\n")
+
+    if not os.path.exists(RECORDINGS_DIR):
+        os.makedirs(RECORDINGS_DIR)
+
+    get_storage_janitor() # Hourly retention pass (the first one runs now, in the background)
+
+    if not os.path.exists(DETECTOR_PATH) or not os.path.exists(RECOGNIZER_PATH):
+        print("CRITICAL ERROR: ONNX Models not found. Please run 'download_models.py'.")
+        return
+
+    # 2. Setup Video (one capture + render thread per camera)
+    for config in CAMERAS:
+        cam = CameraState(config)
+        if cam.open():
+            cameras[cam.id] = cam
+    if not cameras:
+        print("ERROR: Could not access the camera.")
+        return
+
+    # 3. Load Known Faces (and keep watching for re-encodes, swapped in without a restart)
+    if active_gallery is None:
+        reload_gallery()
+    start_gallery_watcher()
+
+    # 4. Inference pool (each worker loads its own models)
+    for i in range(max(1, INFERENCE_WORKERS)):
+        threading.Thread(target=inference_worker, args=(create_models(),), daemon=True,
+                         name=f"inference-{i}").start()
+
+    # MODES: "SURVEILLANCE" (Silent, No Blink) vs "ATTENDANCE" (Voice, Blink Required)
+    current_mode = "SURVEILLANCE" 
+
+    print("Starting Visor (Dual Mode with Night Vision)...")
+    print(f" CAMERAS: {', '.join(c.label for c in cameras.values())}")
+    print(" [M] Toggle Mode (Surveillance <-> Attendance)")
+    print(" [Q] Quit")
+    print(" SERVER: http://localhost:5000 (Running)")
+
+    render_threads = []
+    for cam in cameras.values():
+        cam.grabber.start()
+        t = threading.Thread(target=camera_render_loop, args=(cam,), daemon=True, name=f"{cam.id}/render")
+        t.start()
+        render_threads.append(t)
+
+    # Main thread: preview windows + keyboard (HighGUI wants a single UI thread)
+    while any(t.is_alive() for t in render_threads):
+        if show_local_preview:
+            for cam in cameras.values():
+                if cam.display is not None:
+                    cv2.imshow(f'Visor Attendance (Dual Mode) - {cam.label}', cam.display)
+            key = cv2.waitKey(15) & 0xFF
             if key == ord('q'):
                 break
             elif key == ord('m'): # TOGGLE MODE
                 current_mode = "ATTENDANCE" if current_mode == "SURVEILLANCE" else "SURVEILLANCE"
                 print(f"SWITCHED MODE TO: {current_mode}")
-                attn_state = "SEARCHING" # Reset
+                publish_status()
+                # (Workers reset each camera's attendance state when they see the new mode)
                 
                 # Recording Logic: MANUAL ONLY now.
                 # Switching modes does NOT auto-trigger recording.
@@ -1389,15 +2234,21 @@ def run_face_recognition_loop():
             # With no window, cv2.waitKey won't work for 'q'. 
             # Users must close the console or Use Web UI to stop.
             try:
-                cv2.destroyWindow('Visor Attendance (Dual Mode)')
+                cv2.destroyAllWindows()
             except: pass
-            time.sleep(0.01)
-
-        # --- RECORD FRAME (Works even if preview hidden) ---
-        if video_writer is not None:
-            video_writer.write(frame)
-
-    video_capture.release()
+            time.sleep(0.05)
+
+    for cam in cameras.values():
+        cam.grabber.stop()
+    for t in render_threads:
+        t.join(timeout=2.0)
+    inference_scheduler.close()
+    if event_writer is not None:
+        event_writer.stop() # Write out anything still queued
+    if storage_janitor is not None:
+        storage_janitor.stop()
+    if photo_index is not None:
+        photo_index.flush()
     cv2.destroyAllWindows()
 
 def run_flask_app():
@@ -1405,7 +2256,7 @@ def run_flask_app():
     app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
 
 if __name__ == '__main__':
-    # Start Flask in a separate THREAD (not Process) so it can share memory (frame_buffer)
+    # Start Flask in a separate THREAD (not Process) so it can share memory (camera frame hubs)
     # This is much more efficient for the Live Stream feature.
     flask_thread = threading.Thread(target=run_flask_app)
     flask_thread.daemon = True
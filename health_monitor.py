@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import deque
+
+# ==========================================
+# HEALTH MONITOR (Background probes, cached snapshot)
+# ==========================================
+# Every backend the dashboard reports on (AI model, cameras, disk, recorders)
+# has a probe: a function returning (ok, detail). One thread runs each probe
+# on its own interval and keeps the result, so /api/status answers from
+# memory instead of waiting on the network.
+#
+# A probe that fails (returns False or raises) is retried with exponential
+# backoff: interval, 2x, 4x... up to `max_backoff`, so a model server that is
+# down (or restarting) is not hammered. The first success goes back to the
+# normal interval. check_now() runs probes right away (e.g. a user clicked
+# "retry").
+#
+# Each probe keeps its last `history` results as [checked_at, latency ms, ok].
+
+HISTORY = 30
+MAX_BACKOFF = 120.0 # Seconds between probes of something that stays down
+
+
+class Probe:
+    def __init__(self, name, check, interval):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.ok = None # Not checked yet
+        self.detail = None
+        self.error = None
+        self.checked_at = None
+        self.latency_ms = None
+        self.failures = 0 # Consecutive
+        self.next_at = 0.0
+        self.history = deque(maxlen=HISTORY)
+
+
+class HealthMonitor(threading.Thread):
+    def __init__(self, on_change=None, max_backoff=MAX_BACKOFF):
+        """`on_change(name, ok)` is called when a probe's state flips (and on its first result)."""
+        super().__init__(daemon=True, name="health-monitor")
+        self.on_change = on_change
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.probes = {}
+        self.running = True
+
+    def add(self, name, check, interval):
+        with self.lock:
+            self.probes[name] = Probe(name, check, interval)
+        self.wake.set()
+
+    def check_now(self, name=None):
+        with self.lock:
+            for probe in self.probes.values():
+                if name is None or probe.name == name:
+                    probe.next_at = 0.0
+        self.wake.set()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def run(self):
+        while self.running:
+            self.wake.clear() # Before looking, so a check_now() from here on is not missed
+            now = time.time()
+            with self.lock:
+                due = [p for p in self.probes.values() if p.next_at <= now]
+            for probe in due:
+                self._run_probe(probe)
+            with self.lock:
+                next_at = min((p.next_at for p in self.probes.values()), default=time.time() + 1.0)
+            self.wake.wait(max(0.0, next_at - time.time()))
+
+    def _run_probe(self, probe):
+        t0 = time.perf_counter()
+        try:
+            result = probe.check()
+            ok, detail = result if isinstance(result, tuple) else (bool(result), None)
+            error = None
+        except Exception as e:
+            ok, detail, error = False, None, str(e)
+        latency = (time.perf_counter() - t0) * 1000
+        now = time.time()
+        with self.lock:
+            changed = ok != probe.ok
+            probe.ok, probe.detail, probe.error = ok, detail, error
+            probe.checked_at, probe.latency_ms = now, round(latency, 1)
+            probe.history.append([round(now, 1), round(latency, 1), ok])
+            if ok:
+                probe.failures = 0
+                probe.next_at = now + probe.interval
+            else:
+                probe.failures += 1
+                probe.next_at = now + min(probe.interval * 2 ** min(probe.failures - 1, 16), max(self.max_backoff, probe.interval))
+        if changed and self.on_change is not None:
+            try:
+                self.on_change(probe.name, ok)
+            except Exception as e:
+                print(f"⚠️ Health change callback failed: {e}")
+
+    def status(self, name):
+        """Last result of one probe: True / False, or None before its first check."""
+        with self.lock:
+            probe = self.probes.get(name)
+            return probe.ok if probe else None
+
+    def snapshot(self, history=True):
+        now = time.time()
+        with self.lock:
+            out = {}
+            for p in self.probes.values():
+                out[p.name] = {'ok': p.ok, 'detail': p.detail, 'error': p.error,
+                               'checked_at': p.checked_at,
+                               'age_s': round(now - p.checked_at, 1) if p.checked_at else None,
+                               'latency_ms': p.latency_ms, 'failures': p.failures,
+                               'next_check_in_s': round(max(0.0, p.next_at - now), 1)}
+                if history:
+                    out[p.name]['history'] = list(p.history)
+            return out
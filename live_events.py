@@ -0,0 +1,78 @@
+import itertools
+import json
+import threading
+from collections import deque
+
+# ==========================================
+# LIVE EVENT BUS (Server-Sent Events)
+# ==========================================
+# Producers (event writer, lobby tracking, recording toggle, health checks)
+# call publish(kind, data). Every /api/events client runs one sse_stream()
+# generator that sleeps on the bus condition and wakes only when something
+# was published, so N dashboards cost N idle threads and no polling.
+#
+# The last `history` messages are kept so a browser that reconnects with
+# Last-Event-ID gets what it missed.
+
+HEARTBEAT_INTERVAL = 15.0 # Seconds between keep-alive comments (proxies drop silent connections)
+
+
+class EventBus:
+    def __init__(self, history=256):
+        self.cond = threading.Condition()
+        self.messages = deque(maxlen=history) # (id, kind, data)
+        self.ids = itertools.count(1)
+        self.last_id = 0
+        self.latest = {} # kind -> data, for state snapshots (status, lobby per camera...)
+        self.clients = 0
+
+    def publish(self, kind, data, key=None):
+        """Queues one message for every client. `key` names the state slot in `latest` (default: kind)."""
+        with self.cond:
+            msg_id = next(self.ids)
+            self.messages.append((msg_id, kind, data))
+            self.latest[key or kind] = (kind, data)
+            self.last_id = msg_id
+            self.cond.notify_all()
+        return msg_id
+
+    def wait(self, last_id, timeout=None):
+        """Messages newer than `last_id` (waits up to `timeout` for the first one)."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.last_id > last_id, timeout)
+            return [m for m in self.messages if m[0] > last_id]
+
+    def sse_stream(self, last_id=None):
+        """
+        text/event-stream generator. A fresh client first gets the current
+        state (latest message of every kind); a reconnecting one (Last-Event-ID)
+        gets the messages it missed. If those are gone (fell out of the buffer),
+        or its id is ahead of ours (the app restarted and ids began again), it
+        gets the current state too.
+        """
+        with self.cond:
+            self.clients += 1
+            if last_id is None or not self.messages or last_id < self.messages[0][0] - 1 \
+                    or last_id > self.last_id:
+                backlog = [(self.last_id, kind, data) for kind, data in self.latest.values()]
+            else:
+                backlog = [m for m in self.messages if m[0] > last_id]
+            cursor = self.last_id
+        try:
+            yield "retry: 3000\n\n" # Browser reconnect delay (ms)
+            for msg in backlog:
+                yield format_sse(*msg)
+            while True:
+                messages = self.wait(cursor, timeout=HEARTBEAT_INTERVAL)
+                for msg in messages:
+                    cursor = msg[0]
+                    yield format_sse(*msg)
+                if not messages:
+                    yield ": keep-alive\n\n"
+        finally:
+            with self.cond:
+                self.clients -= 1
+
+
+def format_sse(msg_id, kind, data):
+    return f"id: {msg_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
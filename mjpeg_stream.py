@@ -0,0 +1,155 @@
+import itertools
+import threading
+import time
+
+import cv2
+
+# ==========================================
+# MJPEG BROADCASTER (Encode once per tier, serve everyone)
+# ==========================================
+# One broadcaster per camera, fed by the camera's FrameHub. Viewers sleep on
+# the hub and wake when a frame is published. The first viewer that asks for
+# a new frame JPEG-encodes it. Every other viewer reuses the same bytes,
+# tagged with the frame's sequence number. A viewer always jumps to the newest
+# frame: a slow client skips frames (counted as dropped) instead of queueing
+# them or holding anyone else up.
+#
+# Latency ("glass to browser") = time from the grabber receiving the frame to
+# its bytes being handed to the web server for that viewer.
+#
+# Viewers can ask for a smaller / cheaper stream (?w=320&q=60&fps=10). Width
+# and quality are snapped to a few tiers so that phones asking for roughly
+# the same thing share one encode; fps is per viewer (pacing only).
+
+BOUNDARY = b'--frame\r\n'
+DEFAULT_QUALITY = 95 # cv2.imencode's default
+WIDTH_STEP = 80 # Requested widths snap to multiples of this
+QUALITY_STEP = 10 # ...and qualities to multiples of this
+MIN_WIDTH, MIN_QUALITY = 160, 20
+MAX_FPS = 30.0
+MAX_TIERS = 8 # Least recently used tiers beyond this are forgotten
+
+
+def snap_tier(width=None, quality=None, frame_width=None):
+    """(width or None for full size, quality) for a viewer's request."""
+    if width:
+        width = max(MIN_WIDTH, int(round(width / WIDTH_STEP)) * WIDTH_STEP)
+        if frame_width and width >= frame_width:
+            width = None # Full size: no resize
+    else:
+        width = None
+    if quality:
+        quality = min(DEFAULT_QUALITY, max(MIN_QUALITY, int(round(quality / QUALITY_STEP)) * QUALITY_STEP))
+    else:
+        quality = DEFAULT_QUALITY
+    return width, quality
+
+
+def tier_name(tier):
+    width, quality = tier
+    return f"{width or 'full'}/q{quality}"
+
+
+class MjpegBroadcaster:
+    def __init__(self, hub, timer=None, name="stream"):
+        """`hub` is a vision_pipeline.FrameHub; `timer` (StageTimer) records latency as `<name>_latency`."""
+        self.hub = hub
+        self.timer = timer
+        self.name = name
+        self.lock = threading.Lock()
+        self.tiers = {} # tier -> {'lock', 'seq', 'jpeg', 'used'}
+        self.encodes = 0
+        self.clients = {}
+        self._client_ids = itertools.count(1)
+
+    def _tier_entry(self, tier):
+        with self.lock:
+            entry = self.tiers.get(tier)
+            if entry is None:
+                if len(self.tiers) >= MAX_TIERS:
+                    oldest = min(self.tiers, key=lambda t: self.tiers[t]['used'])
+                    del self.tiers[oldest]
+                entry = self.tiers[tier] = {'lock': threading.Lock(), 'seq': 0, 'jpeg': None,
+                                             'capture_time': 0.0, 'used': 0.0}
+            entry['used'] = time.time()
+            return entry
+
+    def latest(self, tier=(None, DEFAULT_QUALITY)):
+        """Returns (seq, jpeg bytes, capture_time) of the newest frame at `tier`, encoding it only if nobody has yet."""
+        seq, frame, capture_time = self.hub.latest()
+        if frame is None:
+            return 0, None, 0.0
+        entry = self._tier_entry(tier)
+        # Per-tier lock: viewers on the same tier wait for one encode, other tiers are not blocked
+        with entry['lock']:
+            if entry['seq'] < seq:
+                width, quality = tier
+                if width:
+                    h, w = frame.shape[:2]
+                    frame = cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+                ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if not ok:
+                    return 0, None, 0.0
+                entry['seq'], entry['jpeg'], entry['capture_time'] = seq, buffer.tobytes(), capture_time
+                with self.lock:
+                    self.encodes += 1
+            return entry['seq'], entry['jpeg'], entry['capture_time']
+
+    def stream(self, width=None, quality=None, max_fps=25.0, frame_width=None):
+        """Multipart generator for one viewer."""
+        tier = snap_tier(width, quality, frame_width)
+        max_fps = min(MAX_FPS, max(0.5, max_fps or MAX_FPS))
+        client_id = next(self._client_ids)
+        now = time.time()
+        stats = {'connected': now, 'tier': tier_name(tier), 'max_fps': max_fps,
+                 'frames_sent': 0, 'frames_dropped': 0, 'bytes_sent': 0, 'bytes_per_sec': 0.0,
+                 'latency_ms': 0.0,
+                 '_window_start': now, '_window_bytes': 0}
+        with self.lock:
+            self.clients[client_id] = stats
+        min_interval = 1.0 / max_fps
+        last_seq, seen_seq, next_time = 0, 0, 0.0
+        try:
+            with self.hub.subscription():
+                while True:
+                    # Sleep until the render thread publishes; frames that arrive before this
+                    # viewer is due (fps cap) are skipped, so the one sent is always fresh.
+                    seen_seq, frame, _ = self.hub.wait(seen_seq, timeout=1.0)
+                    if frame is None:
+                        continue # Nothing new: send nothing
+                    if time.time() < next_time:
+                        continue
+                    seq, jpeg, capture_time = self.latest(tier)
+                    if jpeg is None or seq <= last_seq:
+                        continue
+                    if last_seq:
+                        stats['frames_dropped'] += max(0, seq - last_seq - 1)
+                    last_seq = seq
+                    now = time.time()
+                    # Keep the average at max_fps without letting a late frame push the schedule back
+                    next_time = max(next_time + min_interval, now + min_interval / 2)
+                    latency_ms = (now - capture_time) * 1000
+                    stats['latency_ms'] += 0.1 * (latency_ms - stats['latency_ms']) if stats['frames_sent'] else latency_ms
+                    if self.timer is not None:
+                        self.timer.record(f"{self.name}_latency", latency_ms)
+                    stats['frames_sent'] += 1
+                    stats['bytes_sent'] += len(jpeg)
+                    stats['_window_bytes'] += len(jpeg)
+                    if now - stats['_window_start'] >= 1.0:
+                        stats['bytes_per_sec'] = stats['_window_bytes'] / (now - stats['_window_start'])
+                        stats['_window_start'], stats['_window_bytes'] = now, 0
+                    yield (BOUNDARY + b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            # Generator closed: the browser went away
+            with self.lock:
+                self.clients.pop(client_id, None)
+
+    def snapshot(self):
+        with self.lock:
+            clients = {cid: {k: (round(v, 1) if isinstance(v, float) else v)
+                             for k, v in s.items() if not k.startswith('_')}
+                       for cid, s in self.clients.items()}
+            return {'viewers': len(clients), 'encodes': self.encodes, 'unwatched_frames': self.hub.skipped,
+                    'tiers': sorted(tier_name(t) for t in self.tiers),
+                    'bytes_per_sec': round(sum(c['bytes_per_sec'] for c in clients.values()), 1),
+                    'clients': clients}
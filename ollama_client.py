@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ==========================================
+# OLLAMA CLIENT (Pooled session, streaming, generation queue)
+# ==========================================
+# /api/chat used to requests.post() with "stream": False: a new TCP connection
+# per question, and the Flask thread blocked for the whole generation while
+# the browser showed dots. Now:
+#
+#   * One requests.Session with a small keep-alive pool is shared by every
+#     request (chat and health checks), so there is no connect per question.
+#   * generate_stream() asks Ollama for "stream": true and yields the tokens as
+#     they arrive (Ollama sends one JSON object per line).
+#   * At most `max_concurrent` generations run at once (a 7B model on a CPU is
+#     no faster with two). Later ones wait in a FIFO queue and are told their
+#     position while they wait; once `max_queue` are waiting, new questions
+#     are turned away (QueueFull) instead of piling up server threads.
+#
+# generate_stream() yields (kind, data):
+#   ('queued', {'position': n})   place n in the queue: sent on joining it, then every QUEUE_POLL s
+#   ('token',  {'text': '...'})
+#   ('done',   {'context': [...], 'first_token_ms', 'total_ms', 'eval_count', ...})
+
+CONNECT_TIMEOUT = 3.0 # Seconds to reach the model server
+READ_TIMEOUT = 90.0 # Seconds of silence (no token) before giving up
+POOL_SIZE = 4
+QUEUE_POLL = 1.0 # Seconds between queue position updates while waiting
+
+
+class QueueFull(Exception):
+    pass
+
+
+class GenerationGate:
+    """FIFO semaphore that can say how many are ahead of a waiter."""
+
+    def __init__(self, max_concurrent=1, max_queue=8):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.cond = threading.Condition()
+        self.running = 0
+        self.waiting = deque() # Tickets, oldest first
+        self.tickets = 0
+
+    def enter(self):
+        """Takes a ticket. Raises QueueFull if too many are already waiting."""
+        with self.cond:
+            if self.running < self.max_concurrent and not self.waiting:
+                self.running += 1
+                return None # Straight in
+            if len(self.waiting) >= self.max_queue:
+                raise QueueFull(f"{len(self.waiting)} questions already waiting")
+            self.tickets += 1
+            self.waiting.append(self.tickets)
+            return self.tickets
+
+    def wait(self, ticket, timeout):
+        """Waits up to `timeout` for the ticket's turn. Returns 0 when in, else the queue position."""
+        with self.cond:
+            self.cond.wait_for(lambda: self._can_go(ticket), timeout)
+            if self._can_go(ticket):
+                self.waiting.popleft()
+                self.running += 1
+                self.cond.notify_all()
+                return 0
+            return self.waiting.index(ticket) + 1
+
+    def position(self, ticket):
+        """Place in the queue (1 = next), or 0 if no longer waiting."""
+        with self.cond:
+            return self.waiting.index(ticket) + 1 if ticket in self.waiting else 0
+
+    def _can_go(self, ticket):
+        return self.running < self.max_concurrent and self.waiting[0] == ticket
+
+    def cancel(self, ticket):
+        with self.cond:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+                self.cond.notify_all()
+
+    def leave(self):
+        with self.cond:
+            self.running -= 1
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond:
+            return {'running': self.running, 'waiting': len(self.waiting),
+                    'max_concurrent': self.max_concurrent, 'max_queue': self.max_queue}
+
+
+class OllamaClient:
+    def __init__(self, url, model, max_concurrent=1, max_queue=8):
+        """`url` is the generate endpoint, e.g. http://localhost:11434/api/generate."""
+        self.url = url
+        self.base_url = url.split("/api/")[0] + "/"
+        self.model = model
+        self.gate = GenerationGate(max_concurrent, max_queue)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.stats = {'generations': 0, 'errors': 0, 'rejected': 0, 'first_token_ms': None, 'total_ms': None}
+
+    def ping(self, timeout=2.0):
+        """True if the server answers (uses the pooled connection)."""
+        try:
+            return self.session.get(self.base_url, timeout=timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def generate_stream(self, prompt, options=None, context=None):
+        """Queues for a slot, then yields the generation as (kind, data) (see the top of the file)."""
+        try:
+            ticket = self.gate.enter()
+        except QueueFull:
+            with self.lock:
+                self.stats['rejected'] += 1
+            raise
+        t_queued = time.perf_counter()
+        try:
+            if ticket is not None:
+                position = self.gate.position(ticket)
+                if position:
+                    yield 'queued', {'position': position} # Right away, not after the first poll
+            while ticket is not None:
+                position = self.gate.wait(ticket, QUEUE_POLL)
+                if position == 0:
+                    break
+                yield 'queued', {'position': position}
+        except GeneratorExit:
+            self.gate.cancel(ticket) # Browser went away while waiting
+            raise
+
+        try:
+            yield from self._generate(prompt, options, context, t_queued)
+        finally:
+            self.gate.leave()
+
+    def _generate(self, prompt, options, context, t_queued):
+        payload = {"model": self.model, "prompt": prompt, "stream": True, "options": options or {}}
+        if context:
+            payload["context"] = context
+        t0 = time.perf_counter()
+        first_ms, final = None, None
+        try:
+            with self.session.post(self.url, json=payload, stream=True,
+                                   timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                if response.status_code != 200:
+                    raise requests.HTTPError(f"Ollama Error: {response.status_code}", response=response)
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise requests.HTTPError(f"Ollama Error: {chunk['error']}")
+                    text = chunk.get("response", "")
+                    if text:
+                        if first_ms is None:
+                            first_ms = (time.perf_counter() - t0) * 1000
+                        yield 'token', {'text': text}
+                    if chunk.get("done"):
+                        final = chunk # Read on to the end of the body, so the connection goes back to the pool
+        except Exception:
+            with self.lock:
+                self.stats['errors'] += 1
+            raise
+        if final is None:
+            with self.lock:
+                self.stats['errors'] += 1
+            raise requests.ConnectionError("Ollama closed the stream before the reply was done")
+        total_ms = (time.perf_counter() - t0) * 1000
+        first_ms = round(first_ms if first_ms is not None else total_ms, 1)
+        with self.lock:
+            self.stats['generations'] += 1
+            self.stats['first_token_ms'] = first_ms
+            self.stats['total_ms'] = round(total_ms, 1)
+        yield 'done', {'context': final.get("context"), 'first_token_ms': first_ms, 'total_ms': round(total_ms, 1),
+                       'queued_ms': round((t0 - t_queued) * 1000, 1), 'eval_count': final.get("eval_count"),
+                       'prompt_eval_count': final.get("prompt_eval_count")}
+
+    def generate(self, prompt, options=None, context=None):
+        """Whole reply at once: (text, done info). Same queue as generate_stream()."""
+        parts, info = [], {}
+        for kind, data in self.generate_stream(prompt, options, context):
+            if kind == 'token':
+                parts.append(data['text'])
+            elif kind == 'done':
+                info = data
+        return "".join(parts), info
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats.update(self.gate.snapshot())
+        return stats
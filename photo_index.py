@@ -0,0 +1,236 @@
+import argparse
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from event_log import STORE_FORMAT
+from storage_janitor import iter_files
+
+# ==========================================
+# PHOTO INDEX (Evidence locker metadata + thumbnails)
+# ==========================================
+# /api/photos used to listdir attendance_photos/ and stat every file on every
+# request. The index keeps one small record per photo in memory, sorted by
+# time, and persists it to INDEX_FILE inside the photo folder:
+#   {"name", "ts"}  keyed by the photo's path relative to the folder
+# where "ts" is "YYYY-MM-DD HH:MM:SS" (from the filename, else the mtime).
+#
+# On start the saved index is reconciled with the folder and its day folders
+# (see storage_janitor.py; no stat for photos it already knows), so photos
+# added or deleted while the app was off are picked up. New photos are added by the event writer as it
+# saves them, with their thumbnail made from the frame still in memory.
+#
+# Thumbnails live in THUMBS_DIR and never change once written, so the web
+# server can tell browsers to cache them for a year.
+
+INDEX_FILE = ".photo_index.json"
+INDEX_VERSION = 1
+THUMBS_DIR = "thumbs"
+THUMB_WIDTH = 200 # Cards are ~110 px wide; 200 stays sharp on HiDPI screens
+THUMB_QUALITY = 70
+SAVE_INTERVAL = 10.0 # Seconds between index saves while photos are coming in
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def parse_photo_name(filename):
+    """(person name, "YYYY-MM-DD HH:MM:SS" or None) from Attendance_<Name>_<YYYYMMDD>_<HHMMSS>.jpg."""
+    parts = os.path.splitext(os.path.basename(filename))[0].split('_')
+    if len(parts) < 4 or parts[0] != "Attendance":
+        return "Unknown", None
+    # Re-assemble name parts (vishwajeet_pawar -> vishwajeet pawar)
+    name = " ".join(parts[1:-2])
+    try:
+        ts = datetime.strptime(f"{parts[-2]}_{parts[-1]}", "%Y%m%d_%H%M%S").strftime(STORE_FORMAT)
+    except ValueError:
+        ts = None
+    return name, ts
+
+
+def make_thumbnail(frame, path, width=THUMB_WIDTH, quality=THUMB_QUALITY):
+    h, w = frame.shape[:2]
+    if w > width:
+        frame = cv2.resize(frame, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.tobytes())
+    os.replace(tmp_path, path) # Never serve a half-written thumbnail
+    return True
+
+
+class PhotoIndex:
+    def __init__(self, photos_dir, save_interval=SAVE_INTERVAL):
+        self.photos_dir = photos_dir
+        self.index_path = os.path.join(photos_dir, INDEX_FILE)
+        self.thumbs_dir = os.path.join(photos_dir, THUMBS_DIR)
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.entries = {} # relative path -> {"name", "ts"}
+        self.order = [] # (ts, relative path), oldest first
+        self.version = 0 # Bumped on every change (ETag for /api/photos)
+        self.dirty = False
+        self.last_save = 0.0
+
+    # --- Loading ---
+    def load(self):
+        """Reads the saved index and reconciles it with the folder. Returns (added, removed)."""
+        saved = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    saved = data.get("photos", {})
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Could not read photo index ({e}). Rebuilding it.")
+
+        on_disk = set(self._scan())
+        entries, added = {}, 0
+        for rel in on_disk:
+            entry = saved.get(rel)
+            if entry is None:
+                entry = self._describe(rel)
+                added += 1
+            entries[rel] = entry
+        removed = len(set(saved) - on_disk)
+
+        with self.lock:
+            self.entries = entries
+            self.order = sorted((e['ts'], rel) for rel, e in entries.items())
+            self.version += 1
+            self.dirty = bool(added or removed)
+        if self.dirty:
+            self.save()
+        return added, removed
+
+    def _scan(self):
+        return iter_files(self.photos_dir, IMAGE_EXTENSIONS) # Day folders + older flat files
+
+    def _describe(self, rel):
+        name, ts = parse_photo_name(rel)
+        if ts is None:
+            try:
+                ts = datetime.fromtimestamp(os.path.getmtime(os.path.join(self.photos_dir, rel))).strftime(STORE_FORMAT)
+            except OSError:
+                ts = "1970-01-01 00:00:00"
+        return {"name": name, "ts": ts}
+
+    def save(self):
+        with self.lock:
+            data = {"version": INDEX_VERSION, "photos": dict(self.entries)}
+            self.dirty = False
+            self.last_save = time.time()
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"⚠️ Could not save photo index: {e}")
+
+    # --- Updates (event writer thread) ---
+    def add(self, path, frame=None):
+        """Indexes a photo that was just written; `frame` (if given) becomes its thumbnail."""
+        rel = os.path.relpath(path, self.photos_dir).replace(os.sep, '/')
+        entry = self._describe(rel)
+        if frame is not None:
+            try:
+                make_thumbnail(frame, self.thumb_path(rel))
+            except Exception as e:
+                print(f"⚠️ Thumbnail failed for {rel}: {e}")
+        with self.lock:
+            if rel not in self.entries:
+                bisect.insort(self.order, (entry['ts'], rel))
+            self.entries[rel] = entry
+            self.version += 1
+            self.dirty = True
+            due = time.time() - self.last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def remove(self, rels):
+        """Forgets photos the janitor pruned, and deletes their thumbnails."""
+        with self.lock:
+            for rel in rels:
+                entry = self.entries.pop(rel, None)
+                if entry is None:
+                    continue
+                i = bisect.bisect_left(self.order, (entry['ts'], rel))
+                if i < len(self.order) and self.order[i] == (entry['ts'], rel):
+                    del self.order[i]
+            self.version += 1
+            self.dirty = True
+        for rel in rels:
+            try:
+                os.remove(self.thumb_path(rel))
+            except OSError:
+                pass
+        shard = os.path.dirname(self.thumb_path(rels[0])) if rels else None
+        if shard and shard != self.thumbs_dir and os.path.isdir(shard) and not os.listdir(shard):
+            os.rmdir(shard)
+        self.save()
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    # --- Queries (Flask threads) ---
+    def query(self, name=None, date_from=None, date_to=None, offset=0, limit=60):
+        """
+        Newest first: (total matching, [{"path", "name", "ts"}, ...]).
+        `name` matches case-insensitively anywhere in the person's name;
+        date_from/date_to are inclusive "YYYY-MM-DD" days.
+        """
+        needle = name.lower() if name else None
+        with self.lock:
+            lo = bisect.bisect_left(self.order, (f"{date_from} 00:00:00",)) if date_from else 0
+            hi = bisect.bisect_right(self.order, (f"{date_to} 23:59:59", "\uffff")) if date_to else len(self.order)
+            window = self.order[lo:hi]
+            if needle:
+                window = [(ts, rel) for ts, rel in window if needle in self.entries[rel]['name'].lower()]
+            total = len(window)
+            end = total - offset
+            page = window[max(0, end - limit):max(0, end)][::-1]
+            return total, [{"path": rel, "name": self.entries[rel]['name'], "ts": ts} for ts, rel in page]
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def thumb_path(self, rel):
+        return os.path.join(self.thumbs_dir, os.path.splitext(rel)[0] + ".jpg")
+
+    def thumbnail(self, rel):
+        """Path of `rel`'s thumbnail, made from the full photo the first time (older photos)."""
+        with self.lock:
+            if rel not in self.entries:
+                return None # Only indexed photos (also keeps "../" out of the thumbs folder)
+        thumb = self.thumb_path(rel)
+        if not os.path.exists(thumb):
+            frame = cv2.imread(os.path.join(self.photos_dir, rel))
+            if frame is None or not make_thumbnail(frame, thumb):
+                return None
+        return thumb
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the attendance photo index and thumbnails.")
+    parser.add_argument("--photos", default="attendance_photos")
+    parser.add_argument("--thumbs", action="store_true", help="also make every missing thumbnail now")
+    args = parser.parse_args()
+
+    index = PhotoIndex(args.photos)
+    added, removed = index.load()
+    print(f"🎉 {len(index)} photos indexed ({added} new, {removed} gone)")
+    if args.thumbs:
+        total, photos = index.query(limit=len(index))
+        made = sum(1 for p in photos if index.thumbnail(p['path']))
+        print(f"🎉 {made}/{total} thumbnails ready in '{index.thumbs_dir}'")
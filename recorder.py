@@ -0,0 +1,268 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import cv2
+
+from storage_janitor import day_folder, iter_files, FILE_STAMP
+from vision_pipeline import DropOldestQueue
+
+# ==========================================
+# RECORDER (Segment writer thread + segment index)
+# ==========================================
+# The render thread only hands frames over (write()); one Recorder thread per
+# camera does the encoding. The queue holds QUEUE_FRAMES frames: if the disk
+# falls behind, the oldest are dropped (and counted) rather than slowing video.
+#
+# Segments are SEGMENT_DURATION long. PREOPEN_LEAD seconds before a segment
+# ends, the next file is opened, so the rollover itself is just a swap; the
+# finished file is released (mp4 trailer written) on a helper thread. The
+# codec that worked (avc1 -> mp4v -> vp09) is remembered after the first
+# probe, so later segments open without trying the others.
+#
+# Every finished segment is appended to SegmentIndex (recordings/segments.jsonl):
+#   {"file", "camera", "start", "end", "frames", "codec", "bytes"}
+# with times as "YYYY-MM-DD HH:MM:SS", so recordings can be searched by time.
+
+SEGMENT_DURATION = 600 # Seconds per file
+PREOPEN_LEAD = 5.0 # Seconds before the rollover that the next file is opened
+RECORDING_FPS = 20.0
+QUEUE_FRAMES = 60 # ~3 s at 20 fps
+CODECS = ('avc1', 'mp4v', 'vp09') # H.264 plays in browsers; mp4v is the Windows fallback
+INDEX_FILE = "segments.jsonl"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_codec_lock = threading.Lock()
+_working_codec = None # First codec that opened; shared by every camera
+
+
+def open_video_writer(filename, width, height, fps=RECORDING_FPS):
+    """Returns (writer, codec). Probes CODECS only until one works, then sticks with it."""
+    global _working_codec
+    with _codec_lock:
+        codec = _working_codec
+    if codec is not None:
+        writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+        if writer.isOpened():
+            return writer, codec
+        writer.release() # Stopped working (driver change?): probe again
+
+    for codec in CODECS:
+        writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+        if writer.isOpened():
+            with _codec_lock:
+                _working_codec = codec
+            return writer, codec
+        writer.release()
+        print(f"⚠️ {codec} failed for recording, trying the next codec...")
+    return None, None
+
+
+class SegmentIndex:
+    """Finished recording segments, in memory and appended to recordings/segments.jsonl."""
+
+    def __init__(self, recordings_dir):
+        self.recordings_dir = recordings_dir
+        self.path = os.path.join(recordings_dir, INDEX_FILE)
+        self.lock = threading.Lock()
+        self.segments = {} # file -> entry
+
+    def load(self):
+        """Reads the index and reconciles it with the folder. Returns (added, removed)."""
+        saved = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        saved[entry['file']] = entry
+                    except (ValueError, KeyError):
+                        continue # Torn last line after a crash
+        on_disk = set(iter_files(self.recordings_dir, ('.mp4',)))
+        segments, added = {}, 0
+        for rel in on_disk:
+            entry = saved.get(rel)
+            if entry is None:
+                entry = self._describe(rel)
+                added += 1
+            segments[rel] = entry
+        removed = len(set(saved) - on_disk)
+        with self.lock:
+            self.segments = segments
+        if added or removed:
+            self._rewrite()
+        return added, removed
+
+    def _describe(self, rel):
+        # Recorded before the index (or the app died mid-segment): start from the name, end from the mtime
+        path = os.path.join(self.recordings_dir, rel)
+        end = datetime.fromtimestamp(os.path.getmtime(path))
+        start = end
+        stamp = FILE_STAMP.search(rel)
+        if stamp:
+            try:
+                start = datetime.strptime(rel[stamp.start() + 1:stamp.end() - 1], "%Y%m%d_%H%M%S")
+            except ValueError:
+                pass
+        return {'file': rel, 'camera': None, 'start': start.strftime(TIME_FORMAT), 'end': end.strftime(TIME_FORMAT),
+                'frames': None, 'codec': None, 'bytes': os.path.getsize(path)}
+
+    def _rewrite(self):
+        with self.lock:
+            lines = [json.dumps(e) + "\n" for e in sorted(self.segments.values(), key=lambda e: e['start'])]
+        tmp_path = self.path + ".tmp"
+        os.makedirs(self.recordings_dir, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        os.replace(tmp_path, self.path)
+
+    def add(self, entry):
+        with self.lock:
+            self.segments[entry['file']] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def remove(self, rels):
+        """Forgets segments the janitor pruned."""
+        with self.lock:
+            for rel in rels:
+                self.segments.pop(rel, None)
+        self._rewrite()
+
+    def query(self, start=None, end=None, camera=None):
+        """Segments overlapping [start, end] ("YYYY-MM-DD HH:MM:SS" or a prefix like "YYYY-MM-DD"), newest first."""
+        if end is not None and len(end) < 19:
+            end += "\uffff" # A day / minute prefix covers the whole day / minute
+        with self.lock:
+            found = [e for e in self.segments.values()
+                     if (start is None or e['end'] >= start) and (end is None or e['start'] <= end)
+                     and (camera is None or e['camera'] == camera)]
+        return sorted(found, key=lambda e: e['start'], reverse=True)
+
+
+class Recorder(threading.Thread):
+    def __init__(self, recordings_dir, prefix, camera=None, index=None, timer=None,
+                 segment_duration=SEGMENT_DURATION, fps=RECORDING_FPS):
+        super().__init__(daemon=True, name=f"{camera or prefix}/recorder")
+        self.recordings_dir = recordings_dir
+        self.prefix = prefix
+        self.camera = camera
+        self.index = index
+        self.timer = timer
+        self.segment_duration = segment_duration
+        self.fps = fps
+        self.stage = f"{camera or prefix}/record"
+        self.queue = DropOldestQueue(maxsize=QUEUE_FRAMES)
+        self.active = False # A segment is open (or about to be): drives the REC overlay
+        self.current = None # {'writer', 'file', 'codec', 'start', 'frames'}
+        self.next = None # Pre-opened segment
+        self.frames_written = 0
+        self.segments_written = 0
+
+    # --- Render thread side ---
+    def write(self, frame, ts=None):
+        self.active = True
+        self.queue.put(('frame', frame, ts or time.time()))
+
+    def finish(self):
+        """Ends the current segment (recording was switched off)."""
+        self.active = False
+        self.queue.put(('finish', None, None))
+
+    def close(self, timeout=5.0):
+        self.finish()
+        self.queue.close()
+        self.join(timeout)
+
+    # --- Writer thread ---
+    def _open(self, start_ts, size):
+        start = datetime.fromtimestamp(start_ts)
+        day_dir = os.path.join(self.recordings_dir, day_folder(start))
+        os.makedirs(day_dir, exist_ok=True)
+        rel = f"{day_folder(start)}/{self.prefix}_{start.strftime('%Y%m%d_%H%M%S')}.mp4"
+        writer, codec = open_video_writer(os.path.join(self.recordings_dir, rel), size[0], size[1], self.fps)
+        if writer is None:
+            print(f"❌ Could not open a video writer for {rel}")
+            return None
+        return {'writer': writer, 'file': rel, 'codec': codec, 'start': start_ts, 'frames': 0}
+
+    def _close(self, segment, end_ts, background=False):
+        def release():
+            segment['writer'].release()
+            path = os.path.join(self.recordings_dir, segment['file'])
+            if segment['frames'] == 0:
+                try:
+                    os.remove(path) # Pre-opened but never used
+                except OSError:
+                    pass
+                return
+            if self.index is not None:
+                self.index.add({
+                    'file': segment['file'], 'camera': self.camera,
+                    'start': datetime.fromtimestamp(segment['start']).strftime(TIME_FORMAT),
+                    'end': datetime.fromtimestamp(end_ts).strftime(TIME_FORMAT),
+                    'frames': segment['frames'], 'codec': segment['codec'],
+                    'bytes': os.path.getsize(path) if os.path.exists(path) else 0,
+                })
+            self.segments_written += 1
+            print(f"⏹️ SEGMENT SAVED: {segment['file']} ({segment['frames']} frames)")
+        if background:
+            # Writing the mp4 trailer can take a moment; the next segment is already recording
+            threading.Thread(target=release, daemon=True, name=f"{self.name}/release").start()
+        else:
+            release()
+
+    def _finish(self, end_ts):
+        if self.current is not None:
+            self._close(self.current, end_ts)
+            self.current = None
+        if self.next is not None:
+            self._close(self.next, end_ts)
+            self.next = None
+
+    def run(self):
+        last_ts = time.time()
+        while True:
+            item = self.queue.get(timeout=1.0)
+            if item is None:
+                if self.queue.closed:
+                    break
+                continue
+            kind, frame, ts = item
+            if kind == 'finish':
+                self._finish(last_ts)
+                continue
+            last_ts = ts
+            size = (frame.shape[1], frame.shape[0])
+
+            if self.current is None:
+                self.current = self._open(ts, size)
+                if self.current is None:
+                    continue
+                print(f"🔴 RECORDING STARTED: {self.current['file']}")
+            elapsed = ts - self.current['start']
+            if self.next is None and elapsed >= self.segment_duration - PREOPEN_LEAD:
+                self.next = self._open(self.current['start'] + self.segment_duration, size)
+            if elapsed >= self.segment_duration:
+                print("🔄 Segment limit reached. Switching to the next chunk...")
+                finished, self.current = self.current, (self.next or self._open(ts, size))
+                self.next = None
+                self._close(finished, ts, background=True)
+                if self.current is None:
+                    continue
+
+            t0 = time.perf_counter()
+            self.current['writer'].write(frame)
+            self.current['frames'] += 1
+            self.frames_written += 1
+            if self.timer is not None:
+                self.timer.record(self.stage, (time.perf_counter() - t0) * 1000)
+        self._finish(last_ts)
+
+    def snapshot(self):
+        return {'recording': self.current is not None, 'file': self.current['file'] if self.current else None,
+                'codec': self.current['codec'] if self.current else _working_codec,
+                'queued': len(self.queue), 'dropped': self.queue.dropped,
+                'frames_written': self.frames_written, 'segments_written': self.segments_written}
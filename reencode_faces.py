@@ -1,80 +1,220 @@
 import os
+import json
+import time
+import base64
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import numpy as np
-import pickle
+
+from face_gallery import save_store, convert_pickle_to_store
 
 FACES_DIR = "faces"
 MODELS_DIR = "models"
-ENCODINGS_FILE = "face_encodings_sface.pkl"
+ENCODINGS_FILE = "face_encodings_sface.vgal"
+LEGACY_ENCODINGS_FILE = "face_encodings_sface.pkl"
+MANIFEST_FILE = "face_manifest.json"
+MANIFEST_VERSION = 1
+STORE_DTYPE = "float32" # "float16" halves the file for very large rosters
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+PARALLEL_MIN_JOBS = 8 # Below this, a process pool costs more than it saves
 
 # Model paths
 DETECTOR_PATH = os.path.join(MODELS_DIR, "face_detection_yunet_2023mar.onnx")
 RECOGNIZER_PATH = os.path.join(MODELS_DIR, "face_recognition_sface_2021dec.onnx")
 
-def main():
-    if not os.path.exists(DETECTOR_PATH) or not os.path.exists(RECOGNIZER_PATH):
-        print("❌ Models not found! Run 'download_models.py' first.")
-        return
+# ==========================================
+# MANIFEST (What has already been encoded)
+# ==========================================
+# face_manifest.json maps each photo (path relative to FACES_DIR) to
+#   {"size", "mtime", "sha1", "name", "embedding"}
+# where "embedding" is the base64 float32 SFace feature, or null if no face
+# was found. A refresh only re-encodes photos whose size/mtime changed AND
+# whose content hash differs; deleted photos simply drop out.
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            print("⚠️ Manifest version changed. Doing a full re-encode.")
+            return {}
+        return data.get("files", {})
+    except (ValueError, OSError) as e:
+        print(f"⚠️ Could not read manifest ({e}). Doing a full re-encode.")
+        return {}
+
+def save_manifest(files, path=MANIFEST_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f)
+    os.replace(tmp_path, path)
+
+def encode_embedding(feature):
+    return base64.b64encode(np.asarray(feature, dtype=np.float32).tobytes()).decode('ascii')
+
+def decode_embedding(text):
+    return np.frombuffer(base64.b64decode(text), dtype=np.float32).reshape(1, -1)
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
-    # Initialize models
-    detector = cv2.FaceDetectorYN.create(
+def scan_faces_dir(faces_dir=FACES_DIR):
+    """Returns {relative_path: (size, mtime)} for every image under faces_dir."""
+    found = {}
+    for root, _, filenames in os.walk(faces_dir):
+        for filename in filenames:
+            if not filename.lower().endswith(IMAGE_EXTS):
+                continue
+            path = os.path.join(root, filename)
+            st = os.stat(path)
+            rel = os.path.relpath(path, faces_dir).replace(os.sep, '/')
+            found[rel] = (st.st_size, st.st_mtime)
+    return found
+
+def identity_name(rel_path):
+    """faces/<name>/<any>.jpg -> <name> (many photos per person); faces/<name>.jpg -> <name>."""
+    parts = rel_path.split('/')
+    if len(parts) > 1:
+        return parts[0]
+    return os.path.splitext(parts[0])[0]
+
+def plan_refresh(manifest, found, faces_dir=FACES_DIR):
+    """
+    Diffs the directory scan against the manifest.
+    Returns (kept_entries, to_encode, removed) where to_encode is a list of
+    (rel_path, size, mtime, sha1) that really need a new embedding.
+    """
+    kept, to_encode = {}, []
+    for rel, (size, mtime) in found.items():
+        old = manifest.get(rel)
+        if old and old["size"] == size and old["mtime"] == mtime:
+            kept[rel] = old
+            continue
+        digest = file_sha1(os.path.join(faces_dir, rel))
+        if old and old["sha1"] == digest:
+            # Touched or copied but same bytes: keep the embedding, refresh stat info
+            kept[rel] = dict(old, size=size, mtime=mtime)
+            continue
+        to_encode.append((rel, size, mtime, digest))
+    removed = [rel for rel in manifest if rel not in found]
+    return kept, to_encode, removed
+
+# ==========================================
+# ENCODING (One YuNet + SFace per worker)
+# ==========================================
+_detector = None
+_recognizer = None
+
+def _init_worker():
+    global _detector, _recognizer
+    cv2.setNumThreads(1) # Processes give the parallelism; avoid oversubscribing cores
+    _detector = cv2.FaceDetectorYN.create(
         DETECTOR_PATH, "", (320, 320), 0.6, 0.3, 5000
     )
-    recognizer = cv2.FaceRecognizerSF.create(RECOGNIZER_PATH, "")
+    _recognizer = cv2.FaceRecognizerSF.create(RECOGNIZER_PATH, "")
+
+def embed_file(path):
+    """Returns (SFace feature or None, status message) for one photo. Needs _init_worker()."""
+    # Read image
+    img = cv2.imread(path)
+    if img is None:
+        return None, f"⚠️ Could not read {path}"
+
+    h, w = img.shape[:2]
+    _detector.setInputSize((w, h))
 
-    known_encodings = {}
+    # Detect face
+    has_face, faces = _detector.detect(img)
+    if not has_face or faces is None:
+        return None, f"⚠️ No face detected in {path}"
+
+    # Get the first face (score, x, y, w, h, ...), align, crop and embed
+    aligned_face = _recognizer.alignCrop(img, faces[0])
+    return _recognizer.feature(aligned_face).copy(), f"✅ Encoded: {path}"
+
+def encode_image(job):
+    """Worker entry point: returns (job, embedding_b64 or None, message)."""
+    feature, message = embed_file(os.path.join(FACES_DIR, job[0]))
+    return job, (encode_embedding(feature) if feature is not None else None), message
+
+def run_jobs(jobs, workers):
+    if len(jobs) < PARALLEL_MIN_JOBS or workers == 1:
+        _init_worker()
+        for job in jobs:
+            yield encode_image(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from pool.map(encode_image, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+
+def main(full=False, workers=None):
+    if not os.path.exists(DETECTOR_PATH) or not os.path.exists(RECOGNIZER_PATH):
+        print("❌ Models not found! Run 'download_models.py' first.")
+        return
 
     print(f"📂 Scanning '{FACES_DIR}' for faces...")
-    
+
     if not os.path.exists(FACES_DIR):
         print(f"❌ '{FACES_DIR}' directory not found.")
         return
 
-    count = 0
-    for filename in os.listdir(FACES_DIR):
-        if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            continue
+    t0 = time.time()
+    manifest = {} if full else load_manifest()
+    found = scan_faces_dir()
+    kept, to_encode, removed = plan_refresh(manifest, found)
+    print(f"   {len(found)} photos | {len(kept)} unchanged | {len(to_encode)} new/changed | {len(removed)} removed")
+
+    if not to_encode and not removed and os.path.exists(ENCODINGS_FILE):
+        print(f"\n🎉 Nothing changed. '{ENCODINGS_FILE}' is up to date ({time.time() - t0:.1f}s).")
+        return
 
-        path = os.path.join(FACES_DIR, filename)
-        name = os.path.splitext(filename)[0]
+    workers = workers or os.cpu_count() or 1
+    for (rel, size, mtime, digest), embedding, message in run_jobs(to_encode, workers):
+        print(message)
+        kept[rel] = {"size": size, "mtime": mtime, "sha1": digest,
+                     "name": identity_name(rel), "embedding": embedding}
 
-        # Read image
-        img = cv2.imread(path)
-        if img is None:
-            print(f"⚠️ Could not read {filename}")
-            continue
+    # Group every photo's embedding under its person (sorted for a deterministic store)
+    templates = {}
+    for rel in sorted(kept):
+        entry = kept[rel]
+        entry["name"] = identity_name(rel)
+        if entry["embedding"] is not None:
+            templates.setdefault(entry["name"], []).append(decode_embedding(entry["embedding"]))
+    known_encodings = {name: np.vstack(feats) for name, feats in templates.items()}
+    template_total = sum(len(feats) for feats in known_encodings.values())
 
-        # Resize for detection if too large (improves speed)
-        h, w = img.shape[:2]
-        detector.setInputSize((w, h))
-
-        # Detect face
-        has_face, faces = detector.detect(img)
-        
-        if has_face and faces is not None:
-             # Get the first face (score, x, y, w, h, ...)
-            face_box = faces[0]
-            
-            # Align and Crop
-            aligned_face = recognizer.alignCrop(img, face_box)
-            
-            # Get Feature (Embedding)
-            face_feature = recognizer.feature(aligned_face)
-            
-            # Clone feature to ensure it's clean
-            face_feature = face_feature.copy()
-            
-            known_encodings[name] = face_feature
-            print(f"✅ Encoded: {name}")
-            count += 1
-        else:
-            print(f"⚠️ No face detected in {filename}")
-
-    # Save to disk
-    with open(ENCODINGS_FILE, 'wb') as f:
-        pickle.dump(known_encodings, f)
-
-    print(f"\n🎉 Finished! Saved {count} face encodings to '{ENCODINGS_FILE}'")
+    # Save to disk (binary store: every template + one centroid per person)
+    save_store(ENCODINGS_FILE, list(known_encodings.keys()), list(known_encodings.values()),
+               dtype=STORE_DTYPE, source=FACES_DIR)
+    save_manifest(kept)
+
+    print(f"\n🎉 Finished in {time.time() - t0:.1f}s! Saved {len(known_encodings)} people "
+          f"({template_total} photos) to '{ENCODINGS_FILE}'")
+
+def convert_legacy():
+    """One-time migration of the old pickle cache to the binary store (no models needed)."""
+    if not os.path.exists(LEGACY_ENCODINGS_FILE):
+        print(f"❌ '{LEGACY_ENCODINGS_FILE}' not found, nothing to convert.")
+        return
+    header = convert_pickle_to_store(LEGACY_ENCODINGS_FILE, ENCODINGS_FILE, dtype=STORE_DTYPE)
+    print(f"🎉 Converted {header['count']} encodings: '{LEGACY_ENCODINGS_FILE}' -> '{ENCODINGS_FILE}'")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Encode the faces/ folder into the SFace gallery store.")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-encode every photo")
+    parser.add_argument("--workers", type=int, default=None, help="encoder processes (default: CPU count)")
+    parser.add_argument("--convert-pkl", action="store_true", help="convert the legacy .pkl cache and exit")
+    args = parser.parse_args()
+
+    if args.convert_pkl:
+        convert_legacy()
+    else:
+        main(full=args.full, workers=args.workers)
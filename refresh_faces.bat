@@ -15,6 +15,6 @@ echo ===================================================
 echo                 DONE!
 echo ===================================================
 echo New faces have been added to the system.
-echo You can now restart the attendance app.
+echo A running attendance app picks them up automatically (no restart).
 echo.
 pause
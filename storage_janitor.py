@@ -0,0 +1,237 @@
+import argparse
+import os
+import re
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+# ==========================================
+# STORAGE JANITOR (Date shards + retention)
+# ==========================================
+# New evidence photos and recordings go into one folder per day:
+#   attendance_photos/2026-02-11/Attendance_Obama_20260211_011625.jpg
+#   recordings/2026-02-11/Surveillance_20260211_090000.mp4
+# Files from before sharding stay where they are; their day comes from the
+# timestamp in the filename (or the mtime).
+#
+# A day is the unit of retention. Every `interval` seconds the janitor thread
+# walks each store and, oldest day first, prunes days older than max_age_days,
+# then more old days while the store is over max_gb. Today is never touched.
+# "delete" removes the files; "archive" first packs the day into
+# ARCHIVE_DIR/<store>_<day>.zip (stored, not compressed: JPEG/MP4 already
+# are) so it can be kept on cheaper storage. Work is throttled (a short sleep
+# every few files) so the camera threads keep the disk.
+#
+# After a day is pruned, `on_prune(store, day, paths)` lets the app fix its
+# indexes (photo index, photo links in the event log).
+
+DAY_FORMAT = "%Y-%m-%d"
+DAY_DIR = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+FILE_STAMP = re.compile(r"_(\d{8})_\d{6}\.")
+THROTTLE_EVERY = 200 # Files between pauses
+THROTTLE_PAUSE = 0.02 # Seconds
+
+
+def day_folder(when=None):
+    """Name of the day folder for a file created `when` (default now)."""
+    return (when or datetime.now()).strftime(DAY_FORMAT)
+
+
+def iter_files(root, extensions):
+    """Relative paths ('/'-separated) of files in `root` and its day folders."""
+    if not os.path.isdir(root):
+        return
+    with os.scandir(root) as it:
+        entries = list(it)
+    for entry in entries:
+        if entry.is_file() and entry.name.lower().endswith(extensions):
+            yield entry.name
+        elif entry.is_dir() and DAY_DIR.match(entry.name):
+            with os.scandir(entry.path) as day_it:
+                for sub in day_it:
+                    if sub.is_file() and sub.name.lower().endswith(extensions):
+                        yield f"{entry.name}/{sub.name}"
+
+
+def file_day(rel, path):
+    """Day a file belongs to: its shard folder, else its filename stamp, else its mtime."""
+    folder = rel.split('/')[0]
+    if DAY_DIR.match(folder):
+        return folder
+    stamp = FILE_STAMP.search(rel)
+    if stamp:
+        try:
+            return datetime.strptime(stamp.group(1), "%Y%m%d").strftime(DAY_FORMAT)
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path)).strftime(DAY_FORMAT)
+
+
+class StorageJanitor(threading.Thread):
+    def __init__(self, stores, archive_dir, interval=3600.0, on_prune=None):
+        """
+        `stores` maps a name to {"root", "extensions", "max_age_days", "max_gb", "action"}
+        (0 / None = no limit; action "delete" or "archive").
+        """
+        super().__init__(daemon=True, name="storage-janitor")
+        self.stores = stores
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.on_prune = on_prune
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.running = True
+        self.totals = {'runs': 0, 'days_pruned': 0, 'files_removed': 0, 'bytes_reclaimed': 0, 'bytes_archived': 0}
+        self.last_report = None
+
+    def scan(self, store):
+        """{day: [(rel, path, size), ...]} for one store."""
+        days = {}
+        for n, rel in enumerate(iter_files(store['root'], store['extensions']), 1):
+            path = os.path.join(store['root'], rel)
+            try:
+                days.setdefault(file_day(rel, path), []).append((rel, path, os.path.getsize(path)))
+            except OSError:
+                continue # Deleted while we looked
+            if n % THROTTLE_EVERY == 0:
+                time.sleep(THROTTLE_PAUSE)
+        return days
+
+    def plan(self, store, days, today):
+        """Days to prune, oldest first: past max_age_days, then whatever keeps the store over max_gb."""
+        old_days = sorted(d for d in days if d != today)
+        prune = []
+        if store.get('max_age_days'):
+            cutoff = (datetime.strptime(today, DAY_FORMAT) - timedelta(days=store['max_age_days'])).strftime(DAY_FORMAT)
+            prune = [d for d in old_days if d < cutoff]
+        if store.get('max_gb'):
+            budget = store['max_gb'] * 1e9
+            used = sum(size for d, files in days.items() if d not in prune for _, _, size in files)
+            for d in old_days:
+                if used <= budget:
+                    break
+                if d not in prune:
+                    prune.append(d)
+                    used -= sum(size for _, _, size in days[d])
+        return sorted(prune)
+
+    def _archive(self, name, day, files):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        zip_path = os.path.join(self.archive_dir, f"{name}_{day}.zip")
+        # Append mode: a day pruned in two runs (late files) ends up in one zip
+        with zipfile.ZipFile(zip_path, 'a', compression=zipfile.ZIP_STORED) as zf:
+            existing = set(zf.namelist())
+            for n, (rel, path, _) in enumerate(files, 1):
+                if rel not in existing:
+                    zf.write(path, rel)
+                if n % THROTTLE_EVERY == 0:
+                    time.sleep(THROTTLE_PAUSE)
+        return zip_path
+
+    def _prune_day(self, name, store, day, files):
+        archived = 0
+        if store.get('action') == "archive":
+            self._archive(name, day, files)
+            archived = sum(size for _, _, size in files)
+        removed, reclaimed = [], 0
+        for n, (rel, path, size) in enumerate(files, 1):
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"⚠️ Janitor could not remove {path}: {e}")
+                continue
+            removed.append(rel)
+            reclaimed += size
+            if n % THROTTLE_EVERY == 0:
+                time.sleep(THROTTLE_PAUSE)
+        shard = os.path.join(store['root'], day)
+        if os.path.isdir(shard) and not os.listdir(shard):
+            os.rmdir(shard)
+        if removed and self.on_prune is not None:
+            try:
+                self.on_prune(name, day, removed)
+            except Exception as e:
+                print(f"⚠️ Janitor index update failed ({name} {day}): {e}")
+        return removed, reclaimed, archived
+
+    def run_once(self, dry_run=False):
+        """One pass over every store. Returns the report (also kept for snapshot())."""
+        today = datetime.now().strftime(DAY_FORMAT)
+        report = {'started': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'dry_run': dry_run, 'stores': {}}
+        t0 = time.time()
+        for name, store in self.stores.items():
+            days = self.scan(store)
+            prune = self.plan(store, days, today)
+            entry = {'usage_bytes': sum(size for files in days.values() for _, _, size in files),
+                     'files': sum(len(files) for files in days.values()),
+                     'oldest_day': min(days) if days else None,
+                     'action': store.get('action', 'delete'),
+                     'days_pruned': prune, 'files_removed': 0, 'bytes_reclaimed': 0, 'bytes_archived': 0}
+            for day in prune:
+                if dry_run:
+                    entry['files_removed'] += len(days[day])
+                    entry['bytes_reclaimed'] += sum(size for _, _, size in days[day])
+                    continue
+                removed, reclaimed, archived = self._prune_day(name, store, day, days[day])
+                entry['files_removed'] += len(removed)
+                entry['bytes_reclaimed'] += reclaimed
+                entry['bytes_archived'] += archived
+            entry['usage_bytes'] -= entry['bytes_reclaimed']
+            report['stores'][name] = entry
+        report['seconds'] = round(time.time() - t0, 2)
+
+        if not dry_run:
+            with self.lock:
+                self.totals['runs'] += 1
+                for entry in report['stores'].values():
+                    self.totals['days_pruned'] += len(entry['days_pruned'])
+                    for key in ('files_removed', 'bytes_reclaimed', 'bytes_archived'):
+                        self.totals[key] += entry[key]
+                self.last_report = report
+            freed = sum(e['bytes_reclaimed'] for e in report['stores'].values())
+            if freed:
+                print(f"🧹 Janitor reclaimed {freed / 1e6:.1f} MB")
+        return report
+
+    def run(self):
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Janitor run failed: {e}")
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    def run_now(self):
+        self.wake.set()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def snapshot(self):
+        with self.lock:
+            return {'totals': dict(self.totals), 'last_run': self.last_report}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report what the retention policy would prune (nothing is deleted).")
+    parser.add_argument("--photos", default="attendance_photos")
+    parser.add_argument("--recordings", default="recordings")
+    parser.add_argument("--photo-days", type=int, default=0)
+    parser.add_argument("--recording-days", type=int, default=0)
+    parser.add_argument("--photo-gb", type=float, default=0)
+    parser.add_argument("--recording-gb", type=float, default=0)
+    args = parser.parse_args()
+
+    janitor = StorageJanitor({
+        "photos": {"root": args.photos, "extensions": ('.png', '.jpg', '.jpeg'),
+                   "max_age_days": args.photo_days, "max_gb": args.photo_gb},
+        "recordings": {"root": args.recordings, "extensions": ('.mp4',),
+                       "max_age_days": args.recording_days, "max_gb": args.recording_gb},
+    }, archive_dir="archive")
+    for name, entry in janitor.run_once(dry_run=True)['stores'].items():
+        print(f"{name}: {entry['files']} files, {entry['usage_bytes'] / 1e6:.1f} MB kept, "
+              f"would prune {len(entry['days_pruned'])} days / {entry['files_removed']} files / "
+              f"{entry['bytes_reclaimed'] / 1e6:.1f} MB")
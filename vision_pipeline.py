@@ -0,0 +1,337 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import cv2
+
+# ==========================================
+# PIPELINE BUILDING BLOCKS
+# ==========================================
+# The camera loop is split into stages that run on their own threads:
+#
+#   FrameGrabber (grab thread)  -> always holds the freshest camera frame
+#   DropOldestQueue             -> bounded hand-off; a slow consumer loses
+#                                  stale items instead of stalling producers
+#   InferenceScheduler          -> job board for a pool of inference workers
+#                                  shared by several cameras
+#   MotionGate / DetectionScheduler -> decide WHEN a frame is worth detecting
+#   FrameHub                    -> render thread -> MJPEG viewers, wakes them
+#                                  on publish instead of polling
+#   StageTimer                  -> per-stage timing, exposed via /api/pipeline
+#
+# OpenCV releases the GIL inside read(), DNN inference and JPEG/video
+# encoding, so plain threads are enough to overlap the stages.
+
+
+class StageTimer:
+    """Thread-safe per-stage timing (last / moving average / max, in ms) plus counters."""
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def record(self, stage, ms):
+        with self.lock:
+            s = self.stages.get(stage)
+            if s is None:
+                self.stages[stage] = {'last_ms': ms, 'avg_ms': ms, 'max_ms': ms, 'count': 1}
+                return
+            s['last_ms'] = ms
+            s['avg_ms'] += self.smoothing * (ms - s['avg_ms'])
+            s['max_ms'] = max(s['max_ms'], ms)
+            s['count'] += 1
+
+    @contextmanager
+    def measure(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - t0) * 1000)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self.lock:
+            stages = {name: {k: (round(v, 2) if isinstance(v, float) else v) for k, v in s.items()}
+                      for name, s in self.stages.items()}
+            return {'stages': stages, 'counters': dict(self.counters)}
+
+
+class DropOldestQueue:
+    """Bounded FIFO: put() never blocks; when full, the oldest item is discarded."""
+
+    def __init__(self, maxsize=1):
+        self.items = deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Returns the oldest item, or None on timeout / after close()."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            return self.items.popleft() if self.items else None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class FrameGrabber(threading.Thread):
+    """Reads the camera as fast as it delivers and keeps only the newest frame."""
+
+    def __init__(self, capture, timer=None, name="grab"):
+        super().__init__(daemon=True, name=name)
+        self.capture = capture
+        self.timer = timer
+        self.cond = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.frame_time = 0.0
+        self.running = True
+        self.failed = False
+        self.dropped = 0 # Frames overwritten before anyone read them
+        self._consumed_seq = 0
+
+    def run(self):
+        while self.running:
+            t0 = time.perf_counter()
+            ret, frame = self.capture.read()
+            if not ret:
+                with self.cond:
+                    self.failed = True
+                    self.cond.notify_all()
+                break
+            if self.timer is not None:
+                self.timer.record(self.name, (time.perf_counter() - t0) * 1000)
+            with self.cond:
+                if self.seq > self._consumed_seq:
+                    self.dropped += 1
+                self.frame = frame
+                self.seq += 1
+                self.frame_time = time.time()
+                self.cond.notify_all()
+
+    def read(self, last_seq=0, timeout=1.0):
+        """
+        Waits for a frame newer than `last_seq`.
+        Returns (seq, frame, capture_time), or (last_seq, None, 0) on timeout/camera failure.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > last_seq or self.failed or not self.running, timeout)
+            if self.seq <= last_seq:
+                return last_seq, None, 0.0
+            self._consumed_seq = self.seq
+            return self.seq, self.frame, self.frame_time
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+
+
+class FrameHub:
+    """
+    Latest rendered frame of one camera, handed to any number of subscribers.
+    publish() only copies the frame when someone is subscribed; wait() wakes
+    exactly when a newer frame is published.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.frame = None
+        self.capture_time = 0.0 # When the grabber got this frame (time.time())
+        self.subscribers = 0
+        self.skipped = 0 # Frames published with nobody watching (no copy made)
+
+    def publish(self, frame, capture_time=None):
+        with self.cond:
+            self.seq += 1
+            if self.subscribers == 0:
+                self.frame = None # Nobody watching: skip the copy
+                self.skipped += 1
+                return
+            self.frame = frame.copy()
+            self.capture_time = capture_time or time.time()
+            self.cond.notify_all()
+
+    def latest(self):
+        """(seq, frame, capture_time) of the newest published frame; frame None if there is none."""
+        with self.cond:
+            return self.seq, self.frame, self.capture_time
+
+    def wait(self, last_seq=0, timeout=1.0):
+        """Blocks until a frame newer than `last_seq` is published; returns latest() or (last_seq, None, 0)."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > last_seq and self.frame is not None, timeout):
+                return last_seq, None, 0.0
+            return self.seq, self.frame, self.capture_time
+
+    @contextmanager
+    def subscription(self):
+        with self.cond:
+            self.subscribers += 1
+        try:
+            yield self
+        finally:
+            with self.cond:
+                self.subscribers -= 1
+
+
+class InferenceScheduler:
+    """
+    Shared job board for a pool of inference workers serving several cameras.
+    Each camera has at most one pending job (a newer frame replaces the older
+    one) and at most one job in flight, so per-camera state such as the
+    attendance state machine is only ever touched by one worker at a time.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = {} # source id -> job (insertion order = arrival order)
+        self.in_flight = set()
+        self.dropped = {}
+        self.closed = False
+
+    def submit(self, source_id, job):
+        with self.cond:
+            if source_id in self.pending:
+                self.dropped[source_id] = self.dropped.get(source_id, 0) + 1
+                del self.pending[source_id] # Re-insert at the back: arrival order stays fair
+            self.pending[source_id] = job
+            self.cond.notify()
+
+    def take(self, max_jobs=1, timeout=None):
+        """
+        Blocks until at least one job is runnable; returns up to `max_jobs`
+        (source_id, job) pairs from different sources, or [] once closed.
+        """
+        def runnable():
+            return [sid for sid in self.pending if sid not in self.in_flight]
+
+        with self.cond:
+            if not self.cond.wait_for(lambda: runnable() or self.closed, timeout):
+                return []
+            if self.closed:
+                return []
+            batch = []
+            for sid in runnable()[:max_jobs]:
+                batch.append((sid, self.pending.pop(sid)))
+                self.in_flight.add(sid)
+            return batch
+
+    def done(self, source_ids):
+        with self.cond:
+            self.in_flight.difference_update(source_ids)
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class MotionGate:
+    """Cheap scene-activity check: fraction of pixels that changed on a tiny blurred grayscale frame."""
+
+    def __init__(self, size=(64, 48), pixel_threshold=20):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.prev = None
+        self.motion = 0.0
+
+    def update(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self.prev is None:
+            self.motion = 1.0 # First frame: treat as activity
+        else:
+            diff = cv2.absdiff(gray, self.prev)
+            self.motion = cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]) / diff.size
+        self.prev = gray
+        return self.motion
+
+
+class DetectionScheduler:
+    """
+    Adaptive detection rate per camera.
+
+    Active (motion or faces present): detect at up to `max_fps`.
+    Static: every detection stretches the interval by `backoff`, down to `idle_fps`.
+    CPU budget: with an average inference cost of C seconds per frame and N
+    active cameras, no camera detects more often than every C * N / cpu_budget
+    seconds, so inference stays around `cpu_budget` cores in total.
+    """
+
+    def __init__(self, max_fps=10.0, idle_fps=1.0, cpu_budget=1.0, backoff=1.5, smoothing=0.1, window=5.0):
+        self.max_fps = max_fps
+        self.idle_fps = idle_fps
+        self.cpu_budget = cpu_budget
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.window = window
+        self.lock = threading.Lock()
+        self.cost_s = 0.0 # Moving average inference cost per frame
+        self.sources = {}
+
+    def record_cost(self, seconds):
+        with self.lock:
+            self.cost_s = seconds if self.cost_s == 0.0 else self.cost_s + self.smoothing * (seconds - self.cost_s)
+
+    def _budget_interval(self, now):
+        if self.cpu_budget <= 0 or self.cost_s == 0.0:
+            return 0.0
+        busy = sum(1 for st in self.sources.values() if now - st['last'] < 1.0 / self.idle_fps + 1.0)
+        return self.cost_s * max(1, busy) / self.cpu_budget
+
+    def should_detect(self, source_id, now, active, max_fps=None):
+        """Called once per rendered frame; returns True when this frame should go to inference."""
+        fastest = 1.0 / (max_fps or self.max_fps)
+        with self.lock:
+            st = self.sources.get(source_id)
+            if st is None:
+                st = self.sources[source_id] = {'interval': fastest, 'last': 0.0, 'active': True,
+                                                'times': deque(maxlen=256)}
+            st['active'] = active
+            if active:
+                st['interval'] = fastest
+            interval = max(st['interval'], self._budget_interval(now))
+            if now - st['last'] < interval:
+                return False
+            st['last'] = now
+            st['times'].append(now)
+            if not active:
+                st['interval'] = min(max(st['interval'], fastest) * self.backoff, 1.0 / self.idle_fps)
+            return True
+
+    def snapshot(self, now=None):
+        """{source_id: {'rate_hz', 'interval_s', 'active'}} - rate measured over the last `window` seconds."""
+        now = now or time.time()
+        with self.lock:
+            budget = self._budget_interval(now)
+            out = {}
+            for sid, st in self.sources.items():
+                recent = sum(1 for t in st['times'] if now - t <= self.window)
+                out[sid] = {'rate_hz': round(recent / self.window, 2),
+                            'interval_s': round(max(st['interval'], budget), 3),
+                            'active': st['active']}
+            return out